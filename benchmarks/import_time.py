@@ -0,0 +1,86 @@
+"""Benchmark import time of the entry modules and guard against regressions.
+
+Every entry module is imported in a fresh interpreter with `-X importtime`.
+The best cumulative time over a few runs is compared against its budget,
+and modules which must only load on first use are checked to be absent.
+Exits with a non-zero status if any check fails.
+
+Run from the repository root:
+
+    python benchmarks/import_time.py
+"""
+
+import os
+import subprocess
+import sys
+from typing import List, Dict, Tuple
+
+REPO_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+"""Root of the repository, put on the path of the benchmarked interpreters."""
+
+RUNS: int = 5
+"""Number of fresh interpreters per entry module. The best run is kept."""
+
+BUDGETS_MS: Dict[str, float] = {
+    "envprotect": 60.0,
+    "envprotect.client": 80.0,
+    "envprotect.envprotect": 120.0,
+}
+"""Cumulative import time budget of every entry module, in milliseconds."""
+
+DEFERRED_MODULES: List[str] = [
+    "git", "numpy", "setuptools", "asyncio", "sqlite3",
+    "envprotect.core.crawler", "envprotect.printer", "envprotect.rulebook.aws",
+]
+"""Modules which mustn't be loaded by importing an entry module."""
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """Import a module in a fresh interpreter.
+
+    Args:
+        module: Name of the module to import.
+
+    Returns:
+        Cumulative import time of the module in milliseconds and the names of every loaded module.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys, {module}; print('\\n'.join(sys.modules))"],
+        cwd=REPO_ROOT, env={**os.environ, "PYTHONPATH": REPO_ROOT}, capture_output=True, text=True, check=True
+    )
+    cumulative_us = 0
+
+    for line in process.stderr.splitlines():
+        fields = line.split("|")
+
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative_us = int(fields[1])
+
+    return cumulative_us / 1000, process.stdout.split()
+
+
+def main() -> int:
+    """Run the benchmark.
+
+    Returns:
+        Exit status, non-zero if a budget was exceeded or a deferred module was loaded.
+    """
+    failed = False
+
+    for module, budget in BUDGETS_MS.items():
+        runs = [measure(module) for _ in range(RUNS)]
+        best = min(elapsed for elapsed, _ in runs)
+        loaded = [name for name in DEFERRED_MODULES if name in runs[0][1]]
+        status = "ok" if best <= budget and not loaded else "FAIL"
+        failed = failed or status != "ok"
+
+        print(f"{status:4} {module:24} {best:7.1f} ms (budget {budget:.0f} ms)")
+
+        for name in loaded:
+            print(f"     {name} is imported eagerly")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
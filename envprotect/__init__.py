@@ -1,8 +1,33 @@
-"""Root export for EnvProtect."""
-from core import *
-from constants import *
-from envprotect import *
-from exception import *
-from printer import *
-from rulebook import *
-from utility import *
+"""Root export for EnvProtect.
+
+Exports of the submodules are resolved on first access, keeping the import
+of the package itself free of git, numpy and the bundled rulesets.
+"""
+from importlib import import_module
+from typing import Any, List
+
+_SUBMODULES: List[str] = [
+    ".core", ".constants", ".envprotect", ".exception", ".printer", ".rulebook", ".utility",
+]
+
+
+def __getattr__(name: str) -> Any:
+    """Look up an export in the submodules, importing them on first access.
+
+    Args:
+        name: Name of the attribute.
+
+    Returns:
+        The exported object.
+
+    Raises:
+        AttributeError: Raised if no submodule exports the name.
+    """
+    for submodule_name in _SUBMODULES:
+        submodule = import_module(submodule_name, __name__)
+        exports = getattr(submodule, "__all__", None)
+
+        if name in exports if exports is not None else not name.startswith("_") and hasattr(submodule, name):
+            return getattr(submodule, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
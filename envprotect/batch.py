@@ -0,0 +1,174 @@
+"""Batch scanning of many repositories.
+
+Scans a list of repositories in a single process, sharing one warm worker
+pool with every registered ruleset installed once per worker. Repositories
+are scheduled largest first and their reports are streamed as they finish.
+"""
+
+from __future__ import annotations
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from os import PathLike
+from typing import List, Dict, AsyncGenerator, Iterator, Optional
+from git import Repo
+from git.exc import GitError
+from .core.cache import ResultCache
+from .core.crawler import Crawler, CrawlResult, CrawlException, DEFAULT_CONCURRENCY, init_shared_worker
+from .core.detection import DetectionResult
+from .core.prefilter import PreFilter
+from .envprotect import find_repo, get_suspected_subproject_dependencies, select_rulesets
+from .rulebook import RuleFactory, RuleSet
+
+DEFAULT_MAX_REPOS: int = 4
+"""Number of repositories scanned at the same time."""
+
+
+class RepoReport:
+    """Outcome of scanning a single repository in a batch."""
+
+    def __init__(self,
+                 path: PathLike[str],
+                 result: Optional[CrawlResult[List[DetectionResult], CrawlException]] = None,
+                 exception: Optional[BaseException] = None,
+                 elapsed: float = 0.0) -> None:
+        """Initialize new repository report.
+
+        Args:
+            path: Path of the scanned repository.
+            result: Crawl result of the repository, unless the scan failed.
+            exception: Exception which failed the scan, if any.
+            elapsed: Wall time of the scan in seconds.
+        """
+        self.path = path
+        self.result = result
+        self.exception = exception
+        self.elapsed = elapsed
+
+
+def repo_size(path: PathLike[str]) -> int:
+    """Estimate the size of a repository from its object database.
+
+    Args:
+        path: Path inside the repository.
+
+    Returns:
+        Size of packed and loose objects in KiB. Zero if it can't be determined.
+    """
+    try:
+        output: str = Repo(path, search_parent_directories=True).git.count_objects("-v")
+        counts: Dict[str, str] = dict(line.split(": ", 1) for line in output.splitlines())
+    except (GitError, OSError, ValueError):
+        return 0
+
+    return int(counts.get("size-pack", 0)) + int(counts.get("size", 0))
+
+
+async def abatch_scan(paths: List[PathLike[str]],
+                      workers: Optional[int] = None,
+                      max_repos: int = DEFAULT_MAX_REPOS,
+                      concurrency: int = DEFAULT_CONCURRENCY,
+                      use_cache: bool = True) -> AsyncGenerator[RepoReport, None]:
+    """Scan many repositories through one shared worker pool.
+
+    Args:
+        paths: Paths inside the repositories to be scanned.
+        workers: Number of worker processes. Defaults to the CPU count.
+        max_repos: Number of repositories scanned at the same time.
+        concurrency: Number of detections kept in flight per repository.
+        use_cache: Flag to reuse detections of unchanged blobs from `.git/envprotect/`.
+
+    Yields:
+        A report per repository, in the order the scans finish.
+    """
+    loop = asyncio.get_running_loop()
+    ruleset_names: List[str] = RuleFactory.ruleset_names()
+    rulesets: List[RuleSet] = [RuleFactory.fetch_rule_set(ruleset_name) for ruleset_name in ruleset_names]
+
+    sizes: List[int] = await asyncio.gather(*(loop.run_in_executor(None, repo_size, path) for path in paths))
+    ordered: List[PathLike[str]] = [path for _, path in sorted(zip(sizes, paths), key=lambda pair: -pair[0])]
+    slots = asyncio.Semaphore(max_repos)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=init_shared_worker,
+                             initargs=(rulesets,)) as executor:
+
+        async def scan_repo(path: PathLike[str]) -> RepoReport:
+            # Semaphore waiters are woken in arrival order, keeping the largest-first schedule.
+            async with slots:
+                started = time.perf_counter()
+                cache: Optional[ResultCache] = None
+
+                try:
+                    repo: Repo = await loop.run_in_executor(None, find_repo, path)
+                    subprojects = await loop.run_in_executor(
+                        None, get_suspected_subproject_dependencies, repo, executor
+                    )
+                    repo_rulesets, scopes = select_rulesets(subprojects)
+                    cache = ResultCache.for_repo(repo) if use_cache else None
+
+                    result = await Crawler(source=repo).acrawl(
+                        rulesets=repo_rulesets,
+                        dry_run=True,
+                        executor=executor,
+                        concurrency=concurrency,
+                        cache=cache,
+                        prefilter=PreFilter(),
+                        shared_rulesets=rulesets,
+                        scopes=scopes
+                    )
+                    return RepoReport(path=path, result=result, elapsed=time.perf_counter() - started)
+
+                except Exception as exception:
+                    return RepoReport(path=path, exception=exception, elapsed=time.perf_counter() - started)
+
+                finally:
+                    if cache is not None:
+                        cache.close()
+
+        scans = [asyncio.ensure_future(scan_repo(path)) for path in ordered]
+
+        try:
+            for finished in asyncio.as_completed(scans):
+                yield await finished
+        finally:
+            for scan in scans:
+                scan.cancel()
+
+
+def batch_scan(paths: List[PathLike[str]],
+               workers: Optional[int] = None,
+               max_repos: int = DEFAULT_MAX_REPOS,
+               concurrency: int = DEFAULT_CONCURRENCY,
+               use_cache: bool = True) -> Iterator[RepoReport]:
+    """Scan many repositories through one shared worker pool, from synchronous code.
+
+    Args:
+        paths: Paths inside the repositories to be scanned.
+        workers: Number of worker processes. Defaults to the CPU count.
+        max_repos: Number of repositories scanned at the same time.
+        concurrency: Number of detections kept in flight per repository.
+        use_cache: Flag to reuse detections of unchanged blobs from `.git/envprotect/`.
+
+    Yields:
+        A report per repository, in the order the scans finish.
+    """
+    loop = asyncio.new_event_loop()
+    reports = abatch_scan(paths, workers, max_repos, concurrency, use_cache)
+
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(reports.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(reports.aclose())
+        loop.close()
+
+
+__all__ = [
+    "DEFAULT_MAX_REPOS", "RepoReport",
+    "repo_size", "abatch_scan", "batch_scan",
+]
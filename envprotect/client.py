@@ -0,0 +1,94 @@
+"""Thin client of the scan daemon.
+
+Only depends on the standard library, so that hooks calling into a running
+daemon don't pay for importing git, the rulebook or the crawler.
+"""
+
+import json
+import os
+import socket
+import tempfile
+from typing import List, Dict, Any, Optional
+from envprotect.exception.daemon import DaemonUnavailableError
+
+DEFAULT_SOCKET_PATH: str = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"envprotect-{os.getuid()}.sock"
+)
+"""Default path of the daemon's Unix domain socket."""
+
+
+def send_request(request: Dict[str, Any],
+                 socket_path: str = DEFAULT_SOCKET_PATH,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Send a single request to the daemon and wait for its response.
+
+    Requests and responses are JSON objects terminated by a newline.
+
+    Args:
+        request: Request object.
+        socket_path: Path of the daemon socket.
+        timeout: Seconds to wait for the response. Waits indefinitely if not passed.
+
+    Returns:
+        Response object.
+
+    Raises:
+        DaemonUnavailableError: Raised if the daemon isn't listening on the socket.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(timeout)
+            connection.connect(socket_path)
+            connection.sendall(json.dumps(request).encode() + b"\n")
+
+            with connection.makefile("rb") as stream:
+                line = stream.readline()
+
+    except (FileNotFoundError, ConnectionRefusedError) as exception:
+        raise DaemonUnavailableError(expression=socket_path, message=f"""
+No envprotect daemon is listening on {socket_path}.
+        """) from exception
+
+    response: Dict[str, Any] = json.loads(line)
+    return response
+
+
+def scan(path: str = ".",
+         staged: bool = False,
+         rev_range: Optional[str] = None,
+         commits: Optional[List[str]] = None,
+         added_lines_only: bool = False,
+         paths: Optional[List[str]] = None,
+         socket_path: str = DEFAULT_SOCKET_PATH) -> Dict[str, Any]:
+    """Ask the daemon to scan a repository, or its changes.
+
+    Without a change selection the working tree below the path, or below
+    each of the paths, is scanned.
+
+    Args:
+        path: Path inside the repository to be scanned.
+        staged: Scan only blobs changed in the index.
+        rev_range: Scan only blobs changed between two revisions given as `<base>..<head>` or `<base>...<head>`.
+        commits: Scan only blobs changed by the listed commits.
+        added_lines_only: Restrict diff scans to the added hunks of changed blobs.
+        paths: Directories or files of the same repository to be scanned instead of `path`.
+        socket_path: Path of the daemon socket.
+
+    Returns:
+        Response object with `detections`, `errors` and `skipped` entries.
+    """
+    return send_request({
+        "command": "scan",
+        "path": os.path.abspath(path),
+        "staged": staged,
+        "rev_range": rev_range,
+        "commits": commits,
+        "added_lines_only": added_lines_only,
+        "paths": [os.path.abspath(scan_path) for scan_path in paths] if paths else None,
+    }, socket_path=socket_path)
+
+
+__all__ = [
+    "DEFAULT_SOCKET_PATH",
+    "send_request", "scan",
+]
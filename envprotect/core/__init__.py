@@ -1,14 +1,63 @@
-"""Define core modules and operations."""
-from .crawler import Crawler, CrawlResult, CrawlException
-from .dependency import DependencyBase, DependencyFileType,     \
-                        dependency_file_type_mapping,           \
-                        fetch_dependencies, parse_dependencies
-from .detection import Detection, DetectionResult, DetectionException
-from .result import Result, ResultType
+"""Define core modules and operations.
+
+Submodules are imported on first access of their exports, so that importing
+a single core module doesn't pull in git, sqlite or the rulebook.
+"""
+from importlib import import_module
+from typing import Dict, Any
+
+_EXPORTS: Dict[str, str] = {
+    "ResultCache": ".cache",
+    "Crawler": ".crawler", "CrawlResult": ".crawler", "CrawlException": ".crawler",
+    "DependencyBase": ".dependency", "DependencyFileType": ".dependency",
+    "dependency_file_type_mapping": ".dependency", "fetch_dependencies": ".dependency",
+    "parse_dependencies": ".dependency", "parse_dependency_file": ".dependency",
+    "DependencyGrammar": ".dependency", "DEPENDENCY_GRAMMARS": ".dependency",
+    "structured_parser_mapping": ".dependency", "iter_structured_dependencies": ".dependency",
+    "discover_manifests": ".dependency", "parse_subproject_dependencies": ".dependency",
+    "Detection": ".detection", "DetectionResult": ".detection", "DetectionException": ".detection",
+    "FileEntry": ".filesystem", "walk_files": ".filesystem", "walk_subtree": ".filesystem",
+    "BatchObjectReader": ".objects",
+    "PreFilter": ".prefilter", "SkipReason": ".prefilter",
+    "Result": ".result", "ResultType": ".result",
+    "DetectionRecord": ".store", "DetectionStore": ".store",
+    "Version": ".version", "VersionRange": ".version",
+    "VulnerabilityIndex": ".vulnerability", "normalize_name": ".vulnerability",
+    "VulnerabilityDatabase": ".vulndb",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Import the submodule defining an export on first access.
+
+    Args:
+        name: Name of the attribute.
+
+    Returns:
+        The exported object.
+
+    Raises:
+        AttributeError: Raised if the name isn't exported.
+    """
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(import_module(_EXPORTS[name], __name__), name)
+
 
 __all__ = [
+    "ResultCache",
     "Crawler", "CrawlResult", "CrawlException",
     "DependencyBase", "DependencyFileType", "dependency_file_type_mapping", "fetch_dependencies", "parse_dependencies",
+    "parse_dependency_file", "DependencyGrammar", "DEPENDENCY_GRAMMARS",
+    "structured_parser_mapping", "iter_structured_dependencies", "discover_manifests", "parse_subproject_dependencies",
     "Detection", "DetectionResult", "DetectionException",
+    "FileEntry", "walk_files", "walk_subtree",
+    "BatchObjectReader",
+    "PreFilter", "SkipReason",
     "Result", "ResultType",
+    "DetectionRecord", "DetectionStore",
+    "Version", "VersionRange",
+    "VulnerabilityIndex", "normalize_name",
+    "VulnerabilityDatabase",
 ]
@@ -0,0 +1,271 @@
+"""Define a persistent detection result cache.
+
+Caches detection results keyed on blob SHA and ruleset version so that
+unchanged blobs aren't re-detected across scans.
+
+Results are stored as JSON rather than pickles. The cache lives inside
+`.git`, and unpickling rows anyone with write access there could craft
+would let them run arbitrary code on the next scan.
+"""
+
+from __future__ import annotations
+import json
+import os
+import sqlite3
+from base64 import b64decode, b64encode
+from types import TracebackType
+from typing import List, Dict, Any, Optional, Type, Tuple
+from git import Repo
+from envprotect.exception.detection import DetectionException
+from envprotect.rulebook import RuleSet
+from .detection import Detection, DetectionResult
+
+CACHE_DIR_NAME: str = "envprotect"
+"""Directory inside `.git` holding envprotect state."""
+
+CACHE_FILE_NAME: str = "cache.sqlite3"
+"""File name of the result cache database."""
+
+CACHE_SCHEMA_VERSION: int = 2
+"""Version of the stored row format. Databases of older versions are emptied on open."""
+
+
+def encode_result(result: DetectionResult) -> Optional[str]:
+    """Serialize a detection result to JSON.
+
+    Args:
+        result: Detection result to be stored.
+
+    Returns:
+        JSON document, or None if the result holds objects other than detections and detection exceptions.
+    """
+    detections: List[Dict[str, Any]] = []
+
+    for detection in result.ok or []:
+        if not isinstance(detection, Detection):
+            return None
+
+        matched = detection.result
+
+        if isinstance(matched, (bytes, bytearray, memoryview)):
+            encoded_result: Optional[List[str]] = ["bytes", b64encode(bytes(matched)).decode("ascii")]
+        elif isinstance(matched, str):
+            encoded_result = ["str", matched]
+        elif matched is None:
+            encoded_result = None
+        else:
+            return None
+
+        detections.append({
+            "result": encoded_result,
+            "offset": detection.offset,
+            "line": detection.line,
+            "rule_id": detection.rule_id,
+            "score": detection.score,
+        })
+
+    exceptions: Optional[List[Dict[str, str]]] = None
+
+    if result.exception:
+        if not all(type(exception) is DetectionException for exception in result.exception):
+            return None
+
+        exceptions = [
+            {"expression": exception.expression, "message": exception.message} for exception in result.exception
+        ]
+
+    return json.dumps({"ok": detections, "exception": exceptions}, separators=(",", ":"))
+
+
+def decode_result(document: str) -> DetectionResult:
+    """Rebuild a detection result from its JSON document.
+
+    Args:
+        document: JSON document written by `encode_result`.
+
+    Returns:
+        Detection result equal to the stored one.
+
+    Raises:
+        ValueError: Raised if the document isn't a stored detection result.
+    """
+    try:
+        decoded: Dict[str, Any] = json.loads(document)
+        detections: List[Detection] = []
+
+        for fields in decoded["ok"]:
+            encoded_result = fields["result"]
+            matched: Optional[Any] = None
+
+            if encoded_result is not None:
+                kind, value = encoded_result
+                matched = b64decode(value) if kind == "bytes" else str(value)
+
+            detections.append(Detection(
+                result=matched,
+                offset=fields["offset"],
+                line=fields["line"],
+                rule_id=fields["rule_id"],
+                score=fields["score"]
+            ))
+
+        exceptions: Optional[List[DetectionException]] = None if decoded["exception"] is None else [
+            DetectionException(expression=fields["expression"], message=fields["message"])
+            for fields in decoded["exception"]
+        ]
+
+    except (KeyError, TypeError, ValueError) as exception:
+        raise ValueError(f"Malformed cached detection result: {exception}") from exception
+
+    return DetectionResult(ok=detections, exception=exceptions)
+
+
+class ResultCache:
+    """Store detection results keyed by (blob hexsha, ruleset name, ruleset version)."""
+
+    def __init__(self, path: str) -> None:
+        """Open or create a result cache database.
+
+        Args:
+            path: Path of the sqlite database file.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.path = path
+        self.connection = sqlite3.connect(path)
+
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] < CACHE_SCHEMA_VERSION:
+            # Rows of older versions are pickles, which are never loaded.
+            self.connection.executescript(f"""
+                DROP TABLE IF EXISTS detections;
+                DROP TABLE IF EXISTS rulesets;
+                PRAGMA user_version = {CACHE_SCHEMA_VERSION};
+            """)
+
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS detections (
+                hexsha TEXT NOT NULL,
+                ruleset TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (hexsha, ruleset, version)
+            );
+            CREATE TABLE IF NOT EXISTS rulesets (
+                name TEXT PRIMARY KEY,
+                version TEXT NOT NULL
+            );
+        """)
+        self._pending: List[Tuple[str, str, str, str]] = []
+
+    @classmethod
+    def for_repo(cls, repo: Repo) -> ResultCache:
+        """Open the result cache stored under the repository git directory.
+
+        Args:
+            repo: Git repository object to be worked on.
+
+        Returns:
+            Result cache located at `.git/envprotect/cache.sqlite3`.
+        """
+        return cls(path=os.path.join(repo.git_dir, CACHE_DIR_NAME, CACHE_FILE_NAME))
+
+    def sync_versions(self, rulesets: List[RuleSet]) -> None:
+        """Invalidate cached entries of rulesets whose version has changed.
+
+        Args:
+            rulesets: List of ruleset objects about to be run.
+        """
+        for ruleset in rulesets:
+            row = self.connection.execute(
+                "SELECT version FROM rulesets WHERE name = ?", (ruleset.name,)
+            ).fetchone()
+
+            if row is not None and row[0] == ruleset.version:
+                continue
+
+            self.connection.execute("DELETE FROM detections WHERE ruleset = ?", (ruleset.name,))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO rulesets (name, version) VALUES (?, ?)", (ruleset.name, ruleset.version)
+            )
+
+        self.connection.commit()
+
+    def get(self, hexsha: str, ruleset: RuleSet) -> Optional[DetectionResult]:
+        """Fetch a cached detection result.
+
+        Args:
+            hexsha: Hex SHA of the scanned blob.
+            ruleset: Ruleset object the detection was made with.
+
+        Returns:
+            The cached detection result or None on a cache miss. Rows which can't be decoded miss.
+        """
+        row = self.connection.execute(
+            "SELECT result FROM detections WHERE hexsha = ? AND ruleset = ? AND version = ?",
+            (hexsha, ruleset.name, ruleset.version)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        try:
+            return decode_result(row[0])
+        except ValueError:
+            return None
+
+    def put(self, hexsha: str, ruleset: RuleSet, result: DetectionResult) -> None:
+        """Queue a detection result to be stored on the next flush.
+
+        Results holding anything but detections and detection exceptions aren't cached.
+
+        Args:
+            hexsha: Hex SHA of the scanned blob.
+            ruleset: Ruleset object the detection was made with.
+            result: Detection result to be cached.
+        """
+        document = encode_result(result)
+
+        if document is not None:
+            self._pending.append((hexsha, ruleset.name, ruleset.version, document))
+
+    def flush(self) -> None:
+        """Write queued detection results to the database."""
+        if self._pending:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO detections (hexsha, ruleset, version, result) VALUES (?, ?, ?, ?)",
+                self._pending
+            )
+            self.connection.commit()
+            self._pending = []
+
+    def close(self) -> None:
+        """Flush queued results and close the database."""
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self) -> ResultCache:
+        """Enter cache context.
+
+        Returns:
+            The cache itself.
+        """
+        return self
+
+    def __exit__(self,
+                 exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        """Close the cache on leaving the context.
+
+        Args:
+            exc_type: Type of the exception raised inside the context.
+            exc_value: Exception raised inside the context.
+            traceback: Traceback of the exception raised inside the context.
+        """
+        self.close()
+
+
+__all__ = [
+    "CACHE_SCHEMA_VERSION", "encode_result", "decode_result",
+    "ResultCache",
+]
@@ -3,74 +3,1151 @@
 Crawls across the files of the repo and executes sequential tasks.
 """
 
+from __future__ import annotations
+import asyncio
+import os
+from binascii import unhexlify
+from collections import Counter
+from itertools import islice
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
 from os import PathLike
-from typing import List, Union, Iterator, TypeVar, Any
+from typing import List, Dict, Union, BinaryIO, Iterable, Iterator, TypeVar, Any, Optional, Tuple
 from git import Repo, Blob
 from envprotect.exception.crawler import CrawlException
-from envprotect.rulebook import RuleSet
-from .detection import DetectionResult, DetectionException
+from envprotect.rulebook import RuleSet, RuleFactory, CompiledRulebook
+from .cache import ResultCache
+from .detection import Detection, DetectionResult, DetectionException
+from .diff import LineRanges, LineRangeKey, staged_diffs, range_diffs, commit_diffs, changed_blobs, \
+                  added_line_ranges, excerpt_lines, map_excerpt_offset
+from .filesystem import FileEntry, walk_files
+from .history import HistoryIndex
+from .objects import BatchObjectReader
+from .prefilter import PreFilter, SkipReason, SkippedEntry, is_binary
 from .result import Result, ResultType
+from .store import DetectionStore
+from .stream import DEFAULT_WINDOW_SIZE, PrefixedStream, iter_windows
 
 # pylint: disable=invalid-name
 K = TypeVar('K', bound=Union[ResultType, Any])
 E = TypeVar('E', bound=CrawlException)
 # pylint: enable=invalid-name
 
+CrawlEntry = Union[Blob, FileEntry]
+"""Git blob or filesystem file crawled for detections."""
+
+BlobDetections = Tuple[List[DetectionResult], Optional[CrawlException]]
+"""Detection results of a single blob paired with the crawl exception raised, if any."""
+
+RulesetScopes = Dict[str, List[str]]
+"""Directories a ruleset is restricted to, keyed by ruleset name. Rulesets without an entry apply everywhere."""
+
+_ChunkEntry = Tuple[CrawlEntry, List[Optional[DetectionResult]], List[int], Optional[LineRanges]]
+
+DEFAULT_BATCH_SIZE: int = 256
+"""Number of blobs handed to a worker process in a single task."""
+
+DEFAULT_QUEUE_SIZE: int = 64
+"""Number of entries buffered between two stages of the async pipeline."""
+
+DEFAULT_CONCURRENCY: int = 4
+"""Number of detections the async pipeline keeps in flight."""
+
+_WORKER_REPO: Optional[Repo] = None
+_WORKER_RULESETS: List[RuleSet] = []
+_WORKER_DRY_RUN: bool = True
+_WORKER_WINDOW_SIZE: Optional[int] = None
+_WORKER_READER: Optional[BatchObjectReader] = None
+_WORKER_SNIFF_SIZE: int = 0
+
 
 class CrawlResult(Result[K, E]):
     """Subclass Result for Crawler."""
 
+    def __init__(self,
+                 ok: K,
+                 exception: Optional[List[E]],
+                 skipped: Optional[List[SkippedEntry]] = None,
+                 store: Optional[DetectionStore] = None) -> None:
+        """Initialize a crawl result object.
+
+        Args:
+            ok: The ok element for result.
+            exception: Exception collection for result.
+            skipped: Entries skipped by the pre-filter along with the reason.
+            store: Compact store holding the detections, if the crawl was made into one.
+        """
+        super().__init__(ok=ok, exception=exception)
+        self.skipped: List[SkippedEntry] = skipped or []
+        self.store = store
+
+    @property
+    def skip_counts(self) -> Dict[SkipReason, int]:
+        """Count skipped entries per reason.
+
+        Returns:
+            Number of skipped entries keyed by skip reason.
+        """
+        return dict(Counter(reason for _, reason in self.skipped))
+
+
+def detect_in_data(data: Union[bytes, memoryview],
+                   rulesets: List[RuleSet],
+                   dry_run: bool) -> BlobDetections:
+    """Run every ruleset over a single blob's data.
+
+    Pattern rules of all rulesets are matched in a single pass through the
+    compiled rulebook.
+
+    Args:
+        data: Raw blob data or a view over a mapped file to run detections on.
+        rulesets: List of ruleset objects.
+        dry_run: Flag for turning on mutation for detection.
+
+    Returns:
+        Detection results for the blob and the crawl exception raised, if any.
+    """
+    try:
+        return RuleFactory.compile_rulebook(rulesets).detect(target=data, apply=not dry_run), None
+
+    except DetectionException as exception:
+        return [], CrawlException(from_exc=exception)
+
+
+def detect_in_stream(stream: Union[BinaryIO, Any],
+                     rulesets: List[RuleSet],
+                     dry_run: bool,
+                     window_size: int = DEFAULT_WINDOW_SIZE) -> BlobDetections:
+    """Run every ruleset over overlapping windows of a stream.
+
+    Windows overlap by the largest `max_match_length` of the rulesets. A
+    detection starting in the overlap at the end of a window is left to the
+    following window, so matches are reported once with stream offsets.
+    As when matching the whole stream, a detection starting inside one
+    already reported by the same rule is dropped, such as the tail of a
+    token which started before the window.
+
+    Args:
+        stream: Readable binary stream of the blob.
+        rulesets: List of ruleset objects.
+        dry_run: Flag for turning on mutation for detection.
+        window_size: Size of a single window in bytes.
+
+    Returns:
+        Detection results for the blob and the crawl exception raised, if any.
+    """
+    rulebook: CompiledRulebook = RuleFactory.compile_rulebook(rulesets)
+    overlap: int = max((ruleset.max_match_length for ruleset in rulesets), default=0)
+    window_size = max(window_size, 2 * overlap)
+    detections: List[List[Any]] = [[] for _ in rulesets]
+    exceptions: List[List[DetectionException]] = [[] for _ in rulesets]
+    # Stream offset up to which the last reported detection of a ruleset's rule extends.
+    reaches: Dict[Tuple[int, Optional[str]], int] = {}
+
+    try:
+        for offset, window, is_last in iter_windows(stream, window_size, overlap):
+            boundary = len(window) if is_last else window_size - overlap
+
+            for index, detection_result in enumerate(rulebook.detect(target=window, apply=not dry_run)):
+                for detection in detection_result.ok or []:
+                    if isinstance(detection, Detection) and detection.offset is not None:
+                        if detection.offset >= boundary:
+                            continue
+
+                        detection.offset += offset
+                        rule_key = (index, detection.rule_id)
+
+                        if detection.offset < reaches.get(rule_key, 0):
+                            continue
+
+                        result = detection.result
+                        reaches[rule_key] = detection.offset + (
+                            len(result) if isinstance(result, (str, bytes, bytearray, memoryview)) else 0
+                        )
+
+                    detections[index].append(detection)
+
+                exceptions[index].extend(detection_result.exception or [])
+
+    except DetectionException as exception:
+        return [], CrawlException(from_exc=exception)
+
+    return [
+        DetectionResult(ok=ruleset_detections, exception=ruleset_exceptions or None)
+        for ruleset_detections, ruleset_exceptions in zip(detections, exceptions)
+    ], None
+
+
+def detect_in_blob(stream: Union[BinaryIO, Any],
+                   rulesets: List[RuleSet],
+                   dry_run: bool,
+                   line_ranges: Optional[LineRanges] = None,
+                   window_size: Optional[int] = None) -> BlobDetections:
+    """Run every ruleset over a blob, optionally restricted to some of its lines.
+
+    Detections made on a line-restricted excerpt get their offset mapped back
+    to the blob and their line number filled in. Unrestricted blobs are
+    streamed in windows if a window size is passed and read whole otherwise.
+
+    Args:
+        stream: Readable binary stream of the blob.
+        rulesets: List of ruleset objects.
+        dry_run: Flag for turning on mutation for detection.
+        line_ranges: Line ranges to restrict detection to. Whole blob is scanned if not passed.
+        window_size: Size of a single streamed window in bytes.
+
+    Returns:
+        Detection results for the blob and the crawl exception raised, if any.
+    """
+    if line_ranges is None:
+        if window_size is not None:
+            return detect_in_stream(stream=stream, rulesets=rulesets, dry_run=dry_run, window_size=window_size)
+
+        return detect_in_data(data=stream.read(), rulesets=rulesets, dry_run=dry_run)
+
+    excerpt, line_map = excerpt_lines(stream.read(), line_ranges)
+    detections, exception = detect_in_data(data=excerpt, rulesets=rulesets, dry_run=dry_run)
+
+    for detection_result in detections:
+        for detection in detection_result.ok or []:
+            if not isinstance(detection, Detection) or detection.offset is None:
+                continue
+
+            if (mapped := map_excerpt_offset(detection.offset, line_map)) is not None:
+                detection.line, detection.offset = mapped
+
+    return detections, exception
+
+
+def sniff_stream(stream: Union[BinaryIO, Any], sniff_size: int) -> Optional[Union[BinaryIO, Any]]:
+    """Run the binary check on the leading bytes of a stream without losing them.
+
+    Args:
+        stream: Readable binary stream of the entry.
+        sniff_size: Number of leading bytes searched for NUL bytes. Nothing is checked if set to 0.
+
+    Returns:
+        Stream reading the whole entry or None if the entry looks binary.
+    """
+    if sniff_size <= 0:
+        return stream
+
+    head: bytes = stream.read(sniff_size)
+
+    if is_binary(head, sniff_size):
+        return None
+
+    return PrefixedStream(head, stream)
+
+
+def detect_in_entry(entry: CrawlEntry,
+                    rulesets: List[RuleSet],
+                    dry_run: bool,
+                    line_ranges: Optional[LineRanges] = None,
+                    window_size: Optional[int] = None,
+                    sniff_size: int = 0) -> Optional[BlobDetections]:
+    """Run every ruleset over a crawl entry.
+
+    Filesystem files are detected on their memory-mapped buffer, which is
+    backed by the page cache and needs neither copying nor windowing. The
+    binary check runs on the data read for detection, so the entry is read
+    once.
+
+    Args:
+        entry: Git blob or filesystem file.
+        rulesets: List of ruleset objects.
+        dry_run: Flag for turning on mutation for detection.
+        line_ranges: Line ranges to restrict detection to. Whole entry is scanned if not passed.
+        window_size: Size of a single streamed window in bytes.
+        sniff_size: Number of leading bytes searched for NUL bytes. Binary check is skipped if set to 0.
+
+    Returns:
+        Detection results for the entry and the crawl exception raised, if any, or None if the entry looks binary.
+    """
+    if isinstance(entry, FileEntry) and line_ranges is None:
+        try:
+            with entry.open_buffer() as buffer:
+                if is_binary(buffer, sniff_size):
+                    return None
+
+                detected = detect_in_data(data=buffer, rulesets=rulesets, dry_run=dry_run)
+
+                # Detections get stamped with the hex SHA, hashed while the file is still mapped.
+                if any(detection_result.ok for detection_result in detected[0]):
+                    entry.hash_data(buffer)
+
+                return detected
+
+        except OSError as exception:
+            return [], CrawlException(expression=entry.path, from_exc=exception)
+
+    if (stream := sniff_stream(entry.data_stream, sniff_size)) is None:
+        return None
+
+    return detect_in_blob(
+        stream=stream, rulesets=rulesets, dry_run=dry_run, line_ranges=line_ranges, window_size=window_size
+    )
+
+
+def read_entry(entry: CrawlEntry) -> bytes:
+    """Read the whole data of a crawl entry.
+
+    Args:
+        entry: Git blob or filesystem file.
+
+    Returns:
+        Raw data of the entry.
+    """
+    if isinstance(entry, FileEntry):
+        with open(entry.abspath, "rb") as file:
+            return file.read()
+
+    data: bytes = entry.data_stream.read()
+    return data
+
+
+def detect_in_objects(reader: BatchObjectReader,
+                      tasks: List[Tuple[str, List[int], Optional[LineRanges]]],
+                      rulesets: List[RuleSet],
+                      dry_run: bool,
+                      window_size: Optional[int] = None,
+                      sniff_size: int = 0) -> List[Optional[BlobDetections]]:
+    """Run rulesets over many blobs read in pack order through a batch reader.
+
+    Args:
+        reader: Batch object reader of the repository.
+        tasks: Hex SHAs of the blobs, each paired with the indices of the
+            rulesets to run on it and the line ranges to restrict detection to.
+        rulesets: List of ruleset objects.
+        dry_run: Flag for turning on mutation for detection.
+        window_size: Size of a single streamed window in bytes.
+        sniff_size: Number of leading bytes searched for NUL bytes. Binary check is skipped if set to 0.
+
+    Returns:
+        Per-blob detection results, in the same order as `tasks`. Blobs which look binary have None.
+    """
+    order = sorted(range(len(tasks)), key=lambda index: reader.pack_position(tasks[index][0]))
+    results: List[Optional[BlobDetections]] = [([], None)] * len(tasks)
+
+    for position, (hexsha, stream) in enumerate(reader.iter_streams([tasks[index][0] for index in order])):
+        index = order[position]
+        _, ruleset_indices, line_ranges = tasks[index]
+
+        if stream is None:
+            results[index] = [], CrawlException(expression=hexsha, message=f"\nObject {hexsha} is missing.")
+            continue
+
+        if (sniffed := sniff_stream(stream, sniff_size)) is None:
+            results[index] = None
+            continue
+
+        results[index] = detect_in_blob(
+            stream=sniffed,
+            rulesets=[rulesets[ruleset_index] for ruleset_index in ruleset_indices],
+            dry_run=dry_run,
+            line_ranges=line_ranges,
+            window_size=window_size
+        )
+
+    return results
+
+
+def _init_worker(repo_dir: str,
+                 rulesets: List[RuleSet],
+                 dry_run: bool,
+                 window_size: Optional[int],
+                 bulk_read: bool = False,
+                 sniff_size: int = 0) -> None:
+    """Open a per-process repository handle and keep the rulesets around.
+
+    Args:
+        repo_dir: Path of the repository to be opened by the worker.
+        rulesets: List of ruleset objects.
+        dry_run: Flag for turning on mutation for detection.
+        window_size: Size of a single streamed window in bytes.
+        bulk_read: Read blobs of a batch in pack order through a single `cat-file` pipe.
+        sniff_size: Number of leading bytes searched for NUL bytes. Binary check is skipped if set to 0.
+    """
+    # pylint: disable=global-statement
+    global _WORKER_REPO, _WORKER_RULESETS, _WORKER_DRY_RUN, _WORKER_WINDOW_SIZE, _WORKER_READER, _WORKER_SNIFF_SIZE
+    # pylint: enable=global-statement
+    _WORKER_REPO = Repo(repo_dir)
+    _WORKER_RULESETS = rulesets
+    _WORKER_DRY_RUN = dry_run
+    _WORKER_WINDOW_SIZE = window_size
+    _WORKER_READER = BatchObjectReader(_WORKER_REPO) if bulk_read else None
+    _WORKER_SNIFF_SIZE = sniff_size
+
+
+def init_shared_worker(rulesets: List[RuleSet]) -> None:
+    """Install rulesets in a worker process shared by crawls of many repositories.
+
+    Use as the initializer of a process pool passed to `Crawler.acrawl`
+    along with the same `shared_rulesets`. Rulesets are unpickled once per
+    worker, keeping their compiled rulebooks warm across entries and
+    repositories.
+
+    Args:
+        rulesets: Every ruleset the crawls may use.
+    """
+    # pylint: disable=global-statement
+    global _WORKER_RULESETS
+    # pylint: enable=global-statement
+    _WORKER_RULESETS = rulesets
+
+
+def _detect_shared(data: bytes,
+                   ruleset_indices: List[int],
+                   dry_run: bool,
+                   line_ranges: Optional[LineRanges]) -> BlobDetections:
+    """Detect secrets in an entry inside a shared worker process.
+
+    Args:
+        data: Raw data of the entry.
+        ruleset_indices: Indices of the worker's rulesets to run on the entry.
+        dry_run: Flag for turning on mutation for detection.
+        line_ranges: Line ranges to restrict detection to.
+
+    Returns:
+        Detection results for the entry and the crawl exception raised, if any.
+    """
+    return detect_in_blob(
+        stream=BytesIO(data),
+        rulesets=[_WORKER_RULESETS[index] for index in ruleset_indices],
+        dry_run=dry_run,
+        line_ranges=line_ranges
+    )
+
+
+def _detect_batch(tasks: List[Tuple[str, List[int], Optional[LineRanges]]]) -> List[Optional[BlobDetections]]:
+    """Detect secrets over a batch of blobs inside a worker process.
+
+    Args:
+        tasks: Hex SHAs of the blobs to be read from the worker repository, each
+            paired with the indices of the rulesets to run on it and the line
+            ranges to restrict detection to.
+
+    Returns:
+        Per-blob detection results, in the same order as `tasks`. Blobs which look binary have None.
+    """
+    assert _WORKER_REPO is not None, "Worker repository was not initialized."
+
+    if _WORKER_READER is not None:
+        return detect_in_objects(
+            reader=_WORKER_READER,
+            tasks=tasks,
+            rulesets=_WORKER_RULESETS,
+            dry_run=_WORKER_DRY_RUN,
+            window_size=_WORKER_WINDOW_SIZE,
+            sniff_size=_WORKER_SNIFF_SIZE
+        )
+
+    results: List[Optional[BlobDetections]] = []
+
+    for hexsha, ruleset_indices, line_ranges in tasks:
+        if (stream := sniff_stream(_WORKER_REPO.odb.stream(unhexlify(hexsha)), _WORKER_SNIFF_SIZE)) is None:
+            results.append(None)
+            continue
+
+        results.append(detect_in_blob(
+            stream=stream,
+            rulesets=[_WORKER_RULESETS[index] for index in ruleset_indices],
+            dry_run=_WORKER_DRY_RUN,
+            line_ranges=line_ranges,
+            window_size=_WORKER_WINDOW_SIZE
+        ))
+
+    return results
+
+
+def in_scope(path: str, directories: Optional[List[str]]) -> bool:
+    """Check whether a path lies below any of the directories of a scope.
+
+    Args:
+        path: Path relative to the crawl root, `/`-separated.
+        directories: Directories relative to the crawl root. The root itself is `""`. Unrestricted if None.
+
+    Returns:
+        True if the path is covered by the scope.
+    """
+    if directories is None:
+        return True
+
+    return any(not directory or path.startswith(directory + "/") for directory in directories)
+
 
 class Crawler():
     """Standardize crawling over files in repository and applying operation."""
 
-    def __init__(self, source: Union[Repo, PathLike[str]]) -> None:
+    def __init__(self,
+                 source: Union[Repo, PathLike[str], str],
+                 files: Optional[Iterable[CrawlEntry]] = None,
+                 line_ranges: Optional[Dict[LineRangeKey, LineRanges]] = None,
+                 respect_gitignore: bool = True) -> None:
         """Initialize new crawler object.
 
+        A path source is crawled on the filesystem rather than through git,
+        covering untracked files and directories outside of any repository.
+
         Args:
             source: Repo object or os path signifying root of repository.
+            files: Blobs to crawl instead of the full HEAD tree.
+            line_ranges: Line ranges to restrict detection to, keyed by path and blob hex SHA.
+            respect_gitignore: Prune directories excluded by `.gitignore` files when crawling a path.
         """
-        self.source: Union[Repo, PathLike[str]] = source
-        self.files: Iterator[Blob]
+        self.source: Union[Repo, PathLike[str], str] = source
+        self.files: Iterator[CrawlEntry]
+        self.line_ranges: Dict[LineRangeKey, LineRanges] = line_ranges or {}
+        self.scopes: RulesetScopes = {}
+        self.history: Optional[HistoryIndex] = None
 
         if isinstance(self.source, Repo):
-            self.files = self.source.tree().traverse()
+            if files is not None:
+                self.files = iter(files)
+            else:
+                self.files = (item for item in self.source.tree().traverse() if item.type == "blob")
+        elif files is not None:
+            self.files = iter(files)
         else:
-            # TODO: Implment a file-crawl system
-            self.files = iter(())
+            self.files = walk_files(os.fspath(self.source), respect_gitignore=respect_gitignore)
+
+    @classmethod
+    def from_diff(cls,
+                  repo: Repo,
+                  staged: bool = False,
+                  rev_range: Optional[str] = None,
+                  commits: Optional[List[str]] = None,
+                  added_lines_only: bool = False) -> Crawler:
+        """Create a crawler over changed blobs only.
+
+        Exactly one of `staged`, `rev_range` or `commits` selects the changes
+        to be crawled.
+
+        Args:
+            repo: Git repository object to be worked on.
+            staged: Crawl changes staged in the index against HEAD.
+            rev_range: Crawl changes between two revisions given as `<base>..<head>` or `<base>...<head>`.
+            commits: Crawl changes introduced by each of the listed commits.
+            added_lines_only: Restrict detection to added hunks of the changed blobs.
+
+        Returns:
+            Crawler object over the changed blobs.
+
+        Raises:
+            ValueError: Raised if no or more than one change selection is passed.
+        """
+        if sum([staged, rev_range is not None, commits is not None]) != 1:
+            raise ValueError("Exactly one of staged, rev_range or commits must be passed.")
+
+        if staged:
+            diffs = staged_diffs(repo, create_patch=added_lines_only)
+        elif rev_range is not None:
+            diffs = range_diffs(repo, rev_range, create_patch=added_lines_only)
+        else:
+            diffs = commit_diffs(repo, commits or [], create_patch=added_lines_only)
+
+        return cls(
+            source=repo,
+            files=list(changed_blobs(diffs)),
+            line_ranges=added_line_ranges(diffs) if added_lines_only else None
+        )
+
+    @classmethod
+    def from_history(cls,
+                     repo: Repo,
+                     rev_range: Optional[str] = None,
+                     max_count: Optional[int] = None,
+                     index_path: Optional[str] = None) -> Crawler:
+        """Create a crawler over every unique blob of the repository history.
+
+        Each blob is crawled once, however many commits and paths it appears
+        at. Its occurrences can be looked up in the crawler's `history` index.
+
+        Args:
+            repo: Git repository object to be worked on.
+            rev_range: Revision range to walk, such as `v1.0..HEAD`. All refs are walked if not passed.
+            max_count: Maximum number of commits to walk.
+            index_path: Path of the sqlite history index. A temporary file is used if not passed.
+
+        Returns:
+            Crawler object over the unique blobs of the history.
+        """
+        history = HistoryIndex(repo=repo, path=index_path)
+        history.build(rev_range=rev_range, max_count=max_count)
+
+        crawler = cls(source=repo, files=history.iter_blobs())
+        crawler.history = history
+
+        return crawler
 
     def crawl_and_detect(self,
                          rulesets: List[RuleSet],
-                         dry_run: bool = False) -> CrawlResult[List[DetectionResult], CrawlException]:
+                         dry_run: bool = False,
+                         workers: int = 1,
+                         batch_size: int = DEFAULT_BATCH_SIZE,
+                         cache: Optional[ResultCache] = None,
+                         window_size: Optional[int] = DEFAULT_WINDOW_SIZE,
+                         prefilter: Optional[PreFilter] = None,
+                         bulk_read: bool = False,
+                         scopes: Optional[RulesetScopes] = None,
+                         store: Optional[DetectionStore] = None
+                         ) -> CrawlResult[List[DetectionResult], CrawlException]:
         """Crawl and perform non-mutation detections.
 
         Crawl over files of a repository in an iterator, perform detections and
-        collect ordered detection results.
+        collect ordered detection results. Results keep the crawl order
+        irrespective of the worker count or the read order.
+
+        Args:
+            rulesets: List of ruleset objects.
+            dry_run: Flag for turning on mutation for detection.
+            workers: Number of worker processes to run detections on. With more than one, blob SHAs are
+                handed out in batches to a process pool where every worker reads blobs through its own Repo handle.
+            batch_size: Number of blobs sent to a worker in one task.
+            cache: Persistent result cache. Only blobs without a cached result for a ruleset are read and
+                detected. Blobs restricted to line ranges bypass the cache.
+            window_size: Size of a single streamed window in bytes, keeping memory bounded by it. Blobs are read
+                whole if set to None.
+            prefilter: Pre-filter deciding which entries are passed on to detection. Rejected entries are
+                reported in the result along with the reason. The binary check runs on the data read for detection.
+            bulk_read: Read blobs chunk by chunk in pack order through one pipelined `git cat-file --batch`
+                process.
+            scopes: Directories rulesets are restricted to, such as the subprojects declaring their dependencies.
+                Scoped rulesets only run on entries below their directories.
+            store: Compact store to collect detections into, for crawls with too many detections to keep as objects.
+                The result then only lists detection results carrying exceptions.
+
+        Returns:
+            Packed list of exceptions raised while crawling.
+        """
+        crawls: List[DetectionResult] = []
+        crawl_exception: List[CrawlException] = []
+        skipped: List[SkippedEntry] = []
+        self.scopes = scopes or {}
+
+        sniff_size = prefilter.sniff_size if prefilter is not None else 0
+
+        if prefilter is not None:
+            self.files = self._prefilter_files(self.files, prefilter, skipped, window_size)
+
+        if cache is not None:
+            cache.sync_versions(rulesets)
+
+        for iter_file, detected in self._detect_all(
+                rulesets, dry_run, workers, batch_size, cache, window_size, bulk_read, sniff_size):
+            if detected is None:
+                skipped.append((iter_file.path, SkipReason.BINARY))
+                continue
+
+            detections, exception = detected
+            self._stamp(iter_file, detections)
+            self._keep(detections, crawls, store)
+
+            if exception is not None:
+                crawl_exception.append(exception)
+
+        if cache is not None:
+            cache.flush()
+
+        return CrawlResult(
+            ok=crawls, exception=crawl_exception if crawl_exception != [] else None, skipped=skipped, store=store
+        )
+
+    async def acrawl(self,
+                     rulesets: List[RuleSet],
+                     dry_run: bool = False,
+                     executor: Optional[Executor] = None,
+                     concurrency: int = DEFAULT_CONCURRENCY,
+                     queue_size: int = DEFAULT_QUEUE_SIZE,
+                     cache: Optional[ResultCache] = None,
+                     prefilter: Optional[PreFilter] = None,
+                     shared_rulesets: Optional[List[RuleSet]] = None,
+                     scopes: Optional[RulesetScopes] = None,
+                     store: Optional[DetectionStore] = None
+                     ) -> CrawlResult[List[DetectionResult], CrawlException]:
+        """Crawl and perform non-mutation detections without blocking the event loop.
+
+        Runs as a pipeline of enumerate, read, detect and collect stages
+        joined by bounded queues, so a slow stage holds back the ones before
+        it instead of buffering the crawl. Enumeration and reads go through a
+        single I/O thread of the crawler, as repository handles aren't
+        thread-safe. Detection runs on the passed executor, which may be a
+        process pool shared by crawlers of many repositories. Entries are read
+        whole and results keep the crawl order.
 
         Args:
             rulesets: List of ruleset objects.
             dry_run: Flag for turning on mutation for detection.
+            executor: Executor to run detections on. The event loop's default executor is used if not passed.
+            concurrency: Number of detections kept in flight.
+            queue_size: Number of entries buffered between two stages.
+            cache: Persistent result cache to skip detection of unchanged blobs.
+            prefilter: Pre-filter deciding which entries are passed on to detection.
+            shared_rulesets: Rulesets installed in the executor's workers by `init_shared_worker`. Entries are
+                sent with indices into them instead of the pickled rulesets, unless a ruleset isn't one of them.
+            scopes: Directories rulesets are restricted to, such as the subprojects declaring their dependencies.
+            store: Compact store to collect detections into, for crawls with too many detections to keep as objects.
 
         Returns:
             Packed list of exceptions raised while crawling.
         """
+        loop = asyncio.get_running_loop()
+        io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="envprotect-io")
+        entries: asyncio.Queue[Optional[CrawlEntry]] = asyncio.Queue(queue_size)
+        reads: asyncio.Queue[Optional[Tuple[int, Optional[str], _ChunkEntry, Optional[bytes]]]] = \
+            asyncio.Queue(queue_size)
+        detected: asyncio.Queue[Optional[Tuple[int, CrawlEntry, BlobDetections]]] = asyncio.Queue(queue_size)
         crawls: List[DetectionResult] = []
         crawl_exception: List[CrawlException] = []
+        skipped: List[SkippedEntry] = []
+        shared_indices: Dict[int, int] = {id(ruleset): index for index, ruleset in enumerate(shared_rulesets or [])}
+        self.scopes = scopes or {}
+
+        if cache is not None:
+            cache.sync_versions(rulesets)
+
+        async def enumerate_stage() -> None:
+            while (entry := await loop.run_in_executor(io_executor, next, self.files, None)) is not None:
+                await entries.put(entry)
+
+            await entries.put(None)
+
+        async def read_stage() -> None:
+            sequence = 0
+
+            while (entry := await entries.get()) is not None:
+                if prefilter is not None and (reason := await loop.run_in_executor(
+                        io_executor, partial(prefilter.check_blob, entry, sniff=False))) is not None:
+                    skipped.append((entry.path, reason))
+                    continue
+
+                hexsha = await loop.run_in_executor(io_executor, self._hexsha, entry, cache)
+                line_ranges = self._line_ranges(entry.path, hexsha)
+                cached = self._lookup(hexsha, rulesets, cache if line_ranges is None else None)
+                missing = self._missing(entry.path, rulesets, cached)
+                data = await loop.run_in_executor(io_executor, read_entry, entry) if missing else None
+
+                if prefilter is not None and data is not None and prefilter.is_binary(data):
+                    skipped.append((entry.path, SkipReason.BINARY))
+                    continue
+
+                await reads.put((sequence, hexsha, (entry, cached, missing, line_ranges), data))
+                sequence += 1
+
+            for _ in range(concurrency):
+                await reads.put(None)
+
+        async def detect_stage() -> None:
+            while (item := await reads.get()) is not None:
+                sequence, hexsha, (entry, cached, missing, line_ranges), data = item
+
+                if not missing:
+                    await detected.put((sequence, entry, ([result for result in cached if result is not None], None)))
+                    continue
+
+                shared = [
+                    shared_indices[id(rulesets[index])] for index in missing if id(rulesets[index]) in shared_indices
+                ]
+
+                # Rulesets the workers weren't initialized with, such as unshared instances, are sent along.
+                detect = partial(
+                    _detect_shared,
+                    data or b"",
+                    shared,
+                    dry_run,
+                    line_ranges
+                ) if len(shared) == len(missing) else partial(
+                    detect_in_blob,
+                    stream=BytesIO(data or b""),
+                    rulesets=[rulesets[index] for index in missing],
+                    dry_run=dry_run,
+                    line_ranges=line_ranges
+                )
+                fresh: BlobDetections = await loop.run_in_executor(executor, detect)
+
+                if isinstance(entry, FileEntry) and data is not None and \
+                        any(detection_result.ok for detection_result in fresh[0]):
+                    entry.hash_data(data)
+
+                await detected.put((sequence, entry, self._merge(
+                    hexsha, rulesets, cached, missing, cache if line_ranges is None else None, fresh
+                )))
+
+            await detected.put(None)
+
+        async def collect_stage() -> None:
+            pending: Dict[int, Tuple[CrawlEntry, BlobDetections]] = {}
+            next_sequence = 0
+            finished = 0
+
+            while finished < concurrency:
+                if (item := await detected.get()) is None:
+                    finished += 1
+                    continue
+
+                pending[item[0]] = item[1], item[2]
+
+                while next_sequence in pending:
+                    entry, (detections, exception) = pending.pop(next_sequence)
+                    next_sequence += 1
+                    self._stamp(entry, detections)
+                    self._keep(detections, crawls, store)
+
+                    if exception is not None:
+                        crawl_exception.append(exception)
+
+        stages = [
+            asyncio.ensure_future(enumerate_stage()),
+            asyncio.ensure_future(read_stage()),
+            *(asyncio.ensure_future(detect_stage()) for _ in range(concurrency)),
+            asyncio.ensure_future(collect_stage()),
+        ]
+
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for stage in stages:
+                stage.cancel()
+
+            io_executor.shutdown(wait=False)
+
+        if cache is not None:
+            cache.flush()
+
+        return CrawlResult(
+            ok=crawls, exception=crawl_exception if crawl_exception != [] else None, skipped=skipped, store=store
+        )
+
+    @staticmethod
+    def _stamp(entry: CrawlEntry, detections: List[DetectionResult]) -> None:
+        """Record the blob and path detections were made in.
+
+        Args:
+            entry: Crawled blob or file.
+            detections: Detection results of the entry.
+        """
+        for detection_result in detections:
+            for detection in detection_result.ok or []:
+                if isinstance(detection, Detection):
+                    detection.hexsha, detection.path = entry.hexsha, entry.path
+
+    @staticmethod
+    def _keep(detections: List[DetectionResult],
+              crawls: List[DetectionResult],
+              store: Optional[DetectionStore]) -> None:
+        """Keep the detection results of an entry, as objects or as rows of a store.
+
+        Args:
+            detections: Stamped detection results of the entry.
+            crawls: Detection results collected by the crawl.
+            store: Compact store taking the detections. Results are kept whole if not passed.
+        """
+        if store is None:
+            crawls.extend(detections)
+            return
+
+        store.extend(detections)
+        crawls.extend(
+            DetectionResult(ok=[], exception=detection_result.exception)
+            for detection_result in detections if detection_result.exception
+        )
+
+    def _prefilter_files(self,
+                         files: Iterator[CrawlEntry],
+                         prefilter: PreFilter,
+                         skipped: List[SkippedEntry],
+                         window_size: Optional[int]) -> Iterator[CrawlEntry]:
+        """Drop entries rejected by the path and size stages of the pre-filter.
+
+        The binary check is left to detection, which reads the entry anyway.
+
+        Args:
+            files: Entries to be filtered.
+            prefilter: Pre-filter deciding which entries are passed on to detection.
+            skipped: List collecting the skipped entries along with the reason.
+            window_size: Size of a single streamed window in bytes. Blobs are read whole if set to None.
+
+        Yields:
+            Entries to be passed on to detection.
+        """
+        for iter_file in files:
+            # Line-restricted entries are read whole, others are streamed or mapped.
+            streamed = (window_size is not None or isinstance(iter_file, FileEntry)) and not (
+                self.line_ranges and (iter_file.path, iter_file.hexsha) in self.line_ranges
+            )
+
+            if (reason := prefilter.check_blob(iter_file, sniff=False, streamed=streamed)) is not None:
+                skipped.append((iter_file.path, reason))
+                continue
+
+            yield iter_file
+
+    def _detect_all(self,
+                    rulesets: List[RuleSet],
+                    dry_run: bool,
+                    workers: int,
+                    batch_size: int,
+                    cache: Optional[ResultCache],
+                    window_size: Optional[int],
+                    bulk_read: bool = False,
+                    sniff_size: int = 0) -> Iterator[Tuple[CrawlEntry, Optional[BlobDetections]]]:
+        """Yield per-blob detections, serially or through a process pool.
+
+        The process pool is fed in chunks of blobs with one chunk of lookahead,
+        keeping memory bounded on crawls over millions of blobs.
+
+        Args:
+            rulesets: List of ruleset objects.
+            dry_run: Flag for turning on mutation for detection.
+            workers: Number of worker processes to run detections on.
+            batch_size: Number of blobs sent to a worker in one task.
+            cache: Persistent result cache to skip detection of unchanged blobs.
+            window_size: Size of a single streamed window in bytes.
+            bulk_read: Read blobs in pack order through a batch object reader.
+            sniff_size: Number of leading bytes searched for NUL bytes. Binary check is skipped if set to 0.
+
+        Yields:
+            Each blob with its detection results and the crawl exception raised, if any, or None if it looks binary.
+        """
+        if bulk_read and workers <= 1 and isinstance(self.source, Repo):
+            reader = BatchObjectReader(self.source)
 
-        while iter_file := next(self.files):
             try:
-                file_data = iter_file.data_stream.read()
-                crawls.extend(
-                    [ruleset.detect_secrets(target=file_data, apply=not dry_run) for ruleset in rulesets]
+                while chunk := list(islice(self.files, batch_size * 4)):
+                    entries = self._prepare(chunk, rulesets, cache)
+                    tasks = self._tasks(entries)
+                    detected = detect_in_objects(reader, tasks, rulesets, dry_run, window_size, sniff_size)
+                    yield from self._collect(rulesets, cache, entries, iter(detected))
+            finally:
+                reader.close()
+            return
+
+        if workers <= 1 or not isinstance(self.source, Repo):
+            for iter_file in self.files:
+                hexsha = self._hexsha(iter_file, cache)
+                line_ranges = self._line_ranges(iter_file.path, hexsha)
+                blob_cache = cache if line_ranges is None else None
+                cached = self._lookup(hexsha, rulesets, blob_cache)
+                missing = self._missing(iter_file.path, rulesets, cached)
+
+                if not missing:
+                    yield iter_file, ([result for result in cached if result is not None], None)
+                    continue
+
+                fresh = detect_in_entry(
+                    entry=iter_file,
+                    rulesets=[rulesets[index] for index in missing],
+                    dry_run=dry_run,
+                    line_ranges=line_ranges,
+                    window_size=window_size,
+                    sniff_size=sniff_size
+                )
+
+                if fresh is None:
+                    yield iter_file, None
+                    continue
+
+                yield iter_file, self._merge(hexsha, rulesets, cached, missing, blob_cache, fresh)
+            return
+
+        repo_dir: str = self.source.working_tree_dir or self.source.git_dir
+        chunk_size: int = batch_size * workers * 4
+
+        initargs = (repo_dir, rulesets, dry_run, window_size, bulk_read, sniff_size)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            pending: Optional[Tuple[List[_ChunkEntry], Iterator[Optional[BlobDetections]]]] = None
+
+            while chunk := list(islice(self.files, chunk_size)):
+                entries = self._prepare(chunk, rulesets, cache)
+                tasks = self._tasks(entries)
+                batches = [tasks[index:index + batch_size] for index in range(0, len(tasks), batch_size)]
+
+                # Executor.map submits every batch right away and yields in submission order.
+                submitted = (
+                    result for batch_result in executor.map(_detect_batch, batches) for result in batch_result
                 )
 
-            except DetectionException as exception:
-                crawl_exception.append(CrawlException(from_exc=exception))
+                if pending is not None:
+                    yield from self._collect(rulesets, cache, *pending)
+
+                pending = (entries, submitted)
+
+            if pending is not None:
+                yield from self._collect(rulesets, cache, *pending)
+
+    def _prepare(self,
+                 chunk: List[CrawlEntry],
+                 rulesets: List[RuleSet],
+                 cache: Optional[ResultCache]) -> List[_ChunkEntry]:
+        """Look up cached results of a chunk of blobs.
+
+        Args:
+            chunk: Blobs to be prepared.
+            rulesets: List of ruleset objects.
+            cache: Persistent result cache. Blobs restricted to line ranges bypass it.
+
+        Returns:
+            Each blob with its cached results, missing ruleset indices and line ranges.
+        """
+        entries: List[_ChunkEntry] = []
+
+        for iter_file in chunk:
+            line_ranges = self.line_ranges.get((iter_file.path, iter_file.hexsha))
+            cached = self._lookup(iter_file.hexsha, rulesets, cache if line_ranges is None else None)
+            missing = self._missing(iter_file.path, rulesets, cached)
+            entries.append((iter_file, cached, missing, line_ranges))
+
+        return entries
+
+    @staticmethod
+    def _tasks(entries: List[_ChunkEntry]) -> List[Tuple[str, List[int], Optional[LineRanges]]]:
+        """Create detection tasks for the blobs of a chunk with missing results.
+
+        Args:
+            entries: Chunk entries created by `_prepare`.
+
+        Returns:
+            Hex SHA, missing ruleset indices and line ranges of every blob to be detected.
+        """
+        return [
+            (iter_file.hexsha, missing, line_ranges)
+            for iter_file, _, missing, line_ranges in entries if missing
+        ]
+
+    def _collect(self,
+                 rulesets: List[RuleSet],
+                 cache: Optional[ResultCache],
+                 entries: List[_ChunkEntry],
+                 detected: Iterator[Optional[BlobDetections]]
+                 ) -> Iterator[Tuple[CrawlEntry, Optional[BlobDetections]]]:
+        """Merge a chunk of pool results with cached results, in crawl order.
+
+        Args:
+            rulesets: List of ruleset objects.
+            cache: Persistent result cache to store fresh results in.
+            entries: Chunk entries as prepared for the pool.
+            detected: Pool results of the entries with missing rulesets, in order.
+
+        Yields:
+            Each blob with its detection results and the crawl exception raised, if any, or None if it looks binary.
+        """
+        for iter_file, cached, missing, line_ranges in entries:
+            if not missing:
+                yield iter_file, ([result for result in cached if result is not None], None)
+                continue
+
+            if (fresh := next(detected)) is None:
+                yield iter_file, None
+                continue
+
+            yield iter_file, self._merge(
+                iter_file.hexsha, rulesets, cached, missing, cache if line_ranges is None else None, fresh
+            )
+
+    def _hexsha(self, entry: CrawlEntry, cache: Optional[ResultCache]) -> Optional[str]:
+        """Fetch the hex SHA of an entry ahead of detection, only if the cache or line ranges need it.
+
+        Filesystem files are hashed by reading them, so they are left unhashed otherwise.
+
+        Args:
+            entry: Crawled blob or file.
+            cache: Persistent result cache keyed by hex SHA.
+
+        Returns:
+            Hex SHA of the entry or None if nothing needs it yet.
+        """
+        if cache is None and not self.line_ranges:
+            return None
+
+        return entry.hexsha
+
+    def _line_ranges(self, path: str, hexsha: Optional[str]) -> Optional[LineRanges]:
+        """Look up the line ranges detection of an entry is restricted to.
+
+        Args:
+            path: Path of the entry, `/`-separated.
+            hexsha: Hex SHA of the entry, if known.
+
+        Returns:
+            Line ranges of the entry or None if the whole entry is detected.
+        """
+        return self.line_ranges.get((path, hexsha)) if hexsha is not None else None
+
+    def _missing(self, path: str, rulesets: List[RuleSet], cached: List[Optional[DetectionResult]]) -> List[int]:
+        """Select the rulesets which still have to run on an entry.
+
+        Args:
+            path: Path of the entry, `/`-separated.
+            rulesets: List of ruleset objects.
+            cached: Cached detection results, aligned with `rulesets`.
+
+        Returns:
+            Indices of the rulesets without a cached result whose scope covers the path.
+        """
+        return [
+            index for index, result in enumerate(cached)
+            if result is None and in_scope(path, self.scopes.get(rulesets[index].name))
+        ]
+
+    @staticmethod
+    def _lookup(hexsha: Optional[str],
+                rulesets: List[RuleSet],
+                cache: Optional[ResultCache]) -> List[Optional[DetectionResult]]:
+        """Fetch cached detection results of a blob for every ruleset.
+
+        Args:
+            hexsha: Hex SHA of the blob. Every ruleset misses if not known.
+            rulesets: List of ruleset objects.
+            cache: Persistent result cache. Every ruleset misses if not passed.
+
+        Returns:
+            Cached detection result or None, aligned with `rulesets`.
+        """
+        if cache is None or hexsha is None:
+            return [None] * len(rulesets)
+
+        return [cache.get(hexsha, ruleset) for ruleset in rulesets]
+
+    @staticmethod
+    def _merge(hexsha: Optional[str],
+               rulesets: List[RuleSet],
+               cached: List[Optional[DetectionResult]],
+               missing: List[int],
+               cache: Optional[ResultCache],
+               detected: BlobDetections) -> BlobDetections:
+        """Merge fresh detection results into cached ones and store them.
+
+        Args:
+            hexsha: Hex SHA of the blob. Results aren't stored if not known.
+            rulesets: List of ruleset objects.
+            cached: Cached detection results, aligned with `rulesets`.
+            missing: Indices of the rulesets that were freshly detected.
+            cache: Persistent result cache to store fresh results in.
+            detected: Fresh detection results for the `missing` rulesets and the crawl exception raised, if any.
+
+        Returns:
+            Detection results in ruleset order and the crawl exception raised, if any.
+        """
+        detections, exception = detected
+
+        if exception is not None:
+            return [result for result in cached if result is not None], exception
+
+        merged = list(cached)
+
+        for index, result in zip(missing, detections):
+            merged[index] = result
+
+            if cache is not None and hexsha is not None:
+                cache.put(hexsha, rulesets[index], result)
 
-        return CrawlResult(ok=crawls, exception=crawl_exception if crawl_exception != [] else None)
+        return [result for result in merged if result is not None], None
 
 
 __all__ = [
-    "Crawler", "CrawlResult",
+    "CrawlEntry", "RulesetScopes", "in_scope", "Crawler", "CrawlResult",
+    "init_shared_worker",
     "CrawlException"
 ]
@@ -2,12 +2,18 @@
 
 from __future__ import annotations
 import os
+import posixpath
 import re
-from os import PathLike
-from typing import List, Tuple, Dict, Union, Optional
+from concurrent.futures import Executor
+from functools import cached_property
+from typing import List, Tuple, Dict, Callable, Iterable, Iterator, Union, Optional, Pattern, TextIO
 from enum import Enum
 from git import Repo
 from envprotect.exception import StringParseException
+from .lockfile import ParsedDependency, iter_package_json, iter_package_lock, iter_yarn_lock, iter_poetry_lock
+from .lockfile import iter_gemfile_lock
+from .result import Result
+from .version import Version, VersionRange, parse_version, parse_range
 
 
 class DependencyFileType(str, Enum):
@@ -17,8 +23,25 @@ class DependencyFileType(str, Enum):
     """
 
     PY_REQUIREMENTS = 'requirements.txt'
+    PY_POETRY_LOCK = 'poetry.lock'
     JS_PACKAGE = 'package.json'
+    JS_PACKAGE_LOCK = 'package-lock.json'
+    JS_YARN_LOCK = 'yarn.lock'
     RB_GEMFILE = 'GEMFILE'
+    RB_GEMFILE_LOCK = 'Gemfile.lock'
+
+    @property
+    def ecosystem(self) -> str:
+        """Package registry the file type declares dependencies from.
+
+        Returns:
+            Ecosystem name shared by every file type of the language.
+        """
+        return ECOSYSTEMS[self.name.split("_", 1)[0]]
+
+
+ECOSYSTEMS: Dict[str, str] = {"PY": "pypi", "JS": "npm", "RB": "rubygems"}
+"""Ecosystem of every language alias of `DependencyFileType`."""
 
 
 dependency_file_type_mapping = {
@@ -28,6 +51,139 @@ dependency_file_type_mapping = {
 }
 """Dependency format and file type mapping registry."""
 
+StructuredParser = Callable[[TextIO], Iterator[ParsedDependency]]
+"""Streaming parser of a whole dependency file."""
+
+structured_parser_mapping: Dict[DependencyFileType, StructuredParser] = {
+    DependencyFileType.PY_POETRY_LOCK: iter_poetry_lock,
+    DependencyFileType.JS_PACKAGE: iter_package_json,
+    DependencyFileType.JS_PACKAGE_LOCK: iter_package_lock,
+    DependencyFileType.JS_YARN_LOCK: iter_yarn_lock,
+    DependencyFileType.RB_GEMFILE_LOCK: iter_gemfile_lock,
+}
+"""Structured parser and file type mapping registry. Takes precedence over line formats of the same file type."""
+
+IGNORED_LINE_PATTERN: Pattern[str] = re.compile(r"\s*(?:#.*)?")
+"""Blank and comment lines, which aren't dependency declarations."""
+
+DependencyParseResult = Result[List["DependencyBase"], StringParseException]
+"""Dependencies parsed from a file along with the errors of lines which couldn't be parsed."""
+
+
+class DependencyGrammar:
+    """Parse dependency lines of a single file type with precompiled patterns."""
+
+    def __init__(self, file_type: DependencyFileType, patterns: List[str]) -> None:
+        """Initialize new dependency grammar.
+
+        Args:
+            file_type: Dependency file type the grammar parses.
+            patterns: Dependency formats of the file type, capturing name and version string. Tried in order.
+        """
+        self.file_type = file_type
+        self.patterns: List[Pattern[str]] = [re.compile(pattern) for pattern in patterns]
+
+    def match(self, dep_string: str) -> Optional[Tuple[str, str]]:
+        """Match a line against the dependency formats, stopping at the first match.
+
+        Args:
+            dep_string: Line without its line terminator.
+
+        Returns:
+            Name and version string of the dependency, or None if no format matches.
+        """
+        for pattern in self.patterns:
+            match_result = pattern.fullmatch(dep_string)
+
+            if match_result is not None:
+                name, version_string = match_result.group(1, 2)
+                return name, version_string
+
+        return None
+
+    def parse_lines(self, lines: Iterable[str], source: Optional[str] = None) -> DependencyParseResult:
+        """Parse every dependency line of a file.
+
+        Blank and comment lines are skipped. Lines which don't match are
+        reported as errors without aborting the rest of the file.
+
+        Args:
+            lines: Lines of the dependency file.
+            source: Path of source file containing dependency. Kept for reducing back-referencing.
+
+        Returns:
+            Parsed dependencies with an exception per unparsable line.
+        """
+        dependencies: List[DependencyBase] = []
+        exceptions: List[StringParseException] = []
+
+        for line_no, line in enumerate(lines, start=1):
+            dep_string = line.rstrip("\r\n")
+
+            if IGNORED_LINE_PATTERN.fullmatch(dep_string) is not None:
+                continue
+
+            parsed = self.match(dep_string)
+
+            if parsed is None:
+                exceptions.append(StringParseException(expression=f"{source}:{line_no}", message=f"""
+Could not parse line {line_no} as {self.file_type.value} dependency. Passed string: {dep_string}
+                """))
+                continue
+
+            dependencies.append(DependencyBase(name=parsed[0], version_string=parsed[1], source_path=source))
+
+        return Result(ok=dependencies, exception=exceptions)
+
+
+def compile_grammars() -> Dict[DependencyFileType, DependencyGrammar]:
+    """Compile the dependency formats of the mapping registry, grouped per file type.
+
+    Returns:
+        Grammar of every file type with a registered format.
+    """
+    patterns: Dict[DependencyFileType, List[str]] = {}
+
+    for pattern, file_type in dependency_file_type_mapping.items():
+        patterns.setdefault(file_type, []).append(pattern)
+
+    return {file_type: DependencyGrammar(file_type, file_patterns) for file_type, file_patterns in patterns.items()}
+
+
+DEPENDENCY_GRAMMARS: Dict[DependencyFileType, DependencyGrammar] = compile_grammars()
+"""Precompiled grammar per dependency file type. Recompile after extending the mapping registry."""
+
+
+_FILE_TYPE_BY_NAME: Dict[str, DependencyFileType] = {
+    file_type.value.lower(): file_type for file_type in DependencyFileType
+}
+
+ManifestPaths = Dict[str, Dict[DependencyFileType, str]]
+"""Repository-relative manifest paths keyed by subproject directory and file type."""
+
+SubprojectDependencies = Dict[str, Dict[DependencyFileType, List["DependencyBase"]]]
+"""Parsed dependencies keyed by subproject directory and file type. The repository root is keyed by `""`."""
+
+SubprojectParseResult = Result[SubprojectDependencies, StringParseException]
+"""Dependencies of every subproject along with the errors of manifests and lines which couldn't be parsed."""
+
+PARALLEL_MANIFEST_THRESHOLD: int = 8
+"""Number of manifests from which they are parsed on a passed executor rather than inline."""
+
+
+def select_file_type(path: str) -> Optional[DependencyFileType]:
+    """Choose the type of a dependency file once for the whole file, from its name.
+
+    File names are compared case-insensitively, so that `Gemfile` maps to `GEMFILE`.
+
+    Args:
+        path: Path of the dependency file.
+
+    Returns:
+        Type of the file, or None if the file name doesn't name a file type.
+    """
+    return _FILE_TYPE_BY_NAME.get(os.path.basename(path).lower())
+
 
 class DependencyBase:
     """Define dependency base class.
@@ -41,12 +197,80 @@ class DependencyBase:
         Args:
             name: Name alias for dependency.
             version_string: Version string adhering to semver definition (<major>.<minor>.<patch>-<label>)
+                or a version requirement such as `>=1.2,<2` or `^4.0.0`.
             source_path: Path of source file containing dependency. Kept for reducing back-referencing.
         """
         self.name = name
         self.version_string = version_string
         self.source_path = source_path
 
+    def __eq__(self, other: object) -> bool:
+        """Compare dependencies by name and version string.
+
+        Args:
+            other: Object to compare with.
+
+        Returns:
+            True if both are dependencies with the same name and version string.
+        """
+        if not isinstance(other, DependencyBase):
+            return NotImplemented
+
+        return (self.name, self.version_string) == (other.name, other.version_string)
+
+    def __hash__(self) -> int:
+        """Hash the dependency consistently with equality.
+
+        Returns:
+            Hash of the name and version string.
+        """
+        return hash((self.name, self.version_string))
+
+    @cached_property
+    def version_range(self) -> Optional[VersionRange]:
+        """Parse the version string as a requirement, once per dependency.
+
+        Returns:
+            Versions satisfying the version string, or None if it isn't understood.
+        """
+        return parse_range(self.version_string)
+
+    @cached_property
+    def version(self) -> Optional[Version]:
+        """Parse the version string as a single version, once per dependency.
+
+        Requirements pinning a single version, such as `==1.2.3`, yield that version.
+
+        Returns:
+            Parsed version, or None if the version string allows more than one version.
+        """
+        version = parse_version(self.version_string)
+
+        if version is None and self.version_range is not None and len(self.version_range.intervals) == 1:
+            interval = self.version_range.intervals[0]
+
+            if interval.low is not None and interval.low == interval.high and interval.high_inclusive:
+                version = interval.low
+
+        return version
+
+    def is_affected_by(self, vulnerable: DependencyBase) -> bool:
+        """Check whether the dependency may resolve to a vulnerable release.
+
+        Args:
+            vulnerable: Vulnerable dependency whose version string is the affected range.
+
+        Returns:
+            True if the names match and the versions overlap. Versions which aren't understood overlap.
+        """
+        if self.name != vulnerable.name:
+            return False
+
+        if self.version_range is None or vulnerable.version_range is None:
+            return True
+
+        return self.version_range.intersects(vulnerable.version_range)
+
     @classmethod
     def from_string(cls,
                     dep_string: str,
@@ -54,7 +278,8 @@ class DependencyBase:
                     source: Optional[str] = None) -> DependencyBase:
         """Create DependencyBase instance using string.
 
-        Parses string and returns a DependencyBase object.
+        Parses string and returns a DependencyBase object. File types are
+        tried in order and the first matching format wins.
 
         Args:
             dep_string: String to parse the dependency object from.
@@ -63,37 +288,27 @@ class DependencyBase:
 
         Returns:
             A dependency object extracted from string.
+
+        Raises:
+            StringParseException: Raised if no format of the file types matches the string.
         """
-        if file_types is not None:
+        if file_types is None:
+            grammars: List[DependencyGrammar] = list(DEPENDENCY_GRAMMARS.values())
+        else:
             if not isinstance(file_types, list):
                 file_types = [file_types]
-        else:
-            file_types = list(dependency_file_type_mapping.values())
 
-        try:
-            match_results: List[Tuple[DependencyFileType, re.Match[str]]] = [
-                (file_type, match_result)
-                for (pattern, file_type)
-                in dependency_file_type_mapping.items()
-                if file_type in list(
-                    set(file_types) & set(dependency_file_type_mapping.values())
-                )
-                and (match_result := re.fullmatch(pattern, dep_string)) is not None
-            ]
-
-            # By default fetch the first match result.
-            # Enhance to select the best alternative using ML model
-            file_type, match_result = match_results[0]
-
-            name, version_string = match_result.group(1, 2)
-
-        except Exception as exception:
-            # TODO: Add fine-tuned exception blocks and custom exceptions
-            raise StringParseException(message=f"""
-Could not parse string into DependencyBase object. Passed string: {dep_string}
-            """) from exception
+            grammars = [DEPENDENCY_GRAMMARS[file_type] for file_type in file_types if file_type in DEPENDENCY_GRAMMARS]
+
+        for grammar in grammars:
+            parsed = grammar.match(dep_string)
 
-        return DependencyBase(name=name, version_string=version_string, source_path=source)
+            if parsed is not None:
+                return DependencyBase(name=parsed[0], version_string=parsed[1], source_path=source)
+
+        raise StringParseException(expression=dep_string, message=f"""
+Could not parse string into DependencyBase object. Passed string: {dep_string}
+        """)
 
     def deserialize_version_string(self) -> Dict[str, Optional[str]]:
         """Create dependency version object from string.
@@ -101,16 +316,14 @@ Could not parse string into DependencyBase object. Passed string: {dep_string}
         Returns:
             Dict represented deserialized version string.
         """
-        parsed_version = re.search("(\\d+)\\.(\\d+)\\.(\\d+)-(.*)$", self.version_string)
-
-        if parsed_version is None:
+        if self.version is None:
             raise Exception(f"Version couldn't be parsed. Version tested was: {self.version_string}")
 
         parsed_version_dict: Dict[str, Optional[str]] = {
-            "major": parsed_version.group(0),
-            "minor": parsed_version.group(1),
-            "patch": parsed_version.group(2),
-            "label": parsed_version.group(3)
+            "major": str(self.version.major),
+            "minor": str(self.version.minor),
+            "patch": str(self.version.patch),
+            "label": self.version.label
         }
 
         return parsed_version_dict
@@ -122,7 +335,7 @@ Could not parse string into DependencyBase object. Passed string: {dep_string}
         Returns:
             Major version from version_string.
         """
-        return self.deserialize_version_string()["major"]
+        return str(self.version.major) if self.version is not None else None
 
     @property
     def minor(self) -> Optional[str]:
@@ -131,7 +344,7 @@ Could not parse string into DependencyBase object. Passed string: {dep_string}
         Returns:
             Minor version from version_string.
         """
-        return self.deserialize_version_string()["minor"]
+        return str(self.version.minor) if self.version is not None else None
 
     @property
     def patch(self) -> Optional[str]:
@@ -140,7 +353,7 @@ Could not parse string into DependencyBase object. Passed string: {dep_string}
         Returns:
             Patch version from version_string.
         """
-        return self.deserialize_version_string()["patch"]
+        return str(self.version.patch) if self.version is not None else None
 
     @property
     def label(self) -> Optional[str]:
@@ -149,12 +362,70 @@ Could not parse string into DependencyBase object. Passed string: {dep_string}
         Returns:
             Label name from version_string.
         """
-        return self.deserialize_version_string()["label"]
+        return self.version.label if self.version is not None else None
+
+
+def iter_structured_dependencies(path: str, file_type: DependencyFileType) -> Iterator[DependencyBase]:
+    """Stream the dependencies of a structured dependency file.
+
+    Dependencies are yielded as they are read, without loading the whole file.
+
+    Args:
+        path: Path of the dependency file.
+        file_type: Dependency file type with a structured parser.
+
+    Yields:
+        Dependency objects, in file order.
+
+    Raises:
+        StringParseException: Raised if the file is malformed. Dependencies before the error are still yielded.
+    """
+    with open(path, "r") as file:
+        try:
+            for name, version_string in structured_parser_mapping[file_type](file):
+                yield DependencyBase(name=name, version_string=version_string, source_path=path)
+        except ValueError as exception:
+            raise StringParseException(expression=path, message=f"""
+Could not parse {path} as {file_type.value}: {exception}
+            """) from exception
+
+
+def parse_dependency_file(path: str, file_type: Optional[DependencyFileType] = None) -> DependencyParseResult:
+    """Parse a dependency file, collecting errors of unparsable lines.
+
+    Args:
+        path: Path of the dependency file.
+        file_type (Optional): Dependency file type. Chosen from the file name if not passed.
+
+    Returns:
+        Parsed dependencies with an exception per unparsable line, or for a malformed structured file.
+    """
+    file_type = file_type if file_type is not None else select_file_type(path)
+
+    if file_type is not None and file_type in structured_parser_mapping:
+        dependencies: List[DependencyBase] = []
+
+        try:
+            dependencies.extend(iter_structured_dependencies(path, file_type))
+        except StringParseException as exception:
+            return Result(ok=dependencies, exception=[exception])
+
+        return Result(ok=dependencies, exception=[])
+
+    if file_type is None or file_type not in DEPENDENCY_GRAMMARS:
+        return Result(ok=[], exception=[StringParseException(expression=path, message=f"""
+Could not determine the dependency file type of {path}.
+        """)])
+
+    with open(path, "r") as file:
+        return DEPENDENCY_GRAMMARS[file_type].parse_lines(file, source=path)
 
 
 def fetch_dependencies(path: str, file_type: Optional[DependencyFileType] = None) -> List[DependencyBase]:
     """Fetch dependencies from a dependency file.
 
+    Lines which can't be parsed are skipped. Use `parse_dependency_file` to inspect them.
+
     Args:
         path: Path of the dependency file.
         file_type (Optional): Dependency file type.
@@ -162,38 +433,109 @@ def fetch_dependencies(path: str, file_type: Optional[DependencyFileType] = None
     Returns:
         A list of dependency objects.
     """
-    with open(path, "r") as file:
-        dep_list: List[DependencyBase] = [
-            DependencyBase.from_string(file_types=file_type, dep_string=dep_str, source=path)
-            for dep_str
-            in open(path, "r").readlines()
-        ]
+    dep_list: List[DependencyBase] = parse_dependency_file(path, file_type).ok
+    return dep_list
 
-        file.close()
 
-        return dep_list
+def discover_manifests(repo: Repo) -> ManifestPaths:
+    """Find the dependency manifests of every subproject in one pass over the index.
 
+    Only tracked files are considered, so that vendored and ignored
+    directories aren't walked.
+
+    Args:
+        repo: Git repo instance whose index is read.
 
-def parse_dependencies(repo: Repo) -> Dict[DependencyFileType, List[DependencyBase]]:
+    Returns:
+        Manifest paths relative to the repository root, grouped per subproject directory.
+    """
+    manifests: ManifestPaths = {}
+
+    for path, _ in repo.index.entries:
+        file_type = select_file_type(path)
+
+        if file_type is not None:
+            manifests.setdefault(posixpath.dirname(path), {})[file_type] = path
+
+    return manifests
+
+
+def _parse_manifest(path: str, file_type: DependencyFileType) -> DependencyParseResult:
+    """Parse a single manifest, possibly in a worker process.
+
+    Args:
+        path: Path of the dependency file.
+        file_type: Dependency file type.
+
+    Returns:
+        Parsed dependencies, or an exception if the file couldn't be read.
+    """
+    try:
+        return parse_dependency_file(path, file_type)
+    except OSError as exception:
+        return Result(ok=[], exception=[StringParseException(expression=path, message=f"""
+Could not read {path}: {exception}
+        """)])
+
+
+def parse_subproject_dependencies(repo: Repo, executor: Optional[Executor] = None) -> SubprojectParseResult:
+    """Parse the manifests of every subproject of a repository.
+
+    Manifests are found through the index and parsed on the executor once
+    there are enough of them to pay off sending them to its workers.
+
+    Args:
+        repo: Git repo instance for fetching configs and performing
+        git operations.
+        executor (Optional): Executor to parse manifests on, such as the process pool of the caller's scan.
+            Manifests are parsed inline if not passed.
+
+    Returns:
+        Dependencies grouped per subproject directory and file type, with an exception per unparsable manifest or line.
+    """
+    work_dir: str = os.path.dirname(repo.git_dir)
+    jobs: List[Tuple[str, DependencyFileType, str]] = [
+        (directory, file_type, os.path.join(work_dir, path))
+        for directory, paths in discover_manifests(repo).items() for file_type, path in paths.items()
+    ]
+    paths = [path for _, _, path in jobs]
+    file_types = [file_type for _, file_type, _ in jobs]
+
+    if executor is None or len(jobs) < PARALLEL_MANIFEST_THRESHOLD:
+        results: List[DependencyParseResult] = list(map(_parse_manifest, paths, file_types))
+    else:
+        results = list(executor.map(_parse_manifest, paths, file_types))
+
+    subprojects: SubprojectDependencies = {}
+    exceptions: List[StringParseException] = []
+
+    for (directory, file_type, _), result in zip(jobs, results):
+        subprojects.setdefault(directory, {})[file_type] = result.ok
+        exceptions.extend(result.exception or [])
+
+    return Result(ok=subprojects, exception=exceptions)
+
+
+def parse_dependencies(repo: Repo,
+                       executor: Optional[Executor] = None) -> Dict[DependencyFileType, List[DependencyBase]]:
     """Parse dependency and return hash of dependencies.
 
-    Parses dependency files of all types in the working directory and returns
-    a dictionary of deserialized dependencies.
+    Parses dependency files of all types in every subproject of the
+    repository and returns a dictionary of deserialized dependencies.
+    Lines which can't be parsed are skipped. Use `parse_subproject_dependencies` to inspect them.
 
     Args:
         repo: Git repo instance for fetching configs and performing
         git operations.
+        executor (Optional): Executor to parse manifests on.
 
     Returns:
         A dependency file to dependency list dictionry
     """
-    work_dir: PathLike[str] = os.path.dirname(repo.git_dir)
-
-    dependency_dict: Dict[DependencyFileType, List[DependencyBase]] = {
-        file_type: fetch_dependencies(
-            file_type=file_type,
-            path=os.path.join(work_dir, file_type)
-        ) for file_type in DependencyFileType
-    }
+    dependency_dict: Dict[DependencyFileType, List[DependencyBase]] = {}
+
+    for dependencies in parse_subproject_dependencies(repo, executor).ok.values():
+        for file_type, file_dependencies in dependencies.items():
+            dependency_dict.setdefault(file_type, []).extend(file_dependencies)
 
     return dependency_dict
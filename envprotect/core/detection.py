@@ -1,5 +1,5 @@
 """Define detections and corresponding result type wrapper."""
-from typing import List, TypeVar, Any, Optional
+from typing import List, TypeVar, Any, Optional, Union
 from envprotect.core.result import Result, ResultType
 from envprotect.exception.detection import DetectionException
 
@@ -13,14 +13,35 @@ E = TypeVar('E', bound=DetectionException)
 class Detection:
     """Define detection class as a utility wrapper over detect_secrets."""
 
+    __slots__ = ("result", "offset", "line", "rule_id", "score", "hexsha", "path")
+
     # TODO: Define this interface
-    def __init__(self, result: Optional[ResultType] = None) -> None:
+    def __init__(self,
+                 result: Optional[Union[ResultType, bytes, str]] = None,
+                 offset: Optional[int] = None,
+                 line: Optional[int] = None,
+                 rule_id: Optional[str] = None,
+                 score: Optional[float] = None,
+                 hexsha: Optional[str] = None,
+                 path: Optional[str] = None) -> None:
         """Initialize new Detection object.
 
         Args:
-            result: Create detection from existing result.
+            result: Create detection from existing result or the data matched by a rule.
+            offset: Byte offset of the detection inside the scanned target.
+            line: Line number of the detection inside the scanned file.
+            rule_id: Identifier of the rule which made the detection.
+            score: Confidence score assigned to the detection by a detector.
+            hexsha: Hex SHA of the blob the detection was made in.
+            path: Path of the file the detection was made in.
         """
         self.result = result
+        self.offset = offset
+        self.line = line
+        self.rule_id = rule_id
+        self.score = score
+        self.hexsha = hexsha
+        self.path = path
 
     # TODO: Define this interface
     # TODO: Change to ApplyResult
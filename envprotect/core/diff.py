@@ -0,0 +1,234 @@
+"""Define diff helpers for crawling only changed content.
+
+Collects blobs changed in the index, a commit range or a list of commits and
+maps added hunks back to line numbers of the new file.
+"""
+
+import re
+from io import BytesIO
+from itertools import accumulate
+from bisect import bisect_right
+from typing import List, Dict, Iterator, Optional, Tuple
+from git import Repo, Blob, Diff
+
+LineRanges = List[Tuple[int, int]]
+"""Inclusive, 1-based (start, end) line ranges of a file."""
+
+LineRangeKey = Tuple[str, str]
+"""Path and hex SHA of a blob, identifying it for line ranges even if the same content sits at several paths."""
+
+LineMap = Tuple[List[int], List[int], List[int]]
+"""Sorted excerpt offsets of lines with their original line numbers and original offsets."""
+
+EMPTY_TREE_SHA: str = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+"""Hex SHA of the empty tree, known to git without being stored."""
+
+HUNK_HEADER_PATTERN = re.compile(rb"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+"""Pattern matching the unified diff hunk header and capturing the new start line."""
+
+
+def staged_diffs(repo: Repo, create_patch: bool = False) -> List[Diff]:
+    """Diff the index against HEAD.
+
+    Args:
+        repo: Git repository object to be worked on.
+        create_patch: Flag to include unified patches in the diffs.
+
+    Returns:
+        Diffs of the staged changes.
+    """
+    return list(repo.head.commit.diff(create_patch=create_patch))
+
+
+def range_diffs(repo: Repo, rev_range: str, create_patch: bool = False) -> List[Diff]:
+    """Diff two revisions given as a `<base>..<head>` or `<base>...<head>` range.
+
+    As with `git diff`, the symmetric form diffs the merge base of both
+    revisions against the head, and an empty side defaults to HEAD.
+
+    Args:
+        repo: Git repository object to be worked on.
+        rev_range: Revision range. A single revision is diffed against HEAD.
+        create_patch: Flag to include unified patches in the diffs.
+
+    Returns:
+        Diffs between the two revisions.
+
+    Raises:
+        ValueError: Raised if the revisions of a symmetric range have no common ancestor.
+    """
+    if "..." in rev_range:
+        base, _, head = rev_range.partition("...")
+        merge_bases = repo.merge_base(base or "HEAD", head or "HEAD")
+
+        if not merge_bases:
+            raise ValueError(f"Revisions of {rev_range} have no common ancestor.")
+
+        base_commit = merge_bases[0]
+    else:
+        base, _, head = rev_range.partition("..")
+        base_commit = repo.commit(base or "HEAD")
+
+    return list(base_commit.diff(repo.commit(head or "HEAD"), create_patch=create_patch))
+
+
+def commit_diffs(repo: Repo, commits: List[str], create_patch: bool = False) -> List[Diff]:
+    """Diff every commit against its first parent.
+
+    Args:
+        repo: Git repository object to be worked on.
+        commits: Revisions of the commits to be diffed.
+        create_patch: Flag to include unified patches in the diffs.
+
+    Returns:
+        Diffs introduced by the commits, in the order of the commits.
+    """
+    diffs: List[Diff] = []
+
+    for revision in commits:
+        commit = repo.commit(revision)
+
+        if commit.parents:
+            diffs.extend(commit.parents[0].diff(commit, create_patch=create_patch))
+        else:
+            # Root commits are diffed against the empty tree to list every file as added.
+            diffs.extend(repo.tree(EMPTY_TREE_SHA).diff(commit, create_patch=create_patch))
+
+    return diffs
+
+
+def changed_blobs(diffs: List[Diff]) -> Iterator[Blob]:
+    """Yield the new side blobs of diffs, once per path and content.
+
+    Args:
+        diffs: Diffs to collect blobs from.
+
+    Yields:
+        Blob objects left behind by the diffs.
+    """
+    seen = set()
+
+    for diff in diffs:
+        if diff.deleted_file or diff.b_blob is None:
+            continue
+
+        if (key := (diff.b_blob.path, diff.b_blob.hexsha)) in seen:
+            continue
+
+        seen.add(key)
+        yield diff.b_blob
+
+
+def merge_line_ranges(line_ranges: LineRanges) -> LineRanges:
+    """Sort line ranges and merge those overlapping or adjacent.
+
+    Args:
+        line_ranges: Line ranges in any order.
+
+    Returns:
+        Disjoint line ranges in ascending order.
+    """
+    merged: LineRanges = []
+
+    for start, end in sorted(line_ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def added_line_ranges(diffs: List[Diff]) -> Dict[LineRangeKey, LineRanges]:
+    """Extract added line ranges of the new side blobs from patches.
+
+    The same blob added at several paths keeps separate ranges per path.
+    Ranges of a path and blob changed by several diffs are merged.
+
+    Args:
+        diffs: Diffs created with `create_patch` enabled.
+
+    Returns:
+        Added line ranges keyed by path and hex SHA of the new side blob.
+    """
+    line_ranges: Dict[LineRangeKey, LineRanges] = {}
+
+    for diff in diffs:
+        if diff.deleted_file or diff.b_blob is None or not diff.diff:
+            continue
+
+        added: LineRanges = line_ranges.setdefault((diff.b_blob.path, diff.b_blob.hexsha), [])
+        line_number = 0
+
+        for line in diff.diff.split(b"\n"):
+            if (header := HUNK_HEADER_PATTERN.match(line)) is not None:
+                line_number = int(header.group(1))
+                continue
+
+            if line.startswith(b"+"):
+                if added and added[-1][1] == line_number - 1:
+                    added[-1] = (added[-1][0], line_number)
+                else:
+                    added.append((line_number, line_number))
+                line_number += 1
+
+            elif line.startswith(b" "):
+                line_number += 1
+
+    return {key: merge_line_ranges(added) for key, added in line_ranges.items()}
+
+
+def excerpt_lines(data: bytes, line_ranges: LineRanges) -> Tuple[bytes, LineMap]:
+    """Cut the given line ranges out of blob data.
+
+    Args:
+        data: Raw blob data.
+        line_ranges: Line ranges to keep.
+
+    Returns:
+        The excerpt and its offset to line number map.
+    """
+    lines: List[bytes] = BytesIO(data).readlines()
+    line_starts: List[int] = [0, *accumulate(len(line) for line in lines)]
+    chunks: List[bytes] = []
+    offsets: List[int] = []
+    line_numbers: List[int] = []
+    original_offsets: List[int] = []
+    offset = 0
+
+    for start, end in line_ranges:
+        for line_number in range(start, min(end, len(lines)) + 1):
+            offsets.append(offset)
+            line_numbers.append(line_number)
+            original_offsets.append(line_starts[line_number - 1])
+            chunks.append(lines[line_number - 1])
+            offset += len(lines[line_number - 1])
+
+    return b"".join(chunks), (offsets, line_numbers, original_offsets)
+
+
+def map_excerpt_offset(offset: int, line_map: LineMap) -> Optional[Tuple[int, int]]:
+    """Map an excerpt offset back to the original file.
+
+    Args:
+        offset: Byte offset inside the excerpt.
+        line_map: Offset to line number map of the excerpt.
+
+    Returns:
+        Line number and byte offset inside the original file or None if the map is empty.
+    """
+    offsets, line_numbers, original_offsets = line_map
+    index = bisect_right(offsets, offset) - 1
+
+    if index < 0:
+        return None
+
+    return line_numbers[index], original_offsets[index] + offset - offsets[index]
+
+
+__all__ = [
+    "LineRanges", "LineRangeKey", "LineMap",
+    "staged_diffs", "range_diffs", "commit_diffs",
+    "changed_blobs", "merge_line_ranges", "added_line_ranges",
+    "excerpt_lines", "map_excerpt_offset",
+]
@@ -0,0 +1,427 @@
+"""Define a filesystem crawl backend.
+
+Walks a directory tree with `os.scandir`, pruning directories excluded by
+`.gitignore` rules before descending into them, and reads files through
+`mmap` so that detection runs on the mapped buffer without copying it.
+Ignored files outside of pruned directories are still walked, as untracked
+secrets, such as `.env` files, are usually the ones ignored.
+"""
+
+from __future__ import annotations
+import hashlib
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from typing import List, BinaryIO, Dict, Iterator, Optional, Pattern, Tuple, Union
+
+GITIGNORE_FILE: str = ".gitignore"
+"""Name of the per-directory ignore file."""
+
+ALWAYS_IGNORED: Tuple[str, ...] = (".git",)
+"""Directory names never descended into."""
+
+IgnoreRule = Tuple[Pattern[str], bool, bool]
+"""Compiled pattern of an ignore rule, whether it is negated and whether it only matches directories."""
+
+
+def translate_gitignore(pattern: str) -> Pattern[str]:
+    """Translate a gitignore pattern into a regex over `/`-separated relative paths.
+
+    Patterns with a slash before their last character are anchored to the
+    directory of their `.gitignore`, others match a name at any depth.
+
+    Args:
+        pattern: Gitignore pattern without its negation prefix and trailing slash.
+
+    Returns:
+        Compiled regex matching the full relative path.
+    """
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    parts: List[str] = []
+    index = 0
+
+    while index < len(pattern):
+        char = pattern[index]
+
+        if pattern.startswith("**/", index) and (index == 0 or pattern[index - 1] == "/"):
+            parts.append("(?:.*/)?")
+            index += 3
+            continue
+
+        if pattern.startswith("**", index) and index + 2 == len(pattern) and (index == 0 or pattern[index - 1] == "/"):
+            parts.append(".*")
+            index += 2
+            continue
+
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "\\" and index + 1 < len(pattern):
+            index += 1
+            parts.append(re.escape(pattern[index]))
+        elif char == "[" and (end := pattern.find("]", index + 2)) != -1:
+            body = pattern[index + 1:end]
+            parts.append("[" + ("^" + body[1:] if body[0] == "!" else body).replace("\\", "\\\\") + "]")
+            index = end
+        else:
+            parts.append(re.escape(char))
+
+        index += 1
+
+    return re.compile(("" if anchored else "(?:.*/)?") + "".join(parts) + r"\Z")
+
+
+def parse_gitignore(lines: List[str]) -> List[IgnoreRule]:
+    """Compile the rules of a gitignore file.
+
+    Args:
+        lines: Lines of the gitignore file.
+
+    Returns:
+        Compiled rules, in file order.
+    """
+    rules: List[IgnoreRule] = []
+
+    for line in lines:
+        line = line.rstrip("\n")
+
+        if not line.endswith("\\ "):
+            line = line.rstrip(" ")
+
+        if not line or line.startswith("#"):
+            continue
+
+        negated = line.startswith("!")
+        line = line[1:] if negated else line
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+
+        if line:
+            rules.append((translate_gitignore(line), negated, dir_only))
+
+    return rules
+
+
+class IgnoreStack:
+    """Evaluate gitignore rules of a directory and all of its parents."""
+
+    def __init__(self, levels: Optional[List[Tuple[str, List[IgnoreRule]]]] = None) -> None:
+        """Initialize new ignore stack.
+
+        Args:
+            levels: Rules of every level paired with the relative path of their directory, outermost first.
+        """
+        self.levels: List[Tuple[str, List[IgnoreRule]]] = levels or []
+
+    def push(self, base: str, rules: List[IgnoreRule]) -> IgnoreStack:
+        """Create a stack with the rules of a nested directory on top.
+
+        Args:
+            base: Relative path of the directory holding the rules.
+            rules: Compiled rules of the directory.
+
+        Returns:
+            New ignore stack. The stack itself is returned if there are no rules.
+        """
+        if not rules:
+            return self
+
+        return IgnoreStack(self.levels + [(base, rules)])
+
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        """Check whether a path is ignored.
+
+        Deeper levels take precedence and the last matching rule of a level wins.
+
+        Args:
+            path: Path relative to the crawl root, `/`-separated.
+            is_dir: Whether the path is a directory.
+
+        Returns:
+            True if the path is ignored.
+        """
+        for base, rules in reversed(self.levels):
+            relative = path[len(base) + 1:] if base else path
+
+            for pattern, negated, dir_only in reversed(rules):
+                if dir_only and not is_dir:
+                    continue
+
+                if pattern.match(relative) is not None:
+                    return not negated
+
+        return False
+
+
+class IgnoreMatcher:
+    """Check single paths against the ignore rules of a crawl root.
+
+    Used where paths arrive one at a time rather than from a walk, such as
+    change events. Rules of every directory are read once and kept.
+    """
+
+    def __init__(self, root: str) -> None:
+        """Initialize new ignore matcher.
+
+        Args:
+            root: Crawl root the paths are relative to.
+        """
+        self.root = os.path.abspath(root)
+        self._stacks: Dict[str, IgnoreStack] = {}
+
+    def stack(self, directory: str) -> IgnoreStack:
+        """Build the ignore stack of a directory.
+
+        Args:
+            directory: Path of the directory relative to the root, empty for the root itself.
+
+        Returns:
+            Ignore stack with the rules of the directory and all of its parents.
+        """
+        if directory in self._stacks:
+            return self._stacks[directory]
+
+        rules = _read_rules(os.path.join(self.root, directory, GITIGNORE_FILE))
+        stack = self.walk_stack(directory).push(directory, rules)
+        self._stacks[directory] = stack
+        return stack
+
+    def walk_stack(self, directory: str) -> IgnoreStack:
+        """Build the ignore stack a walk entering a directory starts with, before reading the directory's own rules.
+
+        Args:
+            directory: Path of the directory relative to the root, empty for the root itself.
+
+        Returns:
+            Ignore stack with the rules of the parent directories, or of `.git/info/exclude` for the root.
+        """
+        if directory:
+            return self.stack(directory.rpartition("/")[0])
+
+        return IgnoreStack().push("", _read_rules(os.path.join(self.root, ".git", "info", "exclude")))
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Check whether a path or any of its parent directories is ignored.
+
+        Args:
+            path: Path relative to the root, `/`-separated.
+            is_dir: Whether the path is a directory.
+
+        Returns:
+            True if the path wouldn't be reached by `walk_files`. Ignored files in walked directories are reached.
+        """
+        parts = path.split("/")
+
+        for depth in range(1, len(parts)):
+            directory = "/".join(parts[:depth])
+
+            if parts[depth - 1] in ALWAYS_IGNORED or \
+                    self.stack("/".join(parts[:depth - 1])).is_ignored(directory, is_dir=True):
+                return True
+
+        if not is_dir:
+            return False
+
+        return parts[-1] in ALWAYS_IGNORED or self.stack("/".join(parts[:-1])).is_ignored(path, is_dir=True)
+
+    def invalidate(self) -> None:
+        """Forget the rules read so far, after an ignore file changed."""
+        self._stacks = {}
+
+
+def _read_rules(path: str) -> List[IgnoreRule]:
+    """Read and compile an ignore file if it exists.
+
+    Args:
+        path: Path of the ignore file.
+
+    Returns:
+        Compiled rules, or no rules if the file doesn't exist.
+    """
+    try:
+        with open(path, "r", errors="surrogateescape") as ignore_file:
+            return parse_gitignore(ignore_file.readlines())
+    except OSError:
+        return []
+
+
+class FileEntry:
+    """Regular file found by the filesystem crawl.
+
+    Mirrors the attributes of git blobs used by the crawler and the pre-filter.
+    """
+
+    def __init__(self, abspath: str, path: str, size: int) -> None:
+        """Initialize new file entry.
+
+        Args:
+            abspath: Absolute path of the file.
+            path: Path relative to the crawl root, `/`-separated.
+            size: Size of the file in bytes.
+        """
+        self.abspath = abspath
+        self.path = path
+        self.size = size
+        self._hexsha: Optional[str] = None
+
+    @property
+    def hexsha(self) -> str:
+        """Hash the file like git hashes a blob, so that results are cached across backends.
+
+        The file is read on first access. Crawlers only ask for it if a
+        result cache is used, or hash the data they read through `hash_data`.
+
+        Returns:
+            Hex SHA the file would have as a git blob.
+        """
+        if self._hexsha is None:
+            with self.open_buffer() as buffer:
+                return self.hash_data(buffer)
+
+        return self._hexsha
+
+    def hash_data(self, data: Union[bytes, memoryview]) -> str:
+        """Hash the file from its data read elsewhere, sparing another read.
+
+        Args:
+            data: Whole data of the file.
+
+        Returns:
+            Hex SHA the file would have as a git blob.
+        """
+        if self._hexsha is None:
+            digest = hashlib.sha1(f"blob {len(data)}\0".encode())
+            digest.update(data)
+            self._hexsha = digest.hexdigest()
+
+        return self._hexsha
+
+    @property
+    def data_stream(self) -> BinaryIO:
+        """Open a fresh stream of the file.
+
+        Returns:
+            Readable binary stream.
+        """
+        return open(self.abspath, "rb")
+
+    @contextmanager
+    def open_buffer(self) -> Iterator[memoryview]:
+        """Map the file into memory.
+
+        Yields:
+            Read-only view over the mapped file. Empty files yield an empty view.
+        """
+        with open(self.abspath, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                yield memoryview(b"")
+                return
+
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+            view = memoryview(mapped)
+
+            try:
+                yield view
+            finally:
+                view.release()
+                mapped.close()
+
+
+def walk_files(root: str, respect_gitignore: bool = True) -> Iterator[FileEntry]:
+    """Walk regular files below a directory.
+
+    Directories are visited depth first in name order. Ignored directories
+    are pruned without being listed, while ignored files in the walked
+    directories are still yielded. Symbolic links aren't followed.
+
+    Args:
+        root: Directory to be crawled.
+        respect_gitignore: Prune directories excluded by `.gitignore` files and `.git/info/exclude`.
+
+    Yields:
+        Every regular file outside of ignored directories.
+    """
+    root = os.path.abspath(root)
+    ignores = IgnoreStack()
+
+    if respect_gitignore:
+        ignores = ignores.push("", _read_rules(os.path.join(root, ".git", "info", "exclude")))
+
+    yield from _walk(root, "", ignores, respect_gitignore)
+
+
+def walk_subtree(ignores: IgnoreMatcher, start: str) -> Iterator[FileEntry]:
+    """Walk the files below a path of a crawl root, against the ignore rules of the root.
+
+    Rules of the parent directories apply as they would in a walk of the
+    whole root, and paths stay relative to the root.
+
+    Args:
+        ignores: Ignore rules of the crawl root.
+        start: Path of a directory or file relative to the root, `/`-separated. The root itself is `""`.
+
+    Yields:
+        Every regular file below the path outside of ignored directories. A file path yields itself.
+    """
+    abspath = os.path.join(ignores.root, *start.split("/")) if start else ignores.root
+
+    if os.path.islink(abspath):
+        return
+
+    is_dir = os.path.isdir(abspath)
+
+    if start and ignores.is_ignored(start, is_dir=is_dir):
+        return
+
+    if is_dir:
+        yield from _walk(abspath, start, ignores.walk_stack(start), True)
+    elif os.path.isfile(abspath):
+        yield FileEntry(abspath=abspath, path=start, size=os.path.getsize(abspath))
+
+
+def _walk(directory: str, relative: str, ignores: IgnoreStack, respect_gitignore: bool) -> Iterator[FileEntry]:
+    """Walk a single directory and descend into its subdirectories.
+
+    Args:
+        directory: Absolute path of the directory.
+        relative: Path of the directory relative to the crawl root.
+        ignores: Ignore rules of the parent directories.
+        respect_gitignore: Prune directories excluded by `.gitignore` files.
+
+    Yields:
+        Every regular file outside of ignored directories.
+    """
+    try:
+        with os.scandir(directory) as iterator:
+            entries = sorted(iterator, key=lambda entry: entry.name)
+    except OSError:
+        return
+
+    if respect_gitignore and any(entry.name == GITIGNORE_FILE and entry.is_file() for entry in entries):
+        # An unreadable or vanished ignore file adds no rules rather than aborting the walk.
+        ignores = ignores.push(relative, _read_rules(os.path.join(directory, GITIGNORE_FILE)))
+
+    for entry in entries:
+        path = f"{relative}/{entry.name}" if relative else entry.name
+
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name in ALWAYS_IGNORED or (respect_gitignore and ignores.is_ignored(path, is_dir=True)):
+                continue
+
+            yield from _walk(entry.path, path, ignores, respect_gitignore)
+
+        elif entry.is_file(follow_symlinks=False):
+            yield FileEntry(abspath=entry.path, path=path, size=entry.stat(follow_symlinks=False).st_size)
+
+
+__all__ = [
+    "IgnoreRule", "translate_gitignore", "parse_gitignore", "IgnoreStack", "IgnoreMatcher",
+    "FileEntry", "walk_files", "walk_subtree",
+]
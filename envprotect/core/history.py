@@ -0,0 +1,187 @@
+"""Define a deduplicated index over the blobs of repository history.
+
+Walks reachable commits once through `git log --raw -z` and records every unique
+blob along with each (commit, path) it was introduced at, so that history
+scans cost one detection per unique blob rather than per commit and file.
+"""
+
+from __future__ import annotations
+import os
+import sqlite3
+import tempfile
+from binascii import unhexlify
+from typing import List, BinaryIO, Iterator, Optional, Tuple
+from git import Repo, Blob
+
+BLOB_MODES = (b"100644", b"100755")
+"""Tree entry modes of regular file blobs. Symlinks and submodules are skipped."""
+
+INSERT_BATCH_SIZE: int = 10000
+"""Number of occurrences buffered before being written to the index."""
+
+READ_CHUNK_SIZE: int = 1 << 16
+"""Number of bytes of `git log` output read at once."""
+
+Occurrence = Tuple[str, str]
+"""Hex SHA of a commit paired with the path a blob appears at."""
+
+
+def iter_fields(stream: BinaryIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+    """Split the output of a git command run with `-z` into its NUL-terminated fields.
+
+    Args:
+        stream: Standard output of the command.
+        chunk_size: Number of bytes read at once.
+
+    Yields:
+        Every field, without its terminator. Trailing data without a terminator is yielded last.
+    """
+    remainder = b""
+
+    while chunk := stream.read(chunk_size):
+        *fields, remainder = (remainder + chunk).split(b"\0")
+        yield from fields
+
+    if remainder:
+        yield remainder
+
+
+class HistoryIndex:
+    """Index unique blobs of reachable history with their occurrences.
+
+    The index lives in a sqlite database rather than in memory, keeping
+    memory use flat on repositories with hundreds of thousands of commits.
+    """
+
+    def __init__(self, repo: Repo, path: Optional[str] = None) -> None:
+        """Initialize new history index.
+
+        Args:
+            repo: Git repository object to be worked on.
+            path: Path of the sqlite database. A temporary file removed on close is used if not passed.
+        """
+        self.repo = repo
+        self._temporary = path is None
+
+        if path is None:
+            descriptor, path = tempfile.mkstemp(prefix="envprotect-history-", suffix=".sqlite3")
+            os.close(descriptor)
+
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hexsha TEXT PRIMARY KEY,
+                path TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS occurrences (
+                hexsha TEXT NOT NULL,
+                commit_hexsha TEXT NOT NULL,
+                path TEXT NOT NULL,
+                PRIMARY KEY (hexsha, commit_hexsha, path)
+            ) WITHOUT ROWID;
+        """)
+
+    def build(self, rev_range: Optional[str] = None, max_count: Optional[int] = None) -> None:
+        """Walk commits and record the blobs they introduce.
+
+        Args:
+            rev_range: Revision range to walk, such as `v1.0..HEAD`. All refs are walked if not passed.
+            max_count: Maximum number of commits to walk.
+        """
+        args: List[str] = [rev_range] if rev_range is not None else ["--all"]
+
+        if max_count is not None:
+            args.append(f"--max-count={max_count}")
+
+        # NUL-terminated fields keep paths verbatim rather than C-quoted.
+        process = self.repo.git.log(
+            *args, "--format=commit %H", "--raw", "--no-abbrev", "--no-renames", "-m", "-z",
+            as_process=True
+        )
+        pending: List[Tuple[str, str, str]] = []
+        commit_hexsha = ""
+        fields = iter_fields(process.stdout)
+
+        for field in fields:
+            field = field.lstrip(b"\n")
+
+            if field.startswith(b"commit "):
+                commit_hexsha = field[7:].strip().decode()
+                continue
+
+            if not field.startswith(b":"):
+                continue
+
+            raw_path = next(fields, b"")
+            _, new_mode, _, new_hexsha, status = field.split(b" ")
+
+            if status.startswith(b"D") or new_mode not in BLOB_MODES:
+                continue
+
+            pending.append((new_hexsha.decode(), commit_hexsha, raw_path.decode(errors="surrogateescape")))
+
+            if len(pending) >= INSERT_BATCH_SIZE:
+                self._insert(pending)
+                pending = []
+
+        self._insert(pending)
+        process.wait()
+
+    def _insert(self, pending: List[Tuple[str, str, str]]) -> None:
+        """Write buffered occurrences to the index.
+
+        Args:
+            pending: Buffered (blob hexsha, commit hexsha, path) occurrences.
+        """
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO blobs (hexsha, path) VALUES (?, ?)",
+            ((hexsha, path) for hexsha, _, path in pending)
+        )
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO occurrences (hexsha, commit_hexsha, path) VALUES (?, ?, ?)", pending
+        )
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        """Count unique blobs in the index.
+
+        Returns:
+            Number of unique blobs.
+        """
+        count: int = self.connection.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+        return count
+
+    def iter_blobs(self) -> Iterator[Blob]:
+        """Yield every unique blob once, in the order it was first seen.
+
+        Yields:
+            Blob objects carrying the first path they were seen at.
+        """
+        for hexsha, path in self.connection.execute("SELECT hexsha, path FROM blobs ORDER BY rowid"):
+            yield Blob(self.repo, unhexlify(hexsha), mode=Blob.file_mode, path=path)
+
+    def occurrences(self, hexsha: str) -> List[Occurrence]:
+        """Fetch every (commit, path) a blob was introduced at.
+
+        Args:
+            hexsha: Hex SHA of the blob.
+
+        Returns:
+            Commit hex SHAs paired with paths.
+        """
+        return self.connection.execute(
+            "SELECT commit_hexsha, path FROM occurrences WHERE hexsha = ?", (hexsha,)
+        ).fetchall()
+
+    def close(self) -> None:
+        """Close the index and remove it if it was temporary."""
+        self.connection.close()
+
+        if self._temporary:
+            os.remove(self.path)
+
+
+__all__ = [
+    "Occurrence", "iter_fields", "HistoryIndex",
+]
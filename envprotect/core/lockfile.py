@@ -0,0 +1,288 @@
+"""Define streaming parsers of structured dependency files.
+
+Every parser reads its file in chunks or line by line and yields dependency
+names with their version strings as they are found, so that lockfiles of
+tens of megabytes are parsed without building their whole document tree.
+"""
+
+from __future__ import annotations
+import json
+import re
+from typing import List, Dict, Any, Iterator, Optional, Pattern, Set, TextIO, Tuple, Union
+
+CHUNK_SIZE: int = 1 << 16
+"""Number of characters read from a JSON file at once."""
+
+PACKAGE_JSON_SECTIONS: Tuple[str, ...] = (
+    "dependencies", "devDependencies", "peerDependencies", "optionalDependencies",
+)
+"""Sections of `package.json` listing dependencies."""
+
+NODE_MODULES: str = "node_modules/"
+"""Path component preceding package names in `package-lock.json` package keys."""
+
+ParsedDependency = Tuple[str, str]
+"""Name and version string of a parsed dependency."""
+
+JsonPath = Tuple[Union[str, int], ...]
+"""Object keys and array indices leading to a JSON value."""
+
+_JSON_TOKEN_PATTERN: Pattern[str] = re.compile(
+    r'\s*(?:"((?:[^"\\]|\\.)*)"|([{}\[\]:,])|(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?=[\s,\]}]|\Z))|(true|false|null))'
+)
+
+_JSON_PARTIAL_TOKEN_PATTERN: Pattern[str] = re.compile(
+    r'\s*(?:"(?:[^"\\]|\\.)*\\?|-?\d*(?:\.\d*)?(?:[eE][+-]?\d*)?'
+    r'|t(?:r(?:ue?)?)?|f(?:a(?:l(?:se?)?)?)?|n(?:u(?:ll?)?)?)\Z'
+)
+
+_JSON_LITERALS = {"true": True, "false": False, "null": None}
+
+_JSON_CLOSERS = {"{": "}", "[": "]"}
+
+_YARN_VERSION_PATTERN: Pattern[str] = re.compile(r' {2}version:? "?([^"\s]+)"?\s*$')
+
+_POETRY_FIELD_PATTERN: Pattern[str] = re.compile(r'(name|version)\s*=\s*"([^"]*)"\s*$')
+
+_GEMFILE_LOCK_SPEC_PATTERN: Pattern[str] = re.compile(r' {4}([^ ()]+) \(([^)]+)\)\s*$')
+
+
+def iter_json_tokens(stream: TextIO) -> Iterator[Tuple[str, Any]]:
+    """Tokenize a JSON document read in chunks.
+
+    Args:
+        stream: Text stream of the document.
+
+    Yields:
+        Token kind, one of `{}[]:,`, `string` or `scalar`, paired with the decoded value.
+
+    Raises:
+        ValueError: Raised if the document isn't valid JSON.
+    """
+    buffer = stream.read(CHUNK_SIZE)
+    position = 0
+    eof = not buffer
+
+    while True:
+        for match_result in _JSON_TOKEN_PATTERN.finditer(buffer, position):
+            # Tokens must follow each other, and one touching the end of the buffer may continue in the next chunk.
+            if match_result.start() != position or (not eof and match_result.end() == len(buffer)):
+                break
+
+            position = match_result.end()
+            group = match_result.lastindex
+
+            if group == 1:
+                string = match_result.group(1)
+                yield "string", json.loads(f'"{string}"') if "\\" in string else string
+            elif group == 2:
+                yield match_result.group(2), None
+            elif group == 3:
+                yield "scalar", json.loads(match_result.group(3))
+            else:
+                yield "scalar", _JSON_LITERALS[match_result.group(4)]
+
+        if eof:
+            if buffer[position:].strip():
+                raise ValueError(f"Invalid JSON near {buffer[position:position + 32]!r}.")
+            return
+
+        # Only a token cut off by the end of the buffer is worth reading more of.
+        if not _JSON_TOKEN_PATTERN.fullmatch(buffer, position) and not _JSON_PARTIAL_TOKEN_PATTERN.match(
+            buffer, position
+        ):
+            raise ValueError(f"Invalid JSON near {buffer[position:position + 32]!r}.")
+
+        chunk = stream.read(CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_json_scalars(stream: TextIO) -> Iterator[Tuple[JsonPath, Any]]:
+    """Walk the scalar values of a JSON document without building it.
+
+    Args:
+        stream: Text stream of the document.
+
+    Yields:
+        Path of every string, number, boolean and null value paired with the value.
+
+    Raises:
+        ValueError: Raised if the document isn't valid JSON.
+    """
+    containers: List[str] = []
+    path: List[Union[str, int]] = []
+    expect_key = False
+
+    for kind, value in iter_json_tokens(stream):
+        if kind == "{":
+            containers.append(kind)
+            path.append("")
+            expect_key = True
+        elif kind == "[":
+            containers.append(kind)
+            path.append(0)
+            expect_key = False
+        elif kind in "}]":
+            if not containers or _JSON_CLOSERS[containers.pop()] != kind:
+                raise ValueError(f"Unbalanced {kind} in JSON document.")
+            path.pop()
+            expect_key = False
+        elif kind == ":":
+            expect_key = False
+        elif kind == ",":
+            if containers and containers[-1] == "{":
+                expect_key = True
+            elif containers:
+                path[-1] = int(path[-1]) + 1
+        elif kind == "string" and expect_key:
+            path[-1] = value
+        else:
+            yield tuple(path), value
+
+    if containers:
+        raise ValueError("Unexpected end of JSON document.")
+
+
+def iter_package_json(stream: TextIO) -> Iterator[ParsedDependency]:
+    """Parse the dependency sections of a `package.json`, minified or not.
+
+    Args:
+        stream: Text stream of the file.
+
+    Yields:
+        Name and version range of every declared dependency.
+    """
+    for path, value in iter_json_scalars(stream):
+        if len(path) == 2 and path[0] in PACKAGE_JSON_SECTIONS and isinstance(value, str):
+            yield str(path[1]), value
+
+
+def iter_package_lock(stream: TextIO) -> Iterator[ParsedDependency]:
+    """Parse every installed package of a `package-lock.json`.
+
+    Reads the `packages` map of lockfile versions 2 and 3 as well as the
+    nested `dependencies` map of version 1. Packages listed by both are
+    yielded once.
+
+    Args:
+        stream: Text stream of the file.
+
+    Yields:
+        Name and resolved version of every package.
+    """
+    seen: Set[ParsedDependency] = set()
+
+    for path, value in iter_json_scalars(stream):
+        if not path or path[-1] != "version" or not isinstance(value, str):
+            continue
+
+        if len(path) == 3 and path[0] == "packages":
+            key = str(path[1])
+
+            if NODE_MODULES not in key:
+                continue
+
+            name = key.rpartition(NODE_MODULES)[2]
+
+        elif len(path) >= 3 and len(path) % 2 == 1 and all(part == "dependencies" for part in path[0:-1:2]):
+            name = str(path[-2])
+
+        else:
+            continue
+
+        if (name, value) not in seen:
+            seen.add((name, value))
+            yield name, value
+
+
+def iter_yarn_lock(stream: TextIO) -> Iterator[ParsedDependency]:
+    """Parse the entries of a `yarn.lock`, in both the classic and the Berry format.
+
+    Args:
+        stream: Text stream of the file.
+
+    Yields:
+        Name and resolved version of every entry.
+    """
+    name: Optional[str] = None
+
+    for line in stream:
+        if not line.strip() or line.startswith("#"):
+            continue
+
+        if not line[0].isspace():
+            descriptor = line.rstrip().rstrip(":").split(",")[0].strip().strip('"')
+            name = descriptor[:descriptor.index("@", 1)] if "@" in descriptor[1:] else None
+            continue
+
+        match_result = _YARN_VERSION_PATTERN.match(line)
+
+        if name is not None and match_result is not None:
+            yield name, match_result.group(1)
+            name = None
+
+
+def iter_poetry_lock(stream: TextIO) -> Iterator[ParsedDependency]:
+    """Parse the `[[package]]` tables of a `poetry.lock`.
+
+    Args:
+        stream: Text stream of the file.
+
+    Yields:
+        Name and locked version of every package.
+    """
+    fields: Optional[Dict[str, str]] = None
+
+    for line in stream:
+        line = line.strip()
+
+        if line.startswith("["):
+            fields = {} if line == "[[package]]" else None
+            continue
+
+        if fields is None:
+            continue
+
+        match_result = _POETRY_FIELD_PATTERN.match(line)
+
+        if match_result is not None:
+            fields[match_result.group(1)] = match_result.group(2)
+
+            if len(fields) == 2:
+                yield fields["name"], fields["version"]
+                fields = None
+
+
+def iter_gemfile_lock(stream: TextIO) -> Iterator[ParsedDependency]:
+    """Parse the resolved gem specs of a `Gemfile.lock`.
+
+    Args:
+        stream: Text stream of the file.
+
+    Yields:
+        Name and resolved version of every gem in a `specs:` block.
+    """
+    in_specs = False
+
+    for line in stream:
+        if not line.startswith("  "):
+            in_specs = False
+            continue
+
+        if line.strip() == "specs:":
+            in_specs = True
+            continue
+
+        match_result = _GEMFILE_LOCK_SPEC_PATTERN.match(line)
+
+        if in_specs and match_result is not None:
+            yield match_result.group(1), match_result.group(2)
+
+
+__all__ = [
+    "CHUNK_SIZE", "ParsedDependency", "JsonPath",
+    "iter_json_tokens", "iter_json_scalars",
+    "iter_package_json", "iter_package_lock", "iter_yarn_lock", "iter_poetry_lock", "iter_gemfile_lock",
+]
@@ -0,0 +1,271 @@
+"""Define bulk object access for crawling.
+
+Reads pack indices directly to order objects by their position in the pack
+and streams object data through a single pipelined `git cat-file --batch`
+process, kept running for the whole crawl, instead of one request-response
+round trip per object.
+"""
+
+from __future__ import annotations
+import glob
+import mmap
+import os
+import struct
+import subprocess
+from threading import Thread
+from typing import List, BinaryIO, Iterator, Optional, Tuple, Any
+from git import Repo
+
+PACK_INDEX_MAGIC: bytes = b"\377tOc"
+"""Magic header of version 2 pack index files."""
+
+PACK_INDEX_HEADER_SIZE: int = 8 + 256 * 4
+"""Size of the pack index header and fan-out table."""
+
+SHA_SIZE: int = 20
+"""Size of a binary object name."""
+
+LARGE_OFFSET_FLAG: int = 0x80000000
+"""Flag marking an offset as an index into the 64-bit offset table."""
+
+
+class PackIndex:
+    """Look up object offsets in a version 2 pack index."""
+
+    def __init__(self, path: str) -> None:
+        """Map a pack index file into memory.
+
+        Args:
+            path: Path of the `.idx` file.
+
+        Raises:
+            ValueError: Raised if the file isn't a version 2 pack index.
+        """
+        self.path = path
+
+        with open(path, "rb") as index_file:
+            self.data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.data[:4] != PACK_INDEX_MAGIC or struct.unpack(">I", self.data[4:8])[0] != 2:
+            self.data.close()
+            raise ValueError(f"Unsupported pack index format: {path}")
+
+        self.count: int = struct.unpack_from(">I", self.data, PACK_INDEX_HEADER_SIZE - 4)[0]
+        self.offsets_start = PACK_INDEX_HEADER_SIZE + self.count * (SHA_SIZE + 4)
+        self.large_offsets_start = self.offsets_start + self.count * 4
+
+    def _fanout(self, first_byte: int) -> int:
+        """Read a fan-out entry.
+
+        Args:
+            first_byte: First byte of an object name.
+
+        Returns:
+            Number of objects whose name starts with a byte up to `first_byte`.
+        """
+        if first_byte < 0:
+            return 0
+
+        fanout: int = struct.unpack_from(">I", self.data, 8 + first_byte * 4)[0]
+        return fanout
+
+    def offset(self, binsha: bytes) -> Optional[int]:
+        """Find the pack offset of an object.
+
+        Args:
+            binsha: Binary object name.
+
+        Returns:
+            Offset of the object inside the pack or None if it isn't packed here.
+        """
+        low, high = self._fanout(binsha[0] - 1), self._fanout(binsha[0])
+
+        while low < high:
+            middle = (low + high) // 2
+            position = PACK_INDEX_HEADER_SIZE + middle * SHA_SIZE
+            candidate = self.data[position:position + SHA_SIZE]
+
+            if candidate < binsha:
+                low = middle + 1
+            elif candidate > binsha:
+                high = middle
+            else:
+                offset: int = struct.unpack_from(">I", self.data, self.offsets_start + middle * 4)[0]
+
+                if offset & LARGE_OFFSET_FLAG:
+                    large_index = offset & ~LARGE_OFFSET_FLAG
+                    offset = struct.unpack_from(">Q", self.data, self.large_offsets_start + large_index * 8)[0]
+
+                return offset
+
+        return None
+
+    def close(self) -> None:
+        """Unmap the pack index."""
+        self.data.close()
+
+
+class ObjectStream:
+    """Bounded reader over a single object in the `cat-file` output pipe."""
+
+    def __init__(self, pipe: BinaryIO, size: int) -> None:
+        """Initialize new object stream.
+
+        Args:
+            pipe: Output pipe of the `cat-file --batch` process.
+            size: Size of the object in bytes.
+        """
+        self.pipe = pipe
+        self.size = size
+        self.remaining = size
+
+    def read(self, size: int = -1) -> bytes:
+        """Read object data without crossing into the following object.
+
+        Args:
+            size: Number of bytes to read. Reads the rest of the object if negative.
+
+        Returns:
+            Object data.
+        """
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+
+        data = self.pipe.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def drain(self) -> None:
+        """Skip unread object data and its trailing newline."""
+        while self.remaining > 0:
+            self.read(min(self.remaining, 1 << 16))
+
+        self.pipe.read(1)
+
+
+class BatchObjectReader:
+    """Stream many objects through one pipelined `git cat-file --batch` process."""
+
+    def __init__(self, repo: Repo) -> None:
+        """Initialize new batch object reader.
+
+        The `cat-file` process is started on first use and kept running
+        across calls to `iter_streams` until the reader is closed.
+
+        Args:
+            repo: Git repository object to be worked on.
+        """
+        self.repo = repo
+        self.process: Any = None
+        objects_dir = os.path.join(getattr(repo, "common_dir", None) or repo.git_dir, "objects")
+        self.packs: List[PackIndex] = [
+            PackIndex(path) for path in sorted(glob.glob(os.path.join(objects_dir, "pack", "*.idx")))
+        ]
+
+    def pack_position(self, hexsha: str) -> Tuple[int, int]:
+        """Locate an object in the packs.
+
+        Args:
+            hexsha: Hex SHA of the object.
+
+        Returns:
+            Pack number and offset of the object. Loose objects sort after every pack.
+        """
+        binsha = bytes.fromhex(hexsha)
+
+        for pack_number, pack in enumerate(self.packs):
+            if (offset := pack.offset(binsha)) is not None:
+                return pack_number, offset
+
+        return len(self.packs), 0
+
+    def _start(self) -> Any:
+        """Start the `cat-file` process unless it is running already.
+
+        Returns:
+            The running process.
+        """
+        if self.process is None:
+            self.process = self.repo.git.cat_file("--batch", as_process=True, istream=subprocess.PIPE)
+
+        return self.process
+
+    def _stop(self) -> None:
+        """Stop the `cat-file` process, if running."""
+        if self.process is None:
+            return
+
+        process, self.process = self.process, None
+
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+        process.stdout.close()
+        process.proc.wait()
+
+    def iter_streams(self, hexshas: List[str]) -> Iterator[Tuple[str, Optional[ObjectStream]]]:
+        """Stream objects in the given order.
+
+        Requests are written by a separate thread so that `cat-file` never
+        waits on a round trip. Unread data of a stream is skipped before the
+        next one is yielded. Closing the generator early stops the process,
+        which is started anew by the following call.
+
+        Args:
+            hexshas: Hex SHAs of the objects to stream.
+
+        Yields:
+            Each hex SHA with a stream of the object data, or None if the object is missing.
+        """
+        if not hexshas:
+            return
+
+        process = self._start()
+
+        def write_requests() -> None:
+            try:
+                process.stdin.write("".join(f"{hexsha}\n" for hexsha in hexshas).encode())
+                process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                pass
+
+        writer = Thread(target=write_requests, daemon=True)
+        writer.start()
+        completed = False
+
+        try:
+            for hexsha in hexshas:
+                header = process.stdout.readline().split()
+
+                if len(header) != 3:
+                    yield hexsha, None
+                    continue
+
+                stream = ObjectStream(process.stdout, int(header[2]))
+                yield hexsha, stream
+                stream.drain()
+
+            completed = True
+        finally:
+            if not completed:
+                # Responses still in the pipe would be read by the following call.
+                process.proc.kill()
+
+            writer.join()
+
+            if not completed:
+                self._stop()
+
+    def close(self) -> None:
+        """Stop the `cat-file` process and unmap the pack indices."""
+        self._stop()
+
+        for pack in self.packs:
+            pack.close()
+
+
+__all__ = [
+    "PackIndex", "ObjectStream", "BatchObjectReader",
+]
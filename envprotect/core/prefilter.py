@@ -0,0 +1,193 @@
+"""Define a pre-filter stage ahead of rule evaluation.
+
+Cheaply skips entries which aren't worth running rulesets on, such as binary
+files, oversized blobs and denied paths, and records why they were skipped.
+Path and size checks run ahead of reading an entry. The binary check needs
+its leading bytes, so crawlers reading the entry anyway run it on the data
+they read rather than opening the entry twice.
+"""
+
+from __future__ import annotations
+import os
+import re
+from enum import Enum
+from fnmatch import translate
+from typing import List, Callable, Optional, Pattern, Protocol, Tuple, BinaryIO, Union, Any
+
+DEFAULT_MAX_SIZE: int = 5 << 20
+"""Default maximum blob size in bytes to be scanned."""
+
+DEFAULT_SNIFF_SIZE: int = 8000
+"""Number of leading bytes searched for NUL bytes. Matches git's own binary heuristic."""
+
+DEFAULT_DENY_PATTERNS: List[str] = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.bmp", "*.ico", "*.webp", "*.tiff",
+    "*.mp3", "*.mp4", "*.avi", "*.mov", "*.wav", "*.pdf",
+    "*.zip", "*.gz", "*.tgz", "*.bz2", "*.xz", "*.7z", "*.rar", "*.tar", "*.jar", "*.war",
+    "*.class", "*.pyc", "*.pyo", "*.o", "*.a", "*.so", "*.dylib", "*.dll", "*.exe",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "package-lock.json", "yarn.lock", "poetry.lock", "Gemfile.lock", "Cargo.lock", "composer.lock",
+]
+"""Default path patterns skipped before detection."""
+
+
+class SkipReason(str, Enum):
+    """Reasons for skipping an entry before detection."""
+
+    DENIED_PATH = "denied-path"
+    NOT_ALLOWED = "not-allowed"
+    TOO_LARGE = "too-large"
+    BINARY = "binary"
+
+
+SkippedEntry = Tuple[str, SkipReason]
+"""Path of a skipped entry paired with the reason for skipping it."""
+
+
+class FilterableEntry(Protocol):
+    """Attributes of a crawl entry read by the pre-filter, shared by git blobs and filesystem files."""
+
+    path: str
+    size: int
+
+    @property
+    def data_stream(self) -> Union[BinaryIO, Any]:
+        """Open a fresh stream of the entry."""
+
+
+def is_binary(data: Union[bytes, memoryview], sniff_size: int = DEFAULT_SNIFF_SIZE) -> bool:
+    """Search the leading bytes of an entry for NUL bytes.
+
+    Args:
+        data: Leading data of the entry. Only the first `sniff_size` bytes are searched.
+        sniff_size: Number of leading bytes searched. Nothing is binary if set to 0.
+
+    Returns:
+        True if the entry looks binary.
+    """
+    return sniff_size > 0 and b"\0" in bytes(data[:sniff_size])
+
+
+def compile_patterns(patterns: List[str]) -> Optional[Pattern[str]]:
+    """Compile glob patterns into a single regex.
+
+    Args:
+        patterns: Glob patterns matched against a full path or its base name.
+
+    Returns:
+        Compiled regex or None if no patterns were passed.
+    """
+    if not patterns:
+        return None
+
+    return re.compile("|".join(f"(?:{translate(pattern)})" for pattern in patterns))
+
+
+class PreFilter:
+    """Decide whether an entry should be passed on to detection."""
+
+    def __init__(self,
+                 max_size: Optional[int] = DEFAULT_MAX_SIZE,
+                 sniff_size: int = DEFAULT_SNIFF_SIZE,
+                 allow_patterns: Optional[List[str]] = None,
+                 deny_patterns: Optional[List[str]] = None,
+                 streamed_max_size: Optional[int] = DEFAULT_MAX_SIZE) -> None:
+        """Initialize new pre-filter object.
+
+        Args:
+            max_size: Maximum size in bytes of entries read whole. Size isn't checked if set to None.
+            sniff_size: Number of leading bytes searched for NUL bytes. Binary check is skipped if set to 0.
+            allow_patterns: Glob patterns an entry must match to be scanned. Everything is allowed if not passed.
+            deny_patterns: Glob patterns of entries to skip. Defaults to `DEFAULT_DENY_PATTERNS`.
+            streamed_max_size: Maximum size in bytes of entries detected in windows or on mapped files. Their
+                memory stays bounded by the window size, so the cap may be raised above `max_size`. Size isn't
+                checked if set to None.
+        """
+        self.max_size = max_size
+        self.streamed_max_size = streamed_max_size
+        self.sniff_size = sniff_size
+        self.allow_pattern = compile_patterns(allow_patterns or [])
+        self.deny_pattern = compile_patterns(deny_patterns if deny_patterns is not None else DEFAULT_DENY_PATTERNS)
+
+    @staticmethod
+    def _matches(pattern: Pattern[str], path: str) -> bool:
+        """Match a path or its base name against a compiled pattern.
+
+        Args:
+            pattern: Compiled glob patterns.
+            path: Path of the entry.
+
+        Returns:
+            True if either the path or its base name matches.
+        """
+        return pattern.match(path) is not None or pattern.match(os.path.basename(path)) is not None
+
+    def check(self,
+              path: str,
+              size: Optional[int],
+              open_stream: Optional[Callable[[], Union[BinaryIO, Any]]],
+              streamed: bool = False) -> Optional[SkipReason]:
+        """Run the filter stages from cheapest to most expensive.
+
+        Args:
+            path: Path of the entry.
+            size: Size of the entry in bytes, if known without reading it.
+            open_stream: Callable returning a fresh readable stream of the entry. Binary check is left
+                to the caller if not passed.
+            streamed: Whether the entry is detected in windows rather than read whole.
+
+        Returns:
+            The reason for skipping the entry or None if it should be scanned.
+        """
+        max_size = self.streamed_max_size if streamed else self.max_size
+
+        if self.deny_pattern is not None and self._matches(self.deny_pattern, path):
+            return SkipReason.DENIED_PATH
+
+        if self.allow_pattern is not None and not self._matches(self.allow_pattern, path):
+            return SkipReason.NOT_ALLOWED
+
+        if max_size is not None and size is not None and size > max_size:
+            return SkipReason.TOO_LARGE
+
+        if open_stream is not None and self.sniff_size > 0 and self.is_binary(open_stream().read(self.sniff_size)):
+            return SkipReason.BINARY
+
+        return None
+
+    def is_binary(self, data: Union[bytes, memoryview]) -> bool:
+        """Run the binary check on data already read from an entry.
+
+        Args:
+            data: Leading data of the entry.
+
+        Returns:
+            True if the entry looks binary.
+        """
+        return is_binary(data, self.sniff_size)
+
+    def check_blob(self, blob: FilterableEntry, sniff: bool = True, streamed: bool = False) -> Optional[SkipReason]:
+        """Check a git blob or a filesystem file.
+
+        Blob size is read from the object header, without inflating the blob.
+
+        Args:
+            blob: Blob or file entry to be checked.
+            sniff: Open the entry for the binary check. Pass False if the caller checks the data it reads.
+            streamed: Whether the entry is detected in windows rather than read whole.
+
+        Returns:
+            The reason for skipping the blob or None if it should be scanned.
+        """
+        return self.check(
+            path=blob.path,
+            size=blob.size,
+            open_stream=(lambda: blob.data_stream) if sniff else None,
+            streamed=streamed
+        )
+
+
+__all__ = [
+    "DEFAULT_MAX_SIZE", "DEFAULT_SNIFF_SIZE", "DEFAULT_DENY_PATTERNS",
+    "SkipReason", "SkippedEntry", "FilterableEntry", "is_binary", "PreFilter",
+]
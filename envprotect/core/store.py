@@ -0,0 +1,296 @@
+"""Define a compact, column oriented store of detections.
+
+Full-history scans make millions of candidate detections, and keeping every
+one as a `Detection` inside nested result lists runs out of memory. The store
+keeps a row per detection spread over typed arrays instead. Blob SHAs, paths
+and rule identifiers are interned into tables, so that a row costs a few
+dozen bytes however long its path. Filters compare the interned codes and
+copy matching rows into another store, without creating per-row objects.
+
+Matched text isn't kept. It can be read back from the blob at the offset and
+length of a row.
+"""
+
+from __future__ import annotations
+import math
+from array import array
+from binascii import hexlify, unhexlify
+from typing import List, Dict, Any, Generic, Iterable, Iterator, Optional, TypeVar
+from .detection import Detection, DetectionResult
+
+# pylint: disable=invalid-name
+T = TypeVar('T')
+# pylint: enable=invalid-name
+
+MISSING: int = -1
+"""Value of integer columns for detections without the field."""
+
+
+class InternTable(Generic[T]):
+    """Assign a dense integer code to every distinct value."""
+
+    __slots__ = ("values", "codes")
+
+    def __init__(self) -> None:
+        """Initialize an empty intern table."""
+        self.values: List[T] = []
+        self.codes: Dict[T, int] = {}
+
+    def intern(self, value: T) -> int:
+        """Fetch the code of a value, assigning the next code on first sight.
+
+        Args:
+            value: Value to be interned.
+
+        Returns:
+            Code of the value.
+        """
+        code = self.codes.get(value)
+
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+
+        return code
+
+    def __len__(self) -> int:
+        """Count the interned values.
+
+        Returns:
+            Number of distinct values.
+        """
+        return len(self.values)
+
+
+class DetectionRecord:
+    """Single row of a detection store, decoded on demand."""
+
+    __slots__ = ("hexsha", "path", "offset", "length", "line", "rule_id", "score")
+
+    def __init__(self,
+                 hexsha: Optional[str],
+                 path: Optional[str],
+                 offset: Optional[int],
+                 length: Optional[int],
+                 line: Optional[int],
+                 rule_id: Optional[str],
+                 score: Optional[float]) -> None:
+        """Initialize new detection record.
+
+        Args:
+            hexsha: Hex SHA of the blob the detection was made in.
+            path: Path of the file the detection was made in.
+            offset: Byte offset of the detection inside the blob.
+            length: Length of the matched data.
+            line: Line number of the detection inside the file.
+            rule_id: Identifier of the rule which made the detection.
+            score: Confidence score assigned to the detection by a detector.
+        """
+        self.hexsha = hexsha
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.line = line
+        self.rule_id = rule_id
+        self.score = score
+
+    def to_detection(self) -> Detection:
+        """Expand the record into a detection object, without its matched data.
+
+        Returns:
+            Detection carrying the fields of the record.
+        """
+        return Detection(
+            offset=self.offset,
+            line=self.line,
+            rule_id=self.rule_id,
+            score=self.score,
+            hexsha=self.hexsha,
+            path=self.path
+        )
+
+
+class DetectionStore:
+    """Column oriented store of detections sharing intern tables across filtered copies."""
+
+    def __init__(self,
+                 blobs: Optional[InternTable[bytes]] = None,
+                 paths: Optional[InternTable[str]] = None,
+                 rules: Optional[InternTable[str]] = None) -> None:
+        """Initialize an empty store.
+
+        Args:
+            blobs: Binary blob SHAs already interned, such as by the store being filtered.
+            paths: Paths already interned.
+            rules: Rule identifiers already interned.
+        """
+        self.blobs: InternTable[bytes] = blobs if blobs is not None else InternTable()
+        self.paths: InternTable[str] = paths if paths is not None else InternTable()
+        self.rules: InternTable[str] = rules if rules is not None else InternTable()
+
+        self.blob_column = array("i")
+        self.path_column = array("i")
+        self.offset_column = array("q")
+        self.length_column = array("i")
+        self.line_column = array("i")
+        self.rule_column = array("i")
+        self.score_column = array("d")
+
+    def _columns(self) -> List[array[Any]]:
+        """List the columns in row field order.
+
+        Returns:
+            Every column of the store.
+        """
+        return [
+            self.blob_column, self.path_column, self.offset_column, self.length_column,
+            self.line_column, self.rule_column, self.score_column,
+        ]
+
+    def append(self, detection: Detection) -> None:
+        """Add a detection as a row.
+
+        Args:
+            detection: Detection stamped with the blob and path it was made in.
+        """
+        result = detection.result
+
+        self.blob_column.append(
+            MISSING if detection.hexsha is None else self.blobs.intern(unhexlify(detection.hexsha))
+        )
+        self.path_column.append(MISSING if detection.path is None else self.paths.intern(detection.path))
+        self.offset_column.append(MISSING if detection.offset is None else detection.offset)
+        self.length_column.append(len(result) if isinstance(result, (str, bytes, bytearray, memoryview)) else MISSING)
+        self.line_column.append(MISSING if detection.line is None else detection.line)
+        self.rule_column.append(MISSING if detection.rule_id is None else self.rules.intern(detection.rule_id))
+        self.score_column.append(math.nan if detection.score is None else detection.score)
+
+    def extend(self, detection_results: Iterable[DetectionResult]) -> None:
+        """Add the detections of detection results as rows.
+
+        Args:
+            detection_results: Detection results whose detections are stamped with their blob and path.
+        """
+        for detection_result in detection_results:
+            for detection in detection_result.ok or []:
+                if isinstance(detection, Detection):
+                    self.append(detection)
+
+    def __len__(self) -> int:
+        """Count the rows.
+
+        Returns:
+            Number of detections in the store.
+        """
+        return len(self.blob_column)
+
+    def record(self, index: int) -> DetectionRecord:
+        """Decode a single row.
+
+        Args:
+            index: Position of the row.
+
+        Returns:
+            Record holding the decoded fields of the row.
+        """
+        blob, path, offset, length, line, rule, score = (column[index] for column in self._columns())
+
+        return DetectionRecord(
+            hexsha=None if blob == MISSING else hexlify(self.blobs.values[blob]).decode(),
+            path=None if path == MISSING else self.paths.values[path],
+            offset=None if offset == MISSING else offset,
+            length=None if length == MISSING else length,
+            line=None if line == MISSING else line,
+            rule_id=None if rule == MISSING else self.rules.values[rule],
+            score=None if math.isnan(score) else score
+        )
+
+    def __iter__(self) -> Iterator[DetectionRecord]:
+        """Decode the rows one at a time.
+
+        Yields:
+            Record of every row, in insertion order.
+        """
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def filter(self,
+               rule_ids: Optional[Iterable[str]] = None,
+               path_prefix: Optional[str] = None,
+               hexshas: Optional[Iterable[str]] = None,
+               min_score: Optional[float] = None) -> DetectionStore:
+        """Copy the rows matching every passed criterion into a new store.
+
+        Criteria are translated to sets of interned codes once, so rows are
+        matched by comparing integers.
+
+        Args:
+            rule_ids: Rule identifiers to keep.
+            path_prefix: Leading part of the paths to keep.
+            hexshas: Hex SHAs of the blobs to keep.
+            min_score: Lowest score to keep. Rows without a score are dropped if passed.
+
+        Returns:
+            Store sharing the intern tables of this one and holding the matching rows.
+        """
+        rule_codes = None if rule_ids is None else {
+            self.rules.codes[rule_id] for rule_id in rule_ids if rule_id in self.rules.codes
+        }
+        path_codes = None if path_prefix is None else {
+            code for code, path in enumerate(self.paths.values) if path.startswith(path_prefix)
+        }
+        blob_codes = None if hexshas is None else {
+            self.blobs.codes[blob] for blob in map(unhexlify, hexshas) if blob in self.blobs.codes
+        }
+
+        selected = DetectionStore(blobs=self.blobs, paths=self.paths, rules=self.rules)
+        columns = self._columns()
+        selected_columns = selected._columns()  # pylint: disable=protected-access
+
+        for index in range(len(self)):
+            if rule_codes is not None and self.rule_column[index] not in rule_codes:
+                continue
+
+            if path_codes is not None and self.path_column[index] not in path_codes:
+                continue
+
+            if blob_codes is not None and self.blob_column[index] not in blob_codes:
+                continue
+
+            # NaN scores compare false, dropping rows without a score.
+            if min_score is not None and not self.score_column[index] >= min_score:
+                continue
+
+            for column, selected_column in zip(columns, selected_columns):
+                selected_column.append(column[index])
+
+        return selected
+
+    def count_by_rule(self) -> Dict[str, int]:
+        """Count the rows per rule identifier.
+
+        Returns:
+            Number of rows keyed by rule identifier. Rows without one are left out.
+        """
+        counts = [0] * len(self.rules)
+
+        for rule in self.rule_column:
+            if rule != MISSING:
+                counts[rule] += 1
+
+        return {rule_id: count for rule_id, count in zip(self.rules.values, counts) if count}
+
+    @property
+    def nbytes(self) -> int:
+        """Estimate the memory held by the columns, leaving out the intern tables.
+
+        Returns:
+            Size of the column buffers in bytes.
+        """
+        return sum(column.itemsize * len(column) for column in self._columns())
+
+
+__all__ = [
+    "MISSING", "InternTable",
+    "DetectionRecord", "DetectionStore",
+]
@@ -0,0 +1,119 @@
+"""Define windowed readers over blob and file streams.
+
+Splits a stream into fixed-size, overlapping windows so that detection memory
+stays bounded by the window size instead of the size of the largest file.
+"""
+
+from typing import BinaryIO, Iterator, Tuple, Union, Any
+
+DEFAULT_WINDOW_SIZE: int = 1 << 20
+"""Default size of a single detection window in bytes."""
+
+Window = Tuple[int, memoryview, bool]
+"""Offset of a window in the stream, its data and whether it is the last one."""
+
+
+def read_full(stream: Union[BinaryIO, Any], size: int) -> bytes:
+    """Read from a stream until the requested size or its end is reached.
+
+    Pipes and process streams may return fewer bytes than requested before
+    their end, which would otherwise shift the windows.
+
+    Args:
+        stream: Readable binary stream supporting `read(size)`.
+        size: Number of bytes to read.
+
+    Returns:
+        Data of the requested size, shorter only at the end of the stream.
+    """
+    data: bytes = stream.read(size)
+
+    while data and len(data) < size:
+        chunk: bytes = stream.read(size - len(data))
+
+        if not chunk:
+            break
+
+        data += chunk
+
+    return data
+
+
+def iter_windows(stream: Union[BinaryIO, Any], window_size: int, overlap: int) -> Iterator[Window]:
+    """Read a stream as overlapping windows.
+
+    Consecutive windows share `overlap` bytes, so a match no longer than the
+    overlap is fully contained in at least one window. At least one window is
+    yielded, even for empty streams.
+
+    Args:
+        stream: Readable binary stream supporting `read(size)`.
+        window_size: Maximum size of a window in bytes.
+        overlap: Number of bytes shared by consecutive windows.
+
+    Yields:
+        Offset, data and last-window flag of every window.
+
+    Raises:
+        ValueError: Raised if the overlap doesn't leave room for new data in a window.
+    """
+    step = window_size - overlap
+
+    if step <= 0:
+        raise ValueError(f"Window size {window_size} must be larger than the overlap {overlap}.")
+
+    buffer: bytes = read_full(stream, window_size)
+    offset = 0
+
+    while True:
+        following: bytes = read_full(stream, step)
+        yield offset, memoryview(buffer), not following
+
+        if not following:
+            return
+
+        # The buffer is full whenever data follows it, so it drops `step` bytes ahead of the overlap.
+        dropped = len(buffer) - overlap
+        buffer = buffer[dropped:] + following
+        offset += dropped
+
+
+class PrefixedStream:
+    """Serve bytes already read off a stream ahead of the rest of the stream."""
+
+    def __init__(self, prefix: bytes, stream: Union[BinaryIO, Any]) -> None:
+        """Initialize new prefixed stream.
+
+        Args:
+            prefix: Leading bytes already read off the stream.
+            stream: Readable binary stream positioned right after the prefix.
+        """
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        """Read the prefix first and the underlying stream after it.
+
+        Args:
+            size: Number of bytes to read. Reads the rest of the stream if negative.
+
+        Returns:
+            Stream data.
+        """
+        if size < 0:
+            data: bytes = self.prefix + self.stream.read()
+            self.prefix = b""
+            return data
+
+        head, self.prefix = self.prefix[:size], self.prefix[size:]
+
+        if len(head) < size:
+            head += self.stream.read(size - len(head))
+
+        return head
+
+
+__all__ = [
+    "DEFAULT_WINDOW_SIZE", "Window",
+    "read_full", "iter_windows", "PrefixedStream",
+]
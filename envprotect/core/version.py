@@ -0,0 +1,497 @@
+"""Define parsed versions and version ranges of dependencies.
+
+Versions and ranges are parsed once per distinct string and shared, as the
+same strings recur across thousands of dependencies. Ranges are normalized
+into unions of intervals, so that containment and overlap checks don't
+depend on the syntax of the ecosystem they came from.
+"""
+
+from __future__ import annotations
+import re
+from functools import lru_cache
+from typing import List, Optional, Pattern, Tuple, Union
+
+PARSE_CACHE_SIZE: int = 1 << 14
+"""Number of distinct version and range strings kept parsed."""
+
+VersionKey = Tuple[Tuple[int, ...], int, Tuple[Tuple[int, Union[int, str]], ...]]
+"""Sort key of a version: trimmed release numbers, label rank and label parts."""
+
+_VERSION_PATTERN: Pattern[str] = re.compile(
+    r"\s*[vV]?(\d+(?:\.\d+)*)(?:[-_.]?([0-9A-Za-z][0-9A-Za-z._-]*))?(?:\+[0-9A-Za-z._-]*)?\s*"
+)
+
+_WILDCARD_PATTERN: Pattern[str] = re.compile(r"\s*[vV]?((?:\d+\.)*)[*xX](?:\.[*xX])*\s*")
+
+_CONSTRAINT_PATTERN: Pattern[str] = re.compile(r"\s*(===|==|!=|~=|~>|>=|<=|\^|~|>|<|=)?\s*([^\s,]+)")
+
+_HYPHEN_PATTERN: Pattern[str] = re.compile(r"\s*(\S+)\s+-\s+(\S+)\s*")
+
+_ANY_VERSION = ("", "*", "x", "X", "latest")
+
+_POST_RELEASE_LABELS = ("post", "rev", "r", "p")
+
+
+class Version:
+    """Parsed dependency version.
+
+    Release numbers are compared numerically with trailing zeros ignored, so
+    that `1.0` equals `1.0.0`. A label marks a pre-release sorting before its
+    release, unless it is a post-release label. Build metadata is ignored.
+    """
+
+    __slots__ = ("release", "label", "key")
+
+    def __init__(self, release: Tuple[int, ...], label: Optional[str] = None) -> None:
+        """Initialize new version.
+
+        Args:
+            release: Release numbers, most significant first.
+            label: Pre-release or post-release label, if any.
+        """
+        self.release = release
+        self.label = label
+        self.key: VersionKey = _version_key(release, label)
+
+    @classmethod
+    def parse(cls, version_string: str) -> Optional[Version]:
+        """Parse a version string, reusing earlier parses of the same string.
+
+        Args:
+            version_string: Version such as `1.2.3`, `v2.0.0-beta.1` or `4.0rc1`.
+
+        Returns:
+            Parsed version, or None if the string isn't a single version.
+        """
+        return parse_version(version_string)
+
+    @property
+    def major(self) -> int:
+        """Return major release number.
+
+        Returns:
+            First release number.
+        """
+        return self.release[0]
+
+    @property
+    def minor(self) -> int:
+        """Return minor release number.
+
+        Returns:
+            Second release number, zero if not given.
+        """
+        return self.release[1] if len(self.release) > 1 else 0
+
+    @property
+    def patch(self) -> int:
+        """Return patch release number.
+
+        Returns:
+            Third release number, zero if not given.
+        """
+        return self.release[2] if len(self.release) > 2 else 0
+
+    def bump(self, index: int) -> Version:
+        """Create the lowest version above every version sharing the release numbers up to an index.
+
+        Args:
+            index: Index of the release number to increment. Later numbers are dropped.
+
+        Returns:
+            Version with the release number incremented, without a label.
+        """
+        release = self.release + (0,) * (index + 1 - len(self.release))
+        return Version(release[:index] + (release[index] + 1,))
+
+    def __eq__(self, other: object) -> bool:
+        """Compare release numbers and labels.
+
+        Args:
+            other: Object to compare with.
+
+        Returns:
+            True if both versions sort equal.
+        """
+        return isinstance(other, Version) and self.key == other.key
+
+    def __lt__(self, other: Version) -> bool:
+        """Order versions.
+
+        Args:
+            other: Version to compare with.
+
+        Returns:
+            True if the version sorts before the other one.
+        """
+        return self.key < other.key
+
+    def __le__(self, other: Version) -> bool:
+        """Order versions.
+
+        Args:
+            other: Version to compare with.
+
+        Returns:
+            True if the version sorts before or equal to the other one.
+        """
+        return self.key <= other.key
+
+    def __gt__(self, other: Version) -> bool:
+        """Order versions.
+
+        Args:
+            other: Version to compare with.
+
+        Returns:
+            True if the version sorts after the other one.
+        """
+        return self.key > other.key
+
+    def __ge__(self, other: Version) -> bool:
+        """Order versions.
+
+        Args:
+            other: Version to compare with.
+
+        Returns:
+            True if the version sorts after or equal to the other one.
+        """
+        return self.key >= other.key
+
+    def __hash__(self) -> int:
+        """Hash the sort key, consistently with equality.
+
+        Returns:
+            Hash of the version.
+        """
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        """Represent the version.
+
+        Returns:
+            Release numbers joined by dots, followed by the label.
+        """
+        return ".".join(map(str, self.release)) + (f"-{self.label}" if self.label else "")
+
+
+class VersionInterval:
+    """Contiguous set of versions between two optional bounds, less excluded versions."""
+
+    __slots__ = ("low", "low_inclusive", "high", "high_inclusive", "excluded")
+
+    def __init__(self,
+                 low: Optional[Version] = None,
+                 low_inclusive: bool = True,
+                 high: Optional[Version] = None,
+                 high_inclusive: bool = False,
+                 excluded: Tuple[Version, ...] = ()) -> None:
+        """Initialize new version interval.
+
+        Args:
+            low: Lower bound. Unbounded if not passed.
+            low_inclusive: Whether the lower bound is part of the interval.
+            high: Upper bound. Unbounded if not passed.
+            high_inclusive: Whether the upper bound is part of the interval.
+            excluded: Versions left out of the interval.
+        """
+        self.low = low
+        self.low_inclusive = low_inclusive
+        self.high = high
+        self.high_inclusive = high_inclusive
+        self.excluded = excluded
+
+    def __contains__(self, version: Version) -> bool:
+        """Check whether a version lies in the interval.
+
+        Args:
+            version: Version to be checked.
+
+        Returns:
+            True if the version is within both bounds and not excluded.
+        """
+        if self.low is not None and (version < self.low or (version == self.low and not self.low_inclusive)):
+            return False
+
+        if self.high is not None and (version > self.high or (version == self.high and not self.high_inclusive)):
+            return False
+
+        return version not in self.excluded
+
+    def intersect(self, other: VersionInterval) -> VersionInterval:
+        """Narrow the interval to the versions also in another one.
+
+        Args:
+            other: Interval to intersect with.
+
+        Returns:
+            Interval with the tighter bound on either side. It may be empty.
+        """
+        low, low_inclusive = self.low, self.low_inclusive
+
+        if other.low is not None and \
+                (low is None or other.low > low or (other.low == low and not other.low_inclusive)):
+            low, low_inclusive = other.low, other.low_inclusive
+
+        high, high_inclusive = self.high, self.high_inclusive
+
+        if other.high is not None and \
+                (high is None or other.high < high or (other.high == high and not other.high_inclusive)):
+            high, high_inclusive = other.high, other.high_inclusive
+
+        return VersionInterval(low, low_inclusive, high, high_inclusive, self.excluded + other.excluded)
+
+    def is_empty(self) -> bool:
+        """Check whether no version lies in the interval.
+
+        Excluded versions are only accounted for in single-version intervals.
+
+        Returns:
+            True if the bounds leave no version.
+        """
+        if self.low is None or self.high is None:
+            return False
+
+        if self.low == self.high:
+            return not (self.low_inclusive and self.high_inclusive) or self.low in self.excluded
+
+        return self.low > self.high
+
+    def __repr__(self) -> str:
+        """Represent the interval in interval notation.
+
+        Returns:
+            Bounds of the interval.
+        """
+        opening = "[" if self.low_inclusive else "("
+        closing = "]" if self.high_inclusive else ")"
+        return f"{opening}{self.low or ''}, {self.high or ''}{closing}"
+
+
+class VersionRange:
+    """Parsed version requirement, as a union of version intervals.
+
+    Understands the requirement syntax of pip (`>=1.2,<2`, `~=1.4`, `==1.*`),
+    npm (`^4.0.0`, `~1.2`, `1.x`, `1.2 - 2.3`, `||`) and RubyGems (`~> 6.0`).
+    A bare version stands for itself.
+    """
+
+    __slots__ = ("intervals",)
+
+    def __init__(self, intervals: List[VersionInterval]) -> None:
+        """Initialize new version range.
+
+        Args:
+            intervals: Alternative intervals of the range.
+        """
+        self.intervals = intervals
+
+    @classmethod
+    def parse(cls, range_string: str) -> Optional[VersionRange]:
+        """Parse a version requirement, reusing earlier parses of the same string.
+
+        Args:
+            range_string: Version requirement of a dependency.
+
+        Returns:
+            Parsed range, or None if the requirement isn't understood, such as git or path sources.
+        """
+        return parse_range(range_string)
+
+    def __contains__(self, version: Version) -> bool:
+        """Check whether a version satisfies the requirement.
+
+        Args:
+            version: Version to be checked.
+
+        Returns:
+            True if any interval of the range contains the version.
+        """
+        return any(version in interval for interval in self.intervals)
+
+    def intersects(self, other: VersionRange) -> bool:
+        """Check whether any version could satisfy both requirements.
+
+        Args:
+            other: Range to be checked against.
+
+        Returns:
+            True if an interval of each range overlap.
+        """
+        return any(
+            not interval.intersect(other_interval).is_empty()
+            for interval in self.intervals for other_interval in other.intervals
+        )
+
+    def __repr__(self) -> str:
+        """Represent the range as a union of intervals.
+
+        Returns:
+            Intervals of the range.
+        """
+        return " | ".join(map(repr, self.intervals))
+
+
+def _version_key(release: Tuple[int, ...], label: Optional[str]) -> VersionKey:
+    """Build the sort key of a version.
+
+    Args:
+        release: Release numbers, most significant first.
+        label: Pre-release or post-release label, if any.
+
+    Returns:
+        Sort key ordering pre-releases before and post-releases after their release.
+    """
+    trimmed = release
+
+    while len(trimmed) > 1 and trimmed[-1] == 0:
+        trimmed = trimmed[:-1]
+
+    if not label:
+        return trimmed, 1, ()
+
+    parts: Tuple[Tuple[int, Union[int, str]], ...] = tuple(
+        (0, int(part)) if part.isdigit() else (1, part.lower())
+        for part in re.findall(r"\d+|[A-Za-z]+", label)
+    )
+    rank = 2 if parts and parts[0][1] in _POST_RELEASE_LABELS else 0
+
+    return trimmed, rank, parts
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_version(version_string: str) -> Optional[Version]:
+    """Parse a single version.
+
+    Args:
+        version_string: Version such as `1.2.3`, `v2.0.0-beta.1` or `4.0rc1`.
+
+    Returns:
+        Parsed version, or None if the string isn't a single version.
+    """
+    match_result = _VERSION_PATTERN.fullmatch(version_string)
+
+    if match_result is None:
+        return None
+
+    release = tuple(int(number) for number in match_result.group(1).split("."))
+    return Version(release, match_result.group(2))
+
+
+def _parse_constraint(operator: str, operand: str) -> Optional[VersionInterval]:
+    """Convert a single constraint into an interval.
+
+    Args:
+        operator: Comparison operator, empty for a bare version.
+        operand: Version or wildcard the operator applies to.
+
+    Returns:
+        Interval of the versions satisfying the constraint, or None if it isn't understood.
+    """
+    if operand in _ANY_VERSION:
+        return VersionInterval()
+
+    wildcard = _WILDCARD_PATTERN.fullmatch(operand)
+
+    if wildcard is not None:
+        prefix = wildcard.group(1).rstrip(".")
+
+        if not prefix:
+            return VersionInterval() if operator in ("", "=", "==", "===", ">=") else None
+
+        base = Version(tuple(int(number) for number in prefix.split(".")))
+        operand_interval = VersionInterval(low=base, high=base.bump(len(base.release) - 1))
+
+        return operand_interval if operator in ("", "=", "==", "===", "~", "^") else None
+
+    version = parse_version(operand)
+
+    if version is None:
+        return None
+
+    if operator in ("", "=", "==", "==="):
+        return VersionInterval(low=version, high=version, high_inclusive=True)
+
+    if operator == "!=":
+        return VersionInterval(excluded=(version,))
+
+    if operator == ">=":
+        return VersionInterval(low=version)
+
+    if operator == ">":
+        return VersionInterval(low=version, low_inclusive=False)
+
+    if operator == "<=":
+        return VersionInterval(high=version, high_inclusive=True)
+
+    if operator == "<":
+        return VersionInterval(high=version)
+
+    if operator in ("~=", "~>"):
+        return VersionInterval(low=version, high=version.bump(max(len(version.release) - 2, 0)))
+
+    if operator == "~":
+        return VersionInterval(low=version, high=version.bump(min(len(version.release) - 1, 1)))
+
+    # Caret ranges allow changes right of the first non-zero release number given.
+    index = next((index for index, number in enumerate(version.release) if number != 0), len(version.release) - 1)
+    return VersionInterval(low=version, high=version.bump(index))
+
+
+def _parse_conjunction(constraints: str) -> Optional[VersionInterval]:
+    """Intersect the constraints of one alternative of a range.
+
+    Args:
+        constraints: Constraints separated by commas or whitespace, or a hyphen range.
+
+    Returns:
+        Interval satisfying every constraint, or None if any of them isn't understood.
+    """
+    hyphen = _HYPHEN_PATTERN.fullmatch(constraints)
+
+    if hyphen is not None:
+        low, high = parse_version(hyphen.group(1)), parse_version(hyphen.group(2))
+        return VersionInterval(low=low, high=high, high_inclusive=True) if low and high else None
+
+    interval = VersionInterval()
+
+    for operator, operand in _CONSTRAINT_PATTERN.findall(constraints):
+        constraint = _parse_constraint(operator, operand)
+
+        if constraint is None:
+            return None
+
+        interval = interval.intersect(constraint)
+
+    return interval
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_range(range_string: str) -> Optional[VersionRange]:
+    """Parse a version requirement.
+
+    Args:
+        range_string: Version requirement of a dependency.
+
+    Returns:
+        Parsed range, or None if the requirement isn't understood, such as git or path sources.
+    """
+    intervals: List[VersionInterval] = []
+
+    for alternative in range_string.split("||"):
+        interval = _parse_conjunction(alternative.strip())
+
+        if interval is None:
+            return None
+
+        intervals.append(interval)
+
+    return VersionRange(intervals)
+
+
+__all__ = [
+    "PARSE_CACHE_SIZE", "VersionKey",
+    "Version", "VersionInterval", "VersionRange",
+    "parse_version", "parse_range",
+]
@@ -0,0 +1,450 @@
+"""Define an offline, memory-mapped vulnerability database.
+
+The database is a single versioned file holding the affected version ranges
+of every vulnerable dependency, keyed by ecosystem and normalized name. Its
+records are sorted by key behind a table of offsets, so that opening it maps
+the file without parsing it and a lookup is a binary search over the map.
+
+The file is only ever replaced as a whole. Exported bundles, either full
+snapshots or deltas against a revision, are merged into a new file which is
+then renamed over the old one, leaving readers of the old file unaffected.
+
+Layout, little endian:
+
+    header   magic (8s), format version (H), revision (Q), record count (I)
+    offsets  record count * (I), offset of every record from the file start
+    records  key length (I), key, value length (I), value
+
+Keys are the ecosystem and normalized name joined by a NUL byte. Values are
+the affected version ranges joined by newlines.
+"""
+
+from __future__ import annotations
+import json
+import mmap
+import os
+import struct
+import tempfile
+from os import PathLike
+from types import TracebackType
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Type, Union
+from envprotect.exception import VulnerabilityDatabaseError
+from .dependency import DependencyBase, DependencyFileType
+from .version import parse_range
+from .vulnerability import IndexKey, IntervalIndex, index_key
+
+DATABASE_MAGIC: bytes = b"EPVULNDB"
+"""Leading bytes of every database file."""
+
+DATABASE_FORMAT: int = 1
+"""Version of the file layout. Databases of other layouts aren't opened."""
+
+BUNDLE_FORMAT: int = 1
+"""Version of the update bundle layout."""
+
+DEFAULT_DATABASE_PATH: str = os.environ.get("ENVPROTECT_VULNDB") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "envprotect", "vulnerabilities.db"
+)
+"""Default path of the database, overridden by the `ENVPROTECT_VULNDB` environment variable."""
+
+Bundle = Dict[str, Any]
+"""Decoded update bundle.
+
+A bundle holds `format`, the `revision` it brings the database to, and
+`base_revision`, the revision a delta applies on top of. Snapshots leave
+`base_revision` out or null. `vulnerables` maps file types to dependency
+names and their affected ranges, replacing any ranges recorded before, and
+`withdrawn` maps file types to dependency names dropped from the database.
+"""
+
+DatabaseRecords = Dict[bytes, List[str]]
+"""Affected version ranges keyed by encoded record key."""
+
+FileStamp = Tuple[int, int]
+"""Inode and modification time of a database file."""
+
+_HEADER = struct.Struct("<8sHQI")
+
+_OFFSET = struct.Struct("<I")
+
+_LENGTH = struct.Struct("<I")
+
+_SHARED: Dict[str, Tuple[FileStamp, VulnerabilityDatabase]] = {}
+
+
+def encode_key(key: IndexKey) -> bytes:
+    """Encode a lookup key the way records are keyed in the database.
+
+    Args:
+        key: Ecosystem and normalized name.
+
+    Returns:
+        Record key.
+    """
+    return "\0".join(key).encode("utf-8")
+
+
+def write_database(path: Union[str, PathLike[str]], records: DatabaseRecords, revision: int) -> None:
+    """Write a database file, replacing any file at the path in a single rename.
+
+    Args:
+        path: Path of the database file.
+        records: Affected version ranges keyed by record key. Keys without ranges are left out.
+        revision: Revision of the written database.
+    """
+    keys: List[bytes] = sorted(key for key, ranges in records.items() if ranges)
+    position: int = _HEADER.size + _OFFSET.size * len(keys)
+    offsets: List[int] = []
+    body: List[bytes] = []
+
+    for key in keys:
+        value = "\n".join(records[key]).encode("utf-8")
+        offsets.append(position)
+        body.append(_LENGTH.pack(len(key)) + key + _LENGTH.pack(len(value)) + value)
+        position += len(body[-1])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+    try:
+        with os.fdopen(descriptor, "wb") as database_file:
+            database_file.write(_HEADER.pack(DATABASE_MAGIC, DATABASE_FORMAT, revision, len(keys)))
+            database_file.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            database_file.writelines(body)
+            database_file.flush()
+            os.fsync(database_file.fileno())
+
+        os.replace(temporary_path, path)
+
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+class VulnerabilityDatabase:
+    """Read-only view of a database file mapped into memory."""
+
+    def __init__(self, path: Union[str, PathLike[str]]) -> None:
+        """Map a database file.
+
+        Args:
+            path: Path of the database file.
+
+        Raises:
+            VulnerabilityDatabaseError: Raised if the file isn't a database of a supported format.
+            OSError: Raised if the file can't be opened.
+        """
+        self.path = os.fspath(path)
+        self.entries: Dict[bytes, IntervalIndex] = {}
+
+        with open(self.path, "rb") as database_file:
+            size = os.fstat(database_file.fileno()).st_size
+
+            if size < _HEADER.size:
+                raise VulnerabilityDatabaseError(expression=self.path, message=f"""
+{self.path} is too short to be a vulnerability database.
+                """)
+
+            self.map = mmap.mmap(database_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, file_format, self.revision, self.count = _HEADER.unpack_from(self.map, 0)
+
+        if magic != DATABASE_MAGIC or file_format != DATABASE_FORMAT \
+                or _HEADER.size + _OFFSET.size * self.count > size:
+            self.map.close()
+            raise VulnerabilityDatabaseError(expression=self.path, message=f"""
+{self.path} isn't a vulnerability database of format {DATABASE_FORMAT}.
+            """)
+
+    @classmethod
+    def create(cls,
+               path: Union[str, PathLike[str]],
+               payload: Optional[Dict[DependencyFileType, List[DependencyBase]]] = None,
+               revision: int = 0) -> VulnerabilityDatabase:
+        """Write a new database, optionally holding a `fetch_vulnerables` payload, and map it.
+
+        Args:
+            path: Path of the database file. Replaced if it exists.
+            payload: Vulnerable dependencies keyed by file type, whose version strings are the affected ranges.
+            revision: Revision of the new database.
+
+        Returns:
+            The new database.
+        """
+        records: DatabaseRecords = {}
+
+        for file_type, vulnerables in (payload or {}).items():
+            for vulnerable in vulnerables:
+                records.setdefault(encode_key(index_key(file_type, vulnerable.name)), []).append(
+                    vulnerable.version_string.strip()
+                )
+
+        write_database(path, records, revision)
+        return cls(path)
+
+    @classmethod
+    def shared(cls, path: Union[str, PathLike[str]] = DEFAULT_DATABASE_PATH) -> Optional[VulnerabilityDatabase]:
+        """Fetch a database mapped once per process, remapping it after the file is replaced.
+
+        Args:
+            path: Path of the database file.
+
+        Returns:
+            The mapped database, or None if no database file exists at the path.
+
+        Raises:
+            VulnerabilityDatabaseError: Raised if the file isn't a database of a supported format.
+        """
+        path = os.fspath(path)
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            removed = _SHARED.pop(path, None)
+
+            if removed is not None:
+                removed[1].close()
+
+            return None
+
+        stamp: FileStamp = (stat.st_ino, stat.st_mtime_ns)
+        cached = _SHARED.get(path)
+
+        if cached is None or cached[0] != stamp:
+            if cached is not None:
+                cached[1].close()
+
+            cached = stamp, cls(path)
+            _SHARED[path] = cached
+
+        return cached[1]
+
+    def __len__(self) -> int:
+        """Count the dependencies recorded in the database.
+
+        Returns:
+            Number of records.
+        """
+        return int(self.count)
+
+    def _record_offset(self, index: int) -> int:
+        """Read the offset of a record from the offset table.
+
+        Args:
+            index: Position of the record in key order.
+
+        Returns:
+            Offset of the record from the start of the file.
+        """
+        offset: int = _OFFSET.unpack_from(self.map, _HEADER.size + _OFFSET.size * index)[0]
+        return offset
+
+    def _record_key(self, offset: int) -> bytes:
+        """Read the key of the record at an offset.
+
+        Args:
+            offset: Offset of the record.
+
+        Returns:
+            Record key.
+        """
+        length: int = _LENGTH.unpack_from(self.map, offset)[0]
+        return self.map[offset + _LENGTH.size:offset + _LENGTH.size + length]
+
+    def _record_ranges(self, offset: int) -> List[str]:
+        """Read the affected version ranges of the record at an offset.
+
+        Args:
+            offset: Offset of the record.
+
+        Returns:
+            Affected version ranges.
+        """
+        offset += _LENGTH.size + _LENGTH.unpack_from(self.map, offset)[0]
+        length: int = _LENGTH.unpack_from(self.map, offset)[0]
+        return self.map[offset + _LENGTH.size:offset + _LENGTH.size + length].decode("utf-8").split("\n")
+
+    def _find(self, key: bytes) -> Optional[int]:
+        """Binary search the records for a key.
+
+        Args:
+            key: Record key.
+
+        Returns:
+            Offset of the record, or None if the key isn't recorded.
+        """
+        low, high = 0, self.count
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if self._record_key(self._record_offset(middle)) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.count:
+            offset = self._record_offset(low)
+
+            if self._record_key(offset) == key:
+                return offset
+
+        return None
+
+    def records(self) -> Iterator[Tuple[bytes, List[str]]]:
+        """Walk every record in key order.
+
+        Yields:
+            Record key paired with its affected version ranges.
+        """
+        for index in range(self.count):
+            offset = self._record_offset(index)
+            yield self._record_key(offset), self._record_ranges(offset)
+
+    def lookup(self, file_type: DependencyFileType, name: str) -> List[DependencyBase]:
+        """Look up the vulnerable entries of a dependency.
+
+        Args:
+            file_type: Type of the file declaring the dependency, deciding its ecosystem.
+            name: Dependency name as declared.
+
+        Returns:
+            Vulnerable dependencies whose version strings are the affected ranges. Empty if none are recorded.
+        """
+        offset = self._find(encode_key(index_key(file_type, name)))
+
+        if offset is None:
+            return []
+
+        return [DependencyBase(name, version_string) for version_string in self._record_ranges(offset)]
+
+    def is_vulnerable(self, dependency: DependencyBase, file_type: DependencyFileType) -> bool:
+        """Check whether a dependency may resolve to an affected version.
+
+        Affected ranges of a name are indexed on its first lookup.
+
+        Args:
+            dependency: Parsed dependency.
+            file_type: Type of the file declaring the dependency, deciding its ecosystem.
+
+        Returns:
+            True if the name is recorded and the versions overlap. Versions which aren't understood overlap.
+        """
+        key = encode_key(index_key(file_type, dependency.name))
+        entry = self.entries.get(key)
+
+        if entry is None:
+            offset = self._find(key)
+
+            if offset is None:
+                return False
+
+            entry = IntervalIndex.from_ranges(
+                parse_range(version_string) for version_string in self._record_ranges(offset)
+            )
+            self.entries[key] = entry
+
+        return entry.affects(dependency.version_range)
+
+    def apply_bundle(self, bundle: Union[str, PathLike[str], Bundle]) -> bool:
+        """Merge an exported update bundle into the database file and remap it.
+
+        Snapshots replace every record. Deltas apply only on top of the
+        revision they were exported against.
+
+        Args:
+            bundle: Decoded bundle or path of a JSON bundle file.
+
+        Returns:
+            True if the bundle was applied, False if the database is already at or past its revision.
+
+        Raises:
+            VulnerabilityDatabaseError: Raised if the bundle is malformed or based on another revision.
+        """
+        decoded: Bundle
+
+        if isinstance(bundle, dict):
+            decoded = bundle
+        else:
+            with open(bundle, "r", encoding="utf-8") as bundle_file:
+                decoded = json.load(bundle_file)
+
+        try:
+            bundle_format = int(decoded.get("format", BUNDLE_FORMAT))
+            revision = int(decoded["revision"])
+            base_revision = decoded.get("base_revision")
+
+            if bundle_format != BUNDLE_FORMAT:
+                raise ValueError(f"unsupported bundle format {bundle_format}")
+
+            if revision <= self.revision:
+                return False
+
+            if base_revision is not None and int(base_revision) != self.revision:
+                raise VulnerabilityDatabaseError(expression=self.path, message=f"""
+Bundle for revision {revision} applies on top of revision {base_revision},
+but {self.path} is at revision {self.revision}.
+                """)
+
+            records: DatabaseRecords = {} if base_revision is None else dict(self.records())
+
+            for file_type, names in decoded.get("withdrawn", {}).items():
+                for name in names:
+                    records.pop(encode_key(index_key(DependencyFileType(file_type), name)), None)
+
+            for file_type, vulnerables in decoded.get("vulnerables", {}).items():
+                for name, version_strings in vulnerables.items():
+                    records[encode_key(index_key(DependencyFileType(file_type), name))] = [
+                        str(version_string).strip() for version_string in version_strings
+                    ]
+
+        except (KeyError, TypeError, ValueError, AttributeError) as exception:
+            raise VulnerabilityDatabaseError(expression=self.path, message=f"""
+Malformed vulnerability bundle: {exception}.
+            """) from exception
+
+        write_database(self.path, records, revision)
+        self._remap()
+        return True
+
+    def _remap(self) -> None:
+        """Map the database file again after it has been replaced."""
+        database = VulnerabilityDatabase(self.path)
+
+        self.map.close()
+        self.map, self.revision, self.count = database.map, database.revision, database.count
+        self.entries = {}
+
+    def close(self) -> None:
+        """Unmap the database file."""
+        self.map.close()
+
+    def __enter__(self) -> VulnerabilityDatabase:
+        """Enter database context.
+
+        Returns:
+            The database itself.
+        """
+        return self
+
+    def __exit__(self,
+                 exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        """Unmap the database on leaving the context.
+
+        Args:
+            exc_type: Type of the exception raised inside the context.
+            exc_value: Exception raised inside the context.
+            traceback: Traceback of the exception raised inside the context.
+        """
+        self.close()
+
+
+__all__ = [
+    "DATABASE_FORMAT", "BUNDLE_FORMAT", "DEFAULT_DATABASE_PATH", "Bundle",
+    "encode_key", "write_database", "VulnerabilityDatabase",
+]
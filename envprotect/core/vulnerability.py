@@ -0,0 +1,236 @@
+"""Define an index over vulnerable dependencies.
+
+Vulnerable dependencies are hashed by ecosystem and normalized name, and the
+affected version intervals of every name are kept sorted by their lower
+bound with a running maximum of their upper bounds. Checking a dependency
+then takes a hash lookup and a binary search, rather than a scan of the
+whole vulnerability feed.
+"""
+
+from __future__ import annotations
+import re
+from bisect import bisect_right
+from typing import List, Dict, Iterable, Optional, Pattern, Tuple, Union
+from .dependency import DependencyBase, DependencyFileType
+from .version import VersionInterval, VersionRange
+
+IndexKey = Tuple[str, str]
+"""Ecosystem and normalized name of a dependency."""
+
+BoundKey = Tuple[Union[int, Tuple[object, ...]], ...]
+"""Sortable key of an interval bound."""
+
+_PYPI_SEPARATOR_PATTERN: Pattern[str] = re.compile(r"[-_.]+")
+
+
+def normalize_name(ecosystem: str, name: str) -> str:
+    """Normalize a dependency name the way its ecosystem compares names.
+
+    Args:
+        ecosystem: Ecosystem of the dependency, such as `pypi` or `npm`.
+        name: Dependency name as declared.
+
+    Returns:
+        Name comparing equal for every spelling the ecosystem treats as the same package.
+    """
+    if ecosystem == "pypi":
+        return _PYPI_SEPARATOR_PATTERN.sub("-", name).lower()
+
+    return name.strip().lower()
+
+
+def index_key(file_type: DependencyFileType, name: str) -> IndexKey:
+    """Build the lookup key of a dependency name declared in a file type.
+
+    Args:
+        file_type: Type of the file declaring the dependency, deciding its ecosystem.
+        name: Dependency name as declared.
+
+    Returns:
+        Ecosystem and normalized name.
+    """
+    ecosystem = DependencyFileType(file_type).ecosystem
+    return ecosystem, normalize_name(ecosystem, name)
+
+
+def _low_key(interval: VersionInterval) -> BoundKey:
+    """Build the sort key of a lower bound. Unbounded sorts first.
+
+    Args:
+        interval: Interval whose lower bound is keyed.
+
+    Returns:
+        Sortable key.
+    """
+    if interval.low is None:
+        return (0,)
+
+    return 1, interval.low.key, 0 if interval.low_inclusive else 1
+
+
+def _high_key(interval: VersionInterval) -> BoundKey:
+    """Build the sort key of an upper bound. Unbounded sorts last.
+
+    Args:
+        interval: Interval whose upper bound is keyed.
+
+    Returns:
+        Sortable key.
+    """
+    if interval.high is None:
+        return (1,)
+
+    return 0, interval.high.key, 1 if interval.high_inclusive else 0
+
+
+class IntervalIndex:
+    """Affected version intervals of a single dependency, for overlap queries."""
+
+    __slots__ = ("intervals", "lows", "reach", "any_version")
+
+    def __init__(self, intervals: Iterable[VersionInterval], any_version: bool = False) -> None:
+        """Sort the intervals and precompute the running maximum of their upper bounds.
+
+        Args:
+            intervals: Affected version intervals.
+            any_version: Whether every version is affected, such as for entries whose range isn't understood.
+        """
+        self.intervals: List[VersionInterval] = sorted(intervals, key=_low_key)
+        self.lows: List[BoundKey] = [_low_key(interval) for interval in self.intervals]
+        self.any_version = any_version
+        self.reach: List[int] = []
+
+        for index, interval in enumerate(self.intervals):
+            if not self.reach or _high_key(interval) > _high_key(self.intervals[self.reach[-1]]):
+                self.reach.append(index)
+            else:
+                self.reach.append(self.reach[-1])
+
+    @classmethod
+    def from_ranges(cls, version_ranges: Iterable[Optional[VersionRange]]) -> IntervalIndex:
+        """Index the affected version ranges of a dependency.
+
+        Args:
+            version_ranges: Parsed affected ranges. None stands for a range which isn't understood.
+
+        Returns:
+            Index over every interval of the ranges, affecting any version if a range isn't understood.
+        """
+        intervals: List[VersionInterval] = []
+        any_version = False
+
+        for version_range in version_ranges:
+            if version_range is None:
+                any_version = True
+            else:
+                intervals.extend(version_range.intervals)
+
+        return cls(intervals, any_version)
+
+    def affects(self, version_range: Optional[VersionRange]) -> bool:
+        """Check whether a dependency's version requirement overlaps the affected versions.
+
+        Args:
+            version_range: Parsed version requirement. None stands for a requirement which isn't understood.
+
+        Returns:
+            True if a version may be both required and affected. Requirements which aren't understood overlap.
+        """
+        if version_range is None:
+            return True
+
+        return any(self.overlaps(interval) for interval in version_range.intervals)
+
+    def overlaps(self, query: VersionInterval) -> bool:
+        """Check whether any affected interval overlaps a queried interval.
+
+        Intervals starting at or below the query's upper bound are found by
+        binary search. Of those, the one reaching highest decides the answer.
+
+        Args:
+            query: Interval of versions a dependency may resolve to.
+
+        Returns:
+            True if a version may lie in both the query and an affected interval.
+        """
+        if self.any_version:
+            return True
+
+        if query.high is None:
+            count = len(self.intervals)
+        else:
+            count = bisect_right(self.lows, (1, query.high.key, 0))
+
+        if count == 0:
+            return False
+
+        furthest = self.intervals[self.reach[count - 1]]
+
+        if not furthest.intersect(query).is_empty():
+            return True
+
+        if query.low is not None and _high_key(furthest) < (0, query.low.key, 0):
+            return False
+
+        # Bounds touching with mismatched inclusivity or excluded versions, checked one by one.
+        return any(not interval.intersect(query).is_empty() for interval in self.intervals[:count])
+
+
+class VulnerabilityIndex:
+    """Hashed lookup of vulnerable dependencies by ecosystem and normalized name."""
+
+    _cached_payload: Optional[Dict[DependencyFileType, List[DependencyBase]]] = None
+    _cached_index: Optional[VulnerabilityIndex] = None
+
+    def __init__(self, payload: Dict[DependencyFileType, List[DependencyBase]]) -> None:
+        """Build the index over a vulnerability feed.
+
+        Args:
+            payload: Vulnerable dependencies keyed by file type, as returned by `fetch_vulnerables`.
+                Version strings of the entries are the affected version ranges.
+        """
+        ranges: Dict[IndexKey, List[Optional[VersionRange]]] = {}
+
+        for file_type, vulnerables in payload.items():
+            for vulnerable in vulnerables:
+                ranges.setdefault(index_key(file_type, vulnerable.name), []).append(vulnerable.version_range)
+
+        self.entries: Dict[IndexKey, IntervalIndex] = {
+            key: IntervalIndex.from_ranges(key_ranges) for key, key_ranges in ranges.items()
+        }
+
+    @classmethod
+    def for_payload(cls, payload: Dict[DependencyFileType, List[DependencyBase]]) -> VulnerabilityIndex:
+        """Fetch the index of a vulnerability feed, building it once per payload object.
+
+        Args:
+            payload: Vulnerable dependencies keyed by file type, as returned by `fetch_vulnerables`.
+
+        Returns:
+            Index over the payload.
+        """
+        if cls._cached_payload is not payload or cls._cached_index is None:
+            cls._cached_index = cls(payload)
+            cls._cached_payload = payload
+
+        return cls._cached_index
+
+    def is_vulnerable(self, dependency: DependencyBase, file_type: DependencyFileType) -> bool:
+        """Check whether a dependency may resolve to an affected version.
+
+        Args:
+            dependency: Parsed dependency.
+            file_type: Type of the file declaring the dependency, deciding its ecosystem.
+
+        Returns:
+            True if the name is in the feed and the versions overlap. Versions which aren't understood overlap.
+        """
+        entry = self.entries.get(index_key(file_type, dependency.name))
+
+        return entry is not None and entry.affects(dependency.version_range)
+
+
+__all__ = [
+    "IndexKey", "normalize_name", "index_key",
+    "IntervalIndex", "VulnerabilityIndex",
+]
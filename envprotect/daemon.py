@@ -0,0 +1,391 @@
+"""Long-running scan daemon.
+
+Keeps ruleset instances with their compiled rulebooks, the result cache and
+the parsed dependencies of every repository it has seen in memory, and
+serves scan requests over a Unix domain socket. Requests are handled one at
+a time, as repository handles and result caches aren't thread-safe. With
+more than one worker, detection runs on a process pool started with the
+daemon and shared by every request.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import os
+import socket
+import socketserver
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from git import Repo
+from .client import DEFAULT_SOCKET_PATH
+from .core.cache import ResultCache
+from .core.crawler import Crawler, CrawlResult, CrawlException, CrawlEntry, init_shared_worker
+from .core.dependency import SubprojectDependencies, discover_manifests
+from .core.detection import Detection, DetectionResult
+from .core.filesystem import IgnoreMatcher, walk_subtree
+from .core.prefilter import PreFilter
+from .envprotect import find_repo, get_suspected_subproject_dependencies, select_rulesets
+from .rulebook import RuleFactory, RuleSet
+
+ManifestStamp = Tuple[Tuple[str, Optional[int]], ...]
+"""Paths and modification times of the index and the dependency manifests of a repository."""
+
+
+class RepoState:
+    """Warm state kept by the daemon for a single repository."""
+
+    def __init__(self, repo: Repo) -> None:
+        """Initialize new repository state.
+
+        Args:
+            repo: Git repository object to be worked on.
+        """
+        self.repo = repo
+        self.cache = ResultCache.for_repo(repo)
+        self.manifest_stamp: Optional[ManifestStamp] = None
+        self.dependencies: SubprojectDependencies = {}
+        self.index_stamp: Optional[Tuple[int, int]] = None
+        self.manifest_paths: List[str] = []
+
+    def current_manifest_paths(self) -> List[str]:
+        """List the manifests tracked in the index, reading the index only if it changed.
+
+        Returns:
+            Absolute paths of the manifests of every subproject.
+        """
+        try:
+            index_stat = os.stat(os.path.join(self.repo.git_dir, "index"))
+            index_stamp: Optional[Tuple[int, int]] = (index_stat.st_mtime_ns, index_stat.st_size)
+        except OSError:
+            index_stamp = None
+
+        if index_stamp is None or index_stamp != self.index_stamp:
+            work_dir = os.path.dirname(self.repo.git_dir)
+            self.manifest_paths = [
+                os.path.join(work_dir, path)
+                for manifests in discover_manifests(self.repo).values() for path in manifests.values()
+            ]
+            self.index_stamp = index_stamp
+
+        return self.manifest_paths
+
+    def current_manifest_stamp(self) -> ManifestStamp:
+        """Read the modification times of the index and of the manifests it lists.
+
+        Returns:
+            Path and modification time in nanoseconds of every file, or None for missing ones.
+        """
+        paths: List[str] = [os.path.join(self.repo.git_dir, "index")] + self.current_manifest_paths()
+        stamp: List[Tuple[str, Optional[int]]] = []
+
+        for path in paths:
+            try:
+                stamp.append((path, os.stat(path).st_mtime_ns))
+            except OSError:
+                stamp.append((path, None))
+
+        return tuple(stamp)
+
+    def suspected_dependencies(self, executor: Optional[Executor] = None) -> SubprojectDependencies:
+        """Fetch the suspected dependencies, parsing manifests only if they changed.
+
+        Args:
+            executor (Optional): Executor to parse manifests on. Manifests are parsed inline if not passed.
+
+        Returns:
+            Dependencies with known vulnerabilities, grouped per subproject.
+        """
+        stamp = self.current_manifest_stamp()
+
+        if stamp != self.manifest_stamp:
+            self.dependencies = get_suspected_subproject_dependencies(self.repo, executor)
+            self.manifest_stamp = stamp
+
+        return self.dependencies
+
+    def working_tree_files(self, paths: List[str]) -> Iterator[CrawlEntry]:
+        """Walk the working tree files below the requested paths.
+
+        Ignore rules of the repository apply as in a walk of the whole
+        working tree. Files below several of the paths are yielded once.
+
+        Args:
+            paths: Absolute paths of directories or files inside the working tree.
+
+        Yields:
+            Every file below the paths outside of ignored directories, with paths relative to the working tree.
+        """
+        work_dir = os.path.dirname(self.repo.git_dir)
+        ignores = IgnoreMatcher(work_dir)
+        seen = set()
+
+        for path in paths:
+            relative = os.path.relpath(os.path.abspath(path), work_dir)
+
+            if relative == os.curdir:
+                relative = ""
+            elif relative == os.pardir or relative.startswith(os.pardir + os.sep):
+                continue
+
+            for entry in walk_subtree(ignores, relative.replace(os.sep, "/")):
+                if entry.path not in seen:
+                    seen.add(entry.path)
+                    yield entry
+
+    def close(self) -> None:
+        """Close the result cache of the repository."""
+        self.cache.close()
+
+
+class Daemon:
+    """Serve scan requests with warm rulesets, caches and dependencies."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, workers: int = 1) -> None:
+        """Initialize new daemon.
+
+        Args:
+            socket_path: Path of the Unix domain socket to listen on.
+            workers: Number of worker processes shared by every request. Detection runs in the serving
+                process if set to 1.
+        """
+        self.socket_path = socket_path
+        self.workers = workers
+        self.prefilter = PreFilter()
+        self.repos: Dict[str, RepoState] = {}
+        self.server: Optional[_DaemonServer] = None
+        self.rulesets: List[RuleSet] = []
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def pool(self) -> ProcessPoolExecutor:
+        """Fetch the worker pool shared by every request, starting it on first use.
+
+        Workers are initialized with every ruleset once, so requests only send indices into them.
+
+        Returns:
+            Process pool running detections.
+        """
+        if self.executor is None:
+            self.rulesets = [RuleFactory.fetch_rule_set(ruleset_name) for ruleset_name in RuleFactory.ruleset_names()]
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=init_shared_worker, initargs=(self.rulesets,)
+            )
+
+        return self.executor
+
+    def repo_state(self, path: str) -> RepoState:
+        """Fetch the warm state of the repository containing a path.
+
+        Args:
+            path: Path inside the repository.
+
+        Returns:
+            State of the repository.
+        """
+        repo = find_repo(Path(path))
+
+        if repo.git_dir not in self.repos:
+            self.repos[repo.git_dir] = RepoState(repo)
+
+        return self.repos[repo.git_dir]
+
+    def scan(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle a scan request.
+
+        Without a change selection, the working tree content below the
+        request paths is scanned, including changes which aren't committed.
+
+        Args:
+            request: Request object with a `path`, optional `paths` to scan instead of it and an optional
+                change selection.
+
+        Returns:
+            Response object with `detections`, `errors` and `skipped` entries.
+        """
+        state = self.repo_state(request["path"])
+        rulesets, scopes = select_rulesets(state.suspected_dependencies(self.pool() if self.workers > 1 else None))
+
+        if request.get("staged") or request.get("rev_range") is not None or request.get("commits") is not None:
+            crawler = Crawler.from_diff(
+                repo=state.repo,
+                staged=bool(request.get("staged")),
+                rev_range=request.get("rev_range"),
+                commits=request.get("commits"),
+                added_lines_only=bool(request.get("added_lines_only"))
+            )
+        else:
+            crawler = Crawler(
+                source=os.path.dirname(state.repo.git_dir),
+                files=state.working_tree_files(request.get("paths") or [request["path"]])
+            )
+
+        crawl_result: CrawlResult[List[DetectionResult], CrawlException]
+
+        if self.workers > 1:
+            executor = self.pool()
+            crawl_result = asyncio.run(crawler.acrawl(
+                rulesets=rulesets,
+                dry_run=True,
+                executor=executor,
+                cache=state.cache,
+                prefilter=self.prefilter,
+                shared_rulesets=self.rulesets,
+                scopes=scopes
+            ))
+        else:
+            crawl_result = crawler.crawl_and_detect(
+                rulesets=rulesets,
+                dry_run=True,
+                cache=state.cache,
+                prefilter=self.prefilter,
+                scopes=scopes
+            )
+
+        return {
+            "detections": [
+                serialize_detection(detection)
+                for detection_result in crawl_result.ok for detection in detection_result.ok or []
+                if isinstance(detection, Detection)
+            ],
+            "errors": [exception.message or repr(exception) for exception in crawl_result.exception or []],
+            "skipped": [[path, reason.value] for path, reason in crawl_result.skipped],
+        }
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Dispatch a request on its command.
+
+        Args:
+            request: Request object with a `command` of `scan`, `ping` or `shutdown`.
+
+        Returns:
+            Response object.
+        """
+        command = request.get("command", "scan")
+
+        if command == "ping":
+            return {"ok": True}
+
+        if command == "shutdown":
+            if self.server is not None:
+                # Shutting down waits for the serve loop, which is busy handling this request.
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+            return {"ok": True}
+
+        if command == "scan":
+            return self.scan(request)
+
+        return {"error": f"Unknown command {command}."}
+
+    def serve_forever(self) -> None:
+        """Listen on the socket until a shutdown request is received.
+
+        A stale socket left by a daemon which didn't exit cleanly is replaced.
+
+        Raises:
+            OSError: Raised if another daemon is already listening on the socket.
+        """
+        if os.path.exists(self.socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(self.socket_path)
+                except ConnectionRefusedError:
+                    os.remove(self.socket_path)
+                else:
+                    raise OSError(f"Another daemon is listening on {self.socket_path}.")
+
+        previous_umask = os.umask(0o177)
+
+        try:
+            self.server = _DaemonServer(self.socket_path, self)
+        finally:
+            os.umask(previous_umask)
+
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            os.remove(self.socket_path)
+            self.close()
+
+    def close(self) -> None:
+        """Close the warm state of every repository and stop the worker pool."""
+        for state in self.repos.values():
+            state.close()
+
+        self.repos = {}
+
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """Read a newline-terminated JSON request and write back the JSON response."""
+
+    server: _DaemonServer
+
+    def handle(self) -> None:
+        """Handle a single request of a connection."""
+        try:
+            response = self.server.daemon.handle(json.loads(self.rfile.readline()))
+        except Exception as exception:
+            response = {"error": repr(exception)}
+
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class _DaemonServer(socketserver.UnixStreamServer):
+    """Unix stream server holding a reference to the daemon."""
+
+    def __init__(self, socket_path: str, daemon: Daemon) -> None:
+        """Bind the server to the socket.
+
+        Args:
+            socket_path: Path of the Unix domain socket.
+            daemon: Daemon handling the requests.
+        """
+        self.daemon = daemon
+        super().__init__(socket_path, _DaemonRequestHandler)
+
+
+def serialize_detection(detection: Detection) -> Dict[str, Any]:
+    """Convert a detection into a JSON-compatible object.
+
+    The matched data is left out, so secrets don't travel over the socket.
+
+    Args:
+        detection: Detection to be serialized.
+
+    Returns:
+        Location, rule and score of the detection.
+    """
+    return {
+        "path": detection.path,
+        "hexsha": detection.hexsha,
+        "line": detection.line,
+        "offset": detection.offset,
+        "rule_id": detection.rule_id,
+        "score": detection.score,
+    }
+
+
+def serve(socket_path: str = DEFAULT_SOCKET_PATH, workers: int = 1) -> None:
+    """Run the daemon in the foreground.
+
+    Args:
+        socket_path: Path of the Unix domain socket to listen on.
+        workers: Number of worker processes shared by every request.
+    """
+    Daemon(socket_path=socket_path, workers=workers).serve_forever()
+
+
+__all__ = [
+    "ManifestStamp", "RepoState", "Daemon",
+    "serialize_detection", "serve",
+]
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,37 @@
+"""Define detectors pluggable into rulesets.
+
+Detectors find or score secret candidates independently of pattern rules.
+The entropy detector, which needs NumPy, is imported on first access.
+"""
+from importlib import import_module
+from typing import Any, Dict
+from .detector import Detector
+
+_LAZY_EXPORTS: Dict[str, str] = {
+    "EntropyDetector": ".entropy",
+    "shannon_entropy": ".entropy",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Import detector modules on first access.
+
+    Args:
+        name: Name of the attribute.
+
+    Returns:
+        The exported object.
+
+    Raises:
+        AttributeError: Raised if the name isn't exported.
+    """
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(import_module(_LAZY_EXPORTS[name], __name__), name)
+
+
+__all__ = [
+    "Detector",
+    "EntropyDetector", "shannon_entropy",
+]
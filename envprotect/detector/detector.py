@@ -0,0 +1,30 @@
+"""Define the detector blueprint class."""
+from abc import ABCMeta, abstractmethod
+from typing import List, Union
+from envprotect.core.detection import Detection
+
+
+class Detector(metaclass=ABCMeta):
+    """Define detector as a rule-independent source of detections and scores."""
+
+    @abstractmethod
+    def detect(self, target: Union[bytes, memoryview]) -> List[Detection]:
+        """Act as placeholder abstract method.
+
+        Args:
+            target: Data to be used for detection.
+
+        Returns:
+            Detections found in the target, with offsets relative to it.
+        """
+
+    @abstractmethod
+    def score_detections(self, detections: List[Detection]) -> List[Detection]:
+        """Act as placeholder abstract method.
+
+        Args:
+            detections: Detections whose matched data is to be scored.
+
+        Returns:
+            The same detections with their score filled in.
+        """
@@ -0,0 +1,227 @@
+"""Define a vectorised Shannon entropy detector.
+
+Extracts candidate tokens from a blob and scores their Shannon entropy in
+batches over a NumPy view of the data, without a per-character Python loop.
+"""
+
+from typing import List, Optional, Tuple, Union
+import numpy as np
+from envprotect.core.detection import Detection
+from .detector import Detector
+
+BASE64_CHARSET: bytes = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=_-"
+"""Characters of base64 and url-safe base64 tokens."""
+
+HEX_CHARSET: bytes = b"0123456789abcdefABCDEF"
+"""Characters of hex tokens."""
+
+DEFAULT_BATCH_BYTES: int = 1 << 20
+"""Number of token bytes scored in a single vectorised batch."""
+
+DEFAULT_LENGTH_RATIO: float = 0.9
+"""Fraction of the highest entropy reachable at its length required of a token too short to reach the threshold."""
+
+
+def charset_table(charset: bytes) -> np.ndarray:
+    """Create a byte lookup table for a charset.
+
+    Args:
+        charset: Characters allowed in a token.
+
+    Returns:
+        Boolean array of 256 entries, set for bytes in the charset.
+    """
+    table = np.zeros(256, dtype=bool)
+    table[np.frombuffer(charset, dtype=np.uint8)] = True
+    return table
+
+
+def token_spans(data: np.ndarray,
+                table: np.ndarray,
+                min_length: int,
+                max_length: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Find runs of charset bytes within the length bounds.
+
+    Args:
+        data: Byte array of the target.
+        table: Charset lookup table created by `charset_table`.
+        min_length: Minimum token length.
+        max_length: Maximum token length. Tokens of any length are kept if not passed.
+
+    Returns:
+        Start offsets and lengths of the tokens.
+    """
+    edges = np.diff(np.concatenate(([0], table[data].view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    lengths = np.flatnonzero(edges == -1) - starts
+    keep = lengths >= min_length
+
+    if max_length is not None:
+        keep &= lengths <= max_length
+
+    return starts[keep], lengths[keep]
+
+
+def length_thresholds(lengths: np.ndarray, threshold: float, length_ratio: float) -> np.ndarray:
+    """Scale an entropy threshold down for tokens too short to reach it.
+
+    A token of `n` bytes has at most `log2(n)` bits of entropy per byte, so a
+    fixed threshold above that can never be met by short tokens.
+
+    Args:
+        lengths: Lengths of the tokens.
+        threshold: Minimum entropy in bits per byte of tokens long enough to reach it.
+        length_ratio: Fraction of `log2(n)` required of shorter tokens.
+
+    Returns:
+        Minimum entropy in bits per byte of every token.
+    """
+    return np.minimum(threshold, length_ratio * np.log2(np.maximum(lengths, 1)))
+
+
+def _batch_entropy(data: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Score Shannon entropy of a batch of tokens.
+
+    Byte counts per token are gathered by sorting (token, byte) keys, so
+    memory stays proportional to the token bytes instead of 256 per token.
+
+    Args:
+        data: Byte array of the target.
+        starts: Start offsets of the tokens.
+        lengths: Lengths of the tokens.
+
+    Returns:
+        Shannon entropy in bits per byte of every token.
+    """
+    token_ids = np.repeat(np.arange(len(starts)), lengths)
+    positions = np.arange(int(lengths.sum())) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    keys = token_ids * 256 + data[positions]
+
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    owners = unique_keys // 256
+    probabilities = counts / lengths[owners]
+
+    return -np.bincount(owners, weights=probabilities * np.log2(probabilities), minlength=len(starts))
+
+
+def shannon_entropy(data: np.ndarray,
+                    starts: np.ndarray,
+                    lengths: np.ndarray,
+                    batch_bytes: int = DEFAULT_BATCH_BYTES) -> np.ndarray:
+    """Score Shannon entropy of tokens in bounded batches.
+
+    Args:
+        data: Byte array of the target.
+        starts: Start offsets of the tokens.
+        lengths: Lengths of the tokens.
+        batch_bytes: Number of token bytes scored in a single batch.
+
+    Returns:
+        Shannon entropy in bits per byte of every token.
+    """
+    scores = np.empty(len(starts), dtype=np.float64)
+    ends = np.cumsum(lengths)
+    batch_start = 0
+
+    while batch_start < len(starts):
+        batch_base = int(ends[batch_start] - lengths[batch_start])
+        batch_end = max(int(np.searchsorted(ends, batch_base + batch_bytes, side="right")), batch_start + 1)
+        scores[batch_start:batch_end] = _batch_entropy(
+            data, starts[batch_start:batch_end], lengths[batch_start:batch_end]
+        )
+        batch_start = batch_end
+
+    return scores
+
+
+class EntropyDetector(Detector):
+    """Detect and score high-entropy tokens."""
+
+    rule_id: str = "high-entropy-string"
+    """Rule identifier set on detections made by the detector."""
+
+    def __init__(self,
+                 threshold: float = 4.5,
+                 min_length: int = 20,
+                 max_length: Optional[int] = 1024,
+                 charset: bytes = BASE64_CHARSET,
+                 length_ratio: float = DEFAULT_LENGTH_RATIO) -> None:
+        """Initialize new EntropyDetector object.
+
+        Args:
+            threshold: Minimum entropy in bits per byte for a token to be detected.
+            min_length: Minimum token length.
+            max_length: Maximum token length. Longer runs are mostly encoded binaries.
+            charset: Characters allowed in a token.
+            length_ratio: Fraction of the highest entropy reachable at its length required of tokens
+                too short to reach the threshold, such as 20 byte tokens with at most 4.32 bits per byte.
+        """
+        self.threshold = threshold
+        self.length_ratio = length_ratio
+        self.min_length = min_length
+        self.max_length = max_length
+        self.table = charset_table(charset)
+
+    def detect(self, target: Union[str, bytes, memoryview]) -> List[Detection]:
+        """Detect tokens with entropy above the threshold, scaled down for short tokens.
+
+        Args:
+            target: Data to be used for detection.
+
+        Returns:
+            Detections of high-entropy tokens, with offsets relative to the target.
+        """
+        view = memoryview(target.encode() if isinstance(target, str) else target)
+        data = np.frombuffer(view, dtype=np.uint8)
+        starts, lengths = token_spans(data, self.table, self.min_length, self.max_length)
+        scores = shannon_entropy(data, starts, lengths)
+        detected = scores >= length_thresholds(lengths, self.threshold, self.length_ratio)
+
+        return [
+            Detection(
+                result=bytes(view[start:start + length]),
+                offset=start,
+                rule_id=self.rule_id,
+                score=score
+            )
+            for start, length, score, is_detected in zip(
+                starts.tolist(), lengths.tolist(), scores.tolist(), detected.tolist()
+            )
+            if is_detected
+        ]
+
+    def score_detections(self, detections: List[Detection]) -> List[Detection]:
+        """Score entropy of the matched data of detections in one batch.
+
+        Args:
+            detections: Detections whose matched data is to be scored.
+
+        Returns:
+            The same detections with their score filled in.
+        """
+        tokens: List[bytes] = [
+            detection.result.encode() if isinstance(detection.result, str)
+            else detection.result if isinstance(detection.result, bytes) else b""
+            for detection in detections
+        ]
+        lengths = np.fromiter((len(token) for token in tokens), dtype=np.int64, count=len(tokens))
+        nonempty = lengths > 0
+        scores = np.zeros(len(tokens), dtype=np.float64)
+
+        if nonempty.any():
+            data = np.frombuffer(b"".join(tokens), dtype=np.uint8)
+            starts = np.cumsum(lengths) - lengths
+            scores[nonempty] = shannon_entropy(data, starts[nonempty], lengths[nonempty])
+
+        for detection, score in zip(detections, scores.tolist()):
+            detection.score = score
+
+        return detections
+
+
+__all__ = [
+    "BASE64_CHARSET", "HEX_CHARSET",
+    "DEFAULT_LENGTH_RATIO",
+    "charset_table", "token_spans", "length_thresholds", "shannon_entropy",
+    "EntropyDetector",
+]
@@ -3,24 +3,29 @@
 A utility to automatically parse your project and shift secrets to environment
 variables. Provides a cli utility to work through the process and exposes the
 core module to provide modifiability.
+
+Heavy modules such as GitPython, the crawler and the printer are imported on
+first use, so that importing this module stays cheap for hooks.
 """
 
+from __future__ import annotations
 import os
 import re
 import traceback
-from typing import List, Dict, Any
+import warnings
+from itertools import chain
+from typing import List, Dict, Any, Optional, Tuple, Union, TYPE_CHECKING
 from pathlib import Path
 from os import PathLike
-from setuptools.namespaces import flatten
-from git import Repo
-from git.exc import InvalidGitRepositoryError
-from .core.crawler import Crawler, CrawlResult, CrawlException
-from .core.dependency import DependencyFileType, DependencyBase, parse_dependencies
-from .core.detection import Detection, DetectionResult, DetectionException
 from .exception import GitignoreNotFoundError
-from .printer.report import Report, RunType
-from .rulebook import RuleFactory, RuleSet, RULESET_DEPS_MAP
-from .server import fetch_vulnerables
+from .rulebook import RuleFactory, RuleSet
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from git import Repo
+    from .core.crawler import CrawlResult, CrawlException, RulesetScopes
+    from .core.dependency import DependencyFileType, DependencyBase, SubprojectDependencies
+    from .core.detection import Detection, DetectionResult, DetectionException
 
 
 def inspect_gitignore(repo: Repo) -> None:
@@ -90,21 +95,96 @@ def get_suspected_dependencies(repo: Repo) -> Dict[DependencyFileType, List[Depe
     Returns:
         Dependencies with known vulnerabilities.
     """
-    dependency_dict: Dict[DependencyFileType, List[DependencyBase]] = parse_dependencies(repo)
+    suspected_deps_dict: Dict[DependencyFileType, List[DependencyBase]] = {}
 
-    vulnerable_deps_dict: Dict[DependencyFileType, List[DependencyBase]] = fetch_vulnerables(
-        dep_types=dependency_dict.keys()
-    )
+    for dependencies in get_suspected_subproject_dependencies(repo).values():
+        for file_type, file_dependencies in dependencies.items():
+            suspected_deps_dict.setdefault(file_type, []).extend(file_dependencies)
+
+    return suspected_deps_dict
+
+
+def get_suspected_subproject_dependencies(repo: Repo, executor: Optional[Executor] = None) -> SubprojectDependencies:
+    """Get dependencies with known vulnerable key strings, grouped per subproject.
+
+    Manifests of every subproject found in the index are parsed, so that
+    rulesets can be scoped to the directories declaring their dependencies.
+    Manifests and lines which can't be parsed are skipped with a warning.
+    A dependency is suspected if its version requirement overlaps the
+    affected versions of a vulnerable dependency of the same ecosystem and
+    normalized name. Vulnerable dependencies are looked up in the local
+    vulnerability database if one exists, and fetched from the server
+    otherwise.
+
+    Args:
+        repo: Git repository object to be worked on.
+        executor (Optional): Executor to parse manifests on, such as the process pool of the scan. Manifests are
+            parsed inline if not passed.
+
+    Returns:
+        Dependencies with known vulnerabilities keyed by subproject directory and file type.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .core.dependency import parse_subproject_dependencies
+    from .core.vulndb import VulnerabilityDatabase
+    from .core.vulnerability import VulnerabilityIndex
+    # pylint: enable=import-outside-toplevel
 
-    suspected_deps_dict: Dict[DependencyFileType, List[DependencyBase]] = {
-        file_type: list(filter(
-            lambda dependency: dependency in vulnerable_deps_dict[file_type],
-            dependencies
-        ))
-        for (file_type, dependencies) in dependency_dict.items()
+    parsed = parse_subproject_dependencies(repo, executor)
+    subprojects: SubprojectDependencies = parsed.ok
+
+    for exception in parsed.exception or []:
+        warnings.warn(f"Skipped unparsable dependencies of {exception.expression}: {exception.message.strip()}")
+
+    vulnerable_index: Optional[Union[VulnerabilityDatabase, VulnerabilityIndex]] = VulnerabilityDatabase.shared()
+
+    if vulnerable_index is None:
+        # pylint: disable=import-outside-toplevel
+        from .server import fetch_vulnerables
+        # pylint: enable=import-outside-toplevel
+
+        vulnerable_deps_dict: Dict[DependencyFileType, List[DependencyBase]] = fetch_vulnerables(
+            dep_types={file_type for dependencies in subprojects.values() for file_type in dependencies}
+        )
+        vulnerable_index = VulnerabilityIndex.for_payload(vulnerable_deps_dict)
+
+    return {
+        directory: {
+            file_type: [
+                dependency for dependency in file_dependencies if vulnerable_index.is_vulnerable(dependency, file_type)
+            ]
+            for file_type, file_dependencies in dependencies.items()
+        }
+        for directory, dependencies in subprojects.items()
     }
 
-    return suspected_deps_dict
+
+def select_rulesets(subprojects: SubprojectDependencies) -> Tuple[List[RuleSet], RulesetScopes]:
+    """Fetch the rulesets covering suspected dependencies and the directories they apply to.
+
+    A ruleset needed by a dependency of the repository root applies everywhere.
+    Others are restricted to the subprojects declaring their dependencies.
+
+    Args:
+        subprojects: Suspected dependencies keyed by subproject directory and file type.
+
+    Returns:
+        Rulesets to crawl with and their scopes, keyed by ruleset name.
+    """
+    directories: Dict[str, List[str]] = {}
+
+    for directory, dependencies in subprojects.items():
+        for ruleset_name in RuleFactory.ruleset_names_for(
+                dependency.name for dependency in chain.from_iterable(dependencies.values())):
+            directories.setdefault(ruleset_name, []).append(directory)
+
+    rulesets: List[RuleSet] = [RuleFactory.fetch_rule_set(ruleset_name) for ruleset_name in directories]
+    scopes: RulesetScopes = {
+        ruleset.name: ruleset_directories
+        for ruleset, ruleset_directories in zip(rulesets, directories.values()) if "" not in ruleset_directories
+    }
+
+    return rulesets, scopes
 
 
 def find_repo(path: PathLike[str] = Path(os.getcwd())) -> Repo:
@@ -120,6 +200,11 @@ def find_repo(path: PathLike[str] = Path(os.getcwd())) -> Repo:
     Raises:
         InvalidGitRepositoryError: Raised if the search reaches root of filesystem.
     """
+    # pylint: disable=import-outside-toplevel
+    from git import Repo
+    from git.exc import InvalidGitRepositoryError
+    # pylint: enable=import-outside-toplevel
+
     search_dir = path
 
     # Make this check platform agnostic
@@ -138,7 +223,67 @@ This isn't a git repo. Neither does it lie nested within one.
     """)
 
 
-def scan(allow_dirty: bool = False) -> None:
+async def async_scan(path: PathLike[str],
+                     executor: Optional[Executor] = None,
+                     concurrency: Optional[int] = None,
+                     use_cache: bool = True) -> CrawlResult[List[DetectionResult], CrawlException]:
+    """Scan a repository for potential security key leaks without blocking the event loop.
+
+    Meant for services scanning many repositories at once. Nothing is
+    printed or applied, the crawl result is returned instead.
+
+    Args:
+        path: Path inside the repository to be scanned.
+        executor: Executor to parse manifests and run detections on, such as a process pool shared by concurrent
+            scans.
+        concurrency: Number of detections kept in flight for this repository. Defaults to `DEFAULT_CONCURRENCY`.
+        use_cache: Flag to reuse detections of unchanged blobs from `.git/envprotect/`.
+
+    Returns:
+        Crawl result with detections and skipped entries.
+    """
+    # pylint: disable=import-outside-toplevel
+    import asyncio
+    from .core.cache import ResultCache
+    from .core.crawler import Crawler, DEFAULT_CONCURRENCY
+    from .core.prefilter import PreFilter
+    # pylint: enable=import-outside-toplevel
+
+    loop = asyncio.get_running_loop()
+    repo: Repo = await loop.run_in_executor(None, find_repo, path)
+    subprojects: SubprojectDependencies = await loop.run_in_executor(
+        None, get_suspected_subproject_dependencies, repo, executor
+    )
+
+    rulesets, scopes = select_rulesets(subprojects)
+
+    cache: Optional[ResultCache] = ResultCache.for_repo(repo) if use_cache else None
+
+    try:
+        return await Crawler(source=repo).acrawl(
+            rulesets=rulesets,
+            dry_run=True,
+            executor=executor,
+            concurrency=concurrency or DEFAULT_CONCURRENCY,
+            cache=cache,
+            prefilter=PreFilter(),
+            scopes=scopes
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def scan(allow_dirty: bool = False,
+         workers: int = 1,
+         use_cache: bool = True,
+         staged: bool = False,
+         rev_range: Optional[str] = None,
+         commits: Optional[List[str]] = None,
+         added_lines_only: bool = False,
+         full_history: bool = False,
+         history_range: Optional[str] = None,
+         bulk_read: bool = False) -> None:
     """Scan repository for potential security key leaks.
 
     Scans for gitignore, dependencies and prints the potential leaks. Also allows ability to suppress the false
@@ -146,7 +291,24 @@ def scan(allow_dirty: bool = False) -> None:
 
     Args:
         allow_dirty: Flag to proceed with application even if git repository is dirty.
+        workers: Number of worker processes used for detection. Runs serially if set to 1.
+        use_cache: Flag to reuse detections of unchanged blobs from `.git/envprotect/`.
+        staged: Scan only blobs changed in the index. Meant for pre-commit hooks.
+        rev_range: Scan only blobs changed between two revisions given as `<base>..<head>` or `<base>...<head>`.
+        commits: Scan only blobs changed by the listed commits.
+        added_lines_only: Restrict diff scans to the added hunks of changed blobs.
+        full_history: Scan every unique blob reachable from any ref, once.
+        history_range: Scan every unique blob introduced in a revision range, once.
+        bulk_read: Read blobs in pack order through a single `git cat-file --batch` pipe.
     """
+    # pylint: disable=import-outside-toplevel
+    from .core.cache import ResultCache
+    from .core.crawler import Crawler
+    from .core.prefilter import PreFilter
+    from .core.store import DetectionStore
+    from .printer.report import Report, RunType
+    # pylint: enable=import-outside-toplevel
+
     try:
         # Start by detecting if the working directory is a git repository
         repo: Repo = find_repo()
@@ -165,29 +327,60 @@ conflict, please commit/stash your changes or run with --allow-dirty flag.
         # TODO: Scan additional gitignores and files that resemble secret collection and add them to gitignore-propose
         # more_gitignore = scan_secret_files
 
-        # Inspect and mark dependencies prone to secrets leakage.
-        dependencies_dict: Dict[DependencyFileType, List[DependencyBase]] = get_suspected_dependencies(repo)
-        flattened_dependencies: List[DependencyBase] = flatten(dependencies_dict.values())
+        # Inspect and mark dependencies prone to secrets leakage, scoping rulesets to the subprojects using them.
+        rulesets, scopes = select_rulesets(get_suspected_subproject_dependencies(repo))
 
-        rulesets: List[RuleSet] = list({
-            RuleFactory.fetch_rule_set(RULESET_DEPS_MAP[dependency.name])
-            for dependency in flattened_dependencies
-        })
+        crawler: Crawler
 
-        crawler: Crawler = Crawler(source=repo)
+        if staged or rev_range is not None or commits is not None:
+            crawler = Crawler.from_diff(
+                repo=repo,
+                staged=staged,
+                rev_range=rev_range,
+                commits=commits,
+                added_lines_only=added_lines_only
+            )
+        elif full_history or history_range is not None:
+            crawler = Crawler.from_history(repo=repo, rev_range=history_range)
+        else:
+            crawler = Crawler(source=repo)
 
         crawl_result: CrawlResult[DetectionResult[Any, DetectionException], CrawlException]
 
-        crawl_result = crawler.crawl_and_detect(
-            rulesets=rulesets,
-            dry_run=True
-        )
+        cache: Optional[ResultCache] = ResultCache.for_repo(repo) if use_cache else None
+
+        try:
+            # History crawls can make millions of detections, kept as rows of a compact store.
+            crawl_result = crawler.crawl_and_detect(
+                rulesets=rulesets,
+                dry_run=True,
+                workers=workers,
+                cache=cache,
+                prefilter=PreFilter(),
+                bulk_read=bulk_read,
+                scopes=scopes,
+                store=DetectionStore() if crawler.history is not None else None
+            )
+
+            if crawler.history is not None and crawl_result.store is not None:
+                for record in crawl_result.store:
+                    for commit_hexsha, path in crawler.history.occurrences(record.hexsha or ""):
+                        print(f"{record.rule_id} in {path} introduced at {commit_hexsha}")
+        finally:
+            if cache is not None:
+                cache.close()
+
+            if crawler.history is not None:
+                crawler.history.close()
 
         detections: List[Detection]
         (detections, detection_exceptions), crawl_exceptions = crawl_result
 
         Report.generate(runtype=RunType.DRY_RUN, data=crawl_result).dump(output="stdout")
 
+        for reason, count in crawl_result.skip_counts.items():
+            print(f"Skipped {count} file(s) before detection: {reason.value}")
+
         print("""
 The following secrets were detected in your code. Running this with fixing
 operation will write the changes to your repo.
@@ -1,16 +1,20 @@
 """Define module-wide exceptions."""
 from .crawler import CrawlException
+from .daemon import DaemonUnavailableError
 from .dependency import StringParseException
 from .detection import DetectionException
 from .git import GitignoreNotFoundError
 from .report import UnknownOutputStreamError
 from .rulebook import RuleSetNotFoundError
+from .vulndb import VulnerabilityDatabaseError
 
 __all__ = [
     "CrawlException",
+    "DaemonUnavailableError",
     "StringParseException",
     "DetectionException",
     "GitignoreNotFoundError",
     "UnknownOutputStreamError",
     "RuleSetNotFoundError",
+    "VulnerabilityDatabaseError",
 ]
@@ -0,0 +1,16 @@
+"""Define exceptions for the scan daemon and its client."""
+
+
+class DaemonUnavailableError(Exception):
+    """Raise when the scan daemon can't be reached."""
+
+    def __init__(self, expression: str = '', message: str = '') -> None:
+        """Initialize DaemonUnavailableError instance.
+
+        Args:
+            expression: Define expression for exception.
+            message: Message string for exception.
+        """
+        super().__init__()
+        self.expression = expression
+        self.message = message
@@ -0,0 +1,16 @@
+"""Define exceptions for the vulnerability database."""
+
+
+class VulnerabilityDatabaseError(Exception):
+    """Raise when the vulnerability database or an update bundle can't be used."""
+
+    def __init__(self, expression: str = '', message: str = '') -> None:
+        """Initialize VulnerabilityDatabaseError instance.
+
+        Args:
+            expression: Define expression for exception.
+            message: Message string for exception.
+        """
+        super().__init__()
+        self.expression = expression
+        self.message = message
@@ -1,13 +1,41 @@
 """Define rulebook registry and usable rulesets.
 
 RuleSets defined in this module can be applied over repositories to mark secrets.
+Bundled and plugin rulesets are imported lazily, on first access or when fetched by name.
 """
+from importlib import import_module
+from typing import Any
 from envprotect.exception.rulebook import RuleSetNotFoundError
-from .rulebook import RULESET_REGISTRY, RULESET_DEPS_MAP, RuleFactory, RuleSet
-from .aws import AWSRuleSet
+from .manifest import RULESET_MANIFEST, ENTRY_POINT_GROUP
+from .rulebook import RULESET_REGISTRY, RULESET_DEPS_MAP, RULESET_INSTANCES
+from .rulebook import RuleFactory, RuleSet, Rule, CompiledRulebook
+
+_LAZY_RULESETS = {
+    "AWSRuleSet": ".aws",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Import bundled ruleset classes on first access.
+
+    Args:
+        name: Name of the attribute.
+
+    Returns:
+        The ruleset class.
+
+    Raises:
+        AttributeError: Raised if the name isn't a bundled ruleset class.
+    """
+    if name not in _LAZY_RULESETS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(import_module(_LAZY_RULESETS[name], __name__), name)
+
 
 __all__ = [
     "RuleSetNotFoundError",
-    "RULESET_REGISTRY", "RULESET_DEPS_MAP", "RuleFactory", "RuleSet",
+    "RULESET_MANIFEST", "ENTRY_POINT_GROUP",
+    "RULESET_REGISTRY", "RULESET_DEPS_MAP", "RULESET_INSTANCES", "RuleFactory", "RuleSet", "Rule", "CompiledRulebook",
     "AWSRuleSet",
 ]
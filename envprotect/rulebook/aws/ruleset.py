@@ -2,30 +2,95 @@
 
 This ruleset covers AWS dependencies and common community-driven SDKs.
 """
-from typing import Dict, Any, Union
+import re
+from typing import List, Dict, Any, Union
 from envprotect.constants import RuleSets
-from ...core import Detection, DetectionResult
-from .. import RuleFactory, RuleSet
+from envprotect.core.detection import Detection, DetectionResult
+from envprotect.detector import EntropyDetector
+from .. import RuleFactory, RuleSet, Rule
+
+SECRET_ACCESS_KEY_LENGTH: int = 40
+"""Length of an AWS secret access key."""
+
+MIN_SECRET_ENTROPY: float = 3.5
+"""Minimum entropy of a secret access key. Filters out placeholders like `xxxx...`."""
 
 
 @RuleFactory.register(ruleset_name=RuleSets.AWS_RULESET,
                       deps_list=[
                         "aws-sdk",
                         "aws-s3"
-                      ])
+                      ],
+                      version="3")
 class AWSRuleSet(RuleSet):
     """AWS Rule Set.
 
     Describe ruleset with rules for extracting AWS related strings.
     """
 
+    rules = [
+        Rule(
+            rule_id="aws-access-key-id",
+            pattern=rb"(?:A3T[A-Z0-9]|AKIA|AGPA|AIDA|AROA|AIPA|ANPA|ANVA|ASIA)[A-Z0-9]{16}",
+            anchors=["A3T", "AKIA", "AGPA", "AIDA", "AROA", "AIPA", "ANPA", "ANVA", "ASIA"]
+        ),
+        Rule(
+            rule_id="aws-secret-access-key",
+            pattern=rb"(?i:aws_?secret_?access_?key)[\"']?\s*[:=]\s*[\"']?[A-Za-z0-9/+=]{40}",
+            anchors=["secret"],
+            anchors_ignore_case=True
+        ),
+    ]
+
     def __init__(self, **kwargs: Dict[str, Any]) -> None:
         """Initialize AWSRuleSet instance."""
         super().__init__()
+        self.scorer = EntropyDetector()
+
+    def build_detection(self, rule: Rule, match: re.Match[bytes]) -> Detection:
+        """Create a detection pointing at the key itself rather than its assignment.
+
+        Args:
+            rule: Rule which matched.
+            match: Match object of the rule pattern.
+
+        Returns:
+            Detection object for the match.
+        """
+        if rule.rule_id != "aws-secret-access-key":
+            return super().build_detection(rule, match)
+
+        return Detection(
+            result=match.group(0)[-SECRET_ACCESS_KEY_LENGTH:],
+            offset=match.end() - SECRET_ACCESS_KEY_LENGTH,
+            rule_id=rule.rule_id
+        )
+
+    def dispatch_matches(self,
+                         target: Union[str, bytes, memoryview],
+                         detections: List[Detection],
+                         apply: bool) -> DetectionResult:
+        """Score secret access key hits by entropy and drop placeholders.
+
+        Args:
+            target: Data string detections were made on.
+            detections: Detections made by the ruleset's rules.
+            apply: Flag to allow raising detection to apply.
+
+        Returns:
+            DetectionResult instance with detections listed.
+        """
+        secrets = [detection for detection in detections if detection.rule_id == "aws-secret-access-key"]
+        self.scorer.score_detections(secrets)
+
+        return DetectionResult(ok=[
+            detection for detection in detections
+            if detection.score is None or detection.score >= MIN_SECRET_ENTROPY
+        ], exception=None)
 
     # TODO: Update this generic method interface
     def detect_secrets(self,
-                       target: Union[str, bytes],
+                       target: Union[str, bytes, memoryview],
                        apply: bool = False) -> DetectionResult:
         """Detect secrets in the given file.
 
@@ -44,4 +109,4 @@ class AWSRuleSet(RuleSet):
         #         [detector.score_detection(repo) for detector in detectors]
         #     )
         # ) >= (len(detectors) // 2)
-        return DetectionResult(ok=[Detection(result="Default result")], exception=None)
+        return self.detect_rules(target=target, apply=apply)
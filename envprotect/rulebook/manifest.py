@@ -0,0 +1,112 @@
+"""Define the manifest of bundled and plugin rulesets.
+
+Lists the module and covered dependencies of every ruleset, so that
+dependencies can be mapped to rulesets without importing the rulesets. A
+ruleset module is only imported once its ruleset is fetched.
+
+Plugins advertise rulesets through the `envprotect.rulesets` entry point
+group. An entry point refers to a manifest entry, or a dict of them keyed by
+ruleset name, kept in a lightweight module apart from the ruleset itself:
+
+    [options.entry_points]
+    envprotect.rulesets =
+        stripe = envprotect_stripe.manifest:STRIPE_RULESET
+
+where `STRIPE_RULESET = ("envprotect_stripe.ruleset", ["stripe", "stripe-node"])`.
+"""
+import warnings
+from typing import List, Dict, Tuple, Any
+from envprotect.constants import RuleSets
+
+RulesetManifestEntry = Tuple[str, List[str]]
+"""Module registering a ruleset paired with the dependency names it covers."""
+
+RULESET_MANIFEST: Dict[str, RulesetManifestEntry] = {
+    RuleSets.AWS_RULESET: ("envprotect.rulebook.aws", ["aws-sdk", "aws-s3"]),
+}
+"""Manifest entries of the bundled rulesets, keyed by ruleset name."""
+
+ENTRY_POINT_GROUP: str = "envprotect.rulesets"
+"""Entry point group advertising plugin rulesets."""
+
+
+def _is_manifest_entry(value: Any) -> bool:
+    """Check the shape of a manifest entry.
+
+    Args:
+        value: Object loaded from an entry point.
+
+    Returns:
+        True if the value is a module name paired with a list of dependency names.
+    """
+    return isinstance(value, (tuple, list)) and len(value) == 2 and isinstance(value[0], str) \
+        and isinstance(value[1], (tuple, list)) and all(isinstance(dependency, str) for dependency in value[1])
+
+
+def _group_entry_points(group: str) -> List[Any]:
+    """List the entry points of a group across Python versions.
+
+    Python 3.9 returns a dict of entry points keyed by group and doesn't take
+    a `group` argument, while later versions return a selectable collection.
+
+    Args:
+        group: Entry point group to look up.
+
+    Returns:
+        Entry points of the group.
+    """
+    # Imported here, as scanning installed distributions is only needed once rulesets are looked up.
+    from importlib.metadata import entry_points  # pylint: disable=import-outside-toplevel
+
+    found: Any = entry_points()
+
+    if hasattr(found, "select"):
+        return list(found.select(group=group))
+
+    return list(found.get(group, []))
+
+
+def discover_manifest(group: str = ENTRY_POINT_GROUP) -> Dict[str, RulesetManifestEntry]:
+    """Collect manifest entries advertised by installed plugins.
+
+    Only the modules holding the manifest entries are imported, not the rulesets.
+    Entry points which fail to load or have an unexpected shape are skipped with a warning,
+    as is the whole discovery if installed distributions can't be scanned.
+
+    Args:
+        group: Entry point group to look up.
+
+    Returns:
+        Manifest entries keyed by ruleset name.
+    """
+    discovered: Dict[str, RulesetManifestEntry] = {}
+
+    try:
+        group_entry_points = _group_entry_points(group)
+    except Exception as exception:  # pylint: disable=broad-except
+        warnings.warn(f"Failed to look up ruleset entry points: {exception!r}")
+        return discovered
+
+    for entry_point in group_entry_points:
+        try:
+            value = entry_point.load()
+        except Exception as exception:  # pylint: disable=broad-except
+            warnings.warn(f"Failed to load ruleset entry point {entry_point.name}: {exception!r}")
+            continue
+
+        entries = value if isinstance(value, dict) else {entry_point.name: value}
+
+        for ruleset_name, entry in entries.items():
+            if not _is_manifest_entry(entry):
+                warnings.warn(f"Ruleset entry point {entry_point.name} doesn't refer to a manifest entry.")
+                continue
+
+            discovered[ruleset_name] = (entry[0], list(entry[1]))
+
+    return discovered
+
+
+__all__ = [
+    "RulesetManifestEntry", "RULESET_MANIFEST", "ENTRY_POINT_GROUP",
+    "discover_manifest",
+]
@@ -4,50 +4,164 @@ This module defines rules and its container rulesets, provides a partial
 blueprint class and rulefactory to register external rules.
 """
 from __future__ import annotations
+import re
+from copy import copy
+from importlib import import_module
 from abc import ABCMeta, abstractmethod
-from typing import List, Dict, Any, Callable, Type, TypeVar, Union, overload
-from envprotect.core.detection import DetectionResult
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Iterable, Optional, Pattern, Tuple, Type, TypeVar, Union, overload
+from envprotect.core.detection import Detection, DetectionResult
+from envprotect.detector.detector import Detector
 from envprotect.exception.rulebook import RuleSetNotFoundError
+from .manifest import RULESET_MANIFEST, discover_manifest
 
 # pylint: disable=invalid-name
 T = TypeVar("T", bound="RuleSet")
 # pylint: enable=invalid-name
 
-RULESET_REGISTRY: Dict[str, Type[RuleSet]]
+RULESET_REGISTRY: Dict[str, Type[RuleSet]] = {}
 """Maintain global ruleset registry."""
 
-RULESET_DEPS_MAP: Dict[str, str]
-"""Maintain mapping from dependency name to ruleset name."""
+RULESET_DEPS_MAP: Dict[str, str] = {
+    dependency: ruleset_name
+    for ruleset_name, (_, deps_list) in RULESET_MANIFEST.items() for dependency in deps_list
+}
+"""Maintain mapping from dependency name to ruleset name. Seeded from the manifest without importing rulesets."""
+
+RulesetInstanceKey = Tuple[str, Tuple[Tuple[str, Any], ...]]
+"""Ruleset name paired with the sorted keyword arguments of the instance."""
+
+RULESET_INSTANCES: Dict[RulesetInstanceKey, RuleSet] = {}
+"""Maintain ruleset instances shared across lookups, so that their setup runs once per process."""
+
+
+class Rule:
+    """Define a single pattern rule of a ruleset."""
+
+    def __init__(self,
+                 rule_id: str,
+                 pattern: Union[str, bytes],
+                 anchors: Optional[List[Union[str, bytes]]] = None,
+                 anchors_ignore_case: bool = False) -> None:
+        """Initialize new Rule object.
+
+        Args:
+            rule_id: Identifier of the rule, unique inside its ruleset.
+            pattern: Regex pattern matching the secret.
+            anchors: Literals of which at least one is present in every match. Files
+                containing none of them skip the rule. The rule always runs if not passed.
+            anchors_ignore_case: Flag to look for the anchors case-insensitively.
+        """
+        self.rule_id = rule_id
+        self.pattern: bytes = pattern.encode() if isinstance(pattern, str) else pattern
+        self.anchors: List[bytes] = [
+            anchor.encode() if isinstance(anchor, str) else anchor for anchor in anchors or []
+        ]
+        self.anchors_ignore_case = anchors_ignore_case
+
+    def anchor_patterns(self) -> List[bytes]:
+        """Escape the anchors into regex alternatives.
+
+        Returns:
+            Regex alternatives matching the anchors literally.
+        """
+        if self.anchors_ignore_case:
+            return [b"(?i:%s)" % re.escape(anchor) for anchor in self.anchors]
+
+        return [re.escape(anchor) for anchor in self.anchors]
 
 
 class RuleSet(metaclass=ABCMeta):
     """Define ruleset as a collection for similar rules."""
 
+    rules: List[Rule] = []
+    """Pattern rules of the ruleset. Compiled into the shared rulebook matcher."""
+
+    anchors: List[bytes] = []
+    """Literals required for `detect_secrets` to find anything. Only used by rulesets without rules."""
+
+    detectors: List[Detector] = []
+    """Rule-independent detectors run over every target. Their detections are dispatched with rule hits."""
+
+    name: str = ""
+    """Registry name of the ruleset. Set on registration."""
+
+    version: str = "0"
+    """Ruleset version. Bump on rule changes to invalidate cached detections."""
+
+    max_match_length: int = 4096
+    """Upper bound on the length of a single match. Used as overlap between streamed windows."""
+
     def __init__(self, **kwargs: Dict[str, Any]) -> None:
         """Act as placeholder abstract method."""
 
+    def build_detection(self, rule: Rule, match: re.Match[bytes]) -> Detection:
+        """Create a detection from a rule match.
+
+        Args:
+            rule: Rule which matched.
+            match: Match object of the rule pattern.
+
+        Returns:
+            Detection object for the match.
+        """
+        return Detection(result=match.group(0), offset=match.start(), rule_id=rule.rule_id)
+
+    def dispatch_matches(self,
+                         target: Union[str, bytes, memoryview],
+                         detections: List[Detection],
+                         apply: bool) -> DetectionResult:
+        """Collect detections of the ruleset's rules into a detection result.
+
+        Override to post-process rule hits, such as scoring or discarding them.
+
+        Args:
+            target: Data string detections were made on.
+            detections: Detections made by the ruleset's rules.
+            apply: Flag to allow raising detection to apply.
+
+        Returns:
+            DetectionResult instance with detections listed.
+        """
+        return DetectionResult(ok=detections, exception=None)
+
+    def detect_rules(self, target: Union[str, bytes, memoryview], apply: bool) -> DetectionResult:
+        """Detect secrets using only the ruleset's own rules.
+
+        Args:
+            target: Data string to be used for detection.
+            apply: Flag to allow raising detection to apply.
+
+        Returns:
+            DetectionResult instance with detections listed.
+        """
+        return RuleFactory.compile_rulebook([self]).detect(target=target, apply=apply)[0]
+
     @overload
     @abstractmethod
     def detect_secrets(self,
-                       target: Union[str, bytes],
+                       target: Union[str, bytes, memoryview],
                        apply: bool) -> DetectionResult: ...
 
     @overload
     @abstractmethod
     def detect_secrets(self,
-                       target: Union[str, bytes],
+                       target: Union[str, bytes, memoryview],
                        apply: bool,
                        *args: Any,
                        **kwargs: Any) -> DetectionResult: ...
 
     @abstractmethod
     def detect_secrets(self,
-                       target: Union[str, bytes],
+                       target: Union[str, bytes, memoryview],
                        apply: bool,
                        *args: Any,
                        **kwargs: Any) -> DetectionResult:
         """Act as placeholder abstract method.
 
+        Large blobs are passed in as overlapping memoryview windows. Detections
+        should carry their offset relative to the passed target.
+
         Args:
             target: Data string to be used for detection.
             apply: Flag to allow raising detection to apply.
@@ -57,14 +171,198 @@ class RuleSet(metaclass=ABCMeta):
         """
 
 
+class CompiledRulebook:
+    """Combine rules of several rulesets into compiled matchers.
+
+    Rules of each ruleset become named alternatives of one regex per
+    ruleset, so a target is scanned once per ruleset irrespective of its
+    number of rules. Matches of one ruleset never hide those of another,
+    keeping the detections of a ruleset independent of the rulesets it is
+    combined with, as the result cache and scoped crawls rely on.
+
+    Before the matchers run, a combined literal search over the rule anchors
+    rules out targets that can't contain any match, and a search over the
+    anchors of each ruleset rules out the ruleset. The same applies to
+    anchors of rulesets without rules before calling their `detect_secrets`.
+    Detectors shared by several rulesets run once per target.
+    """
+
+    def __init__(self, rulesets: List[RuleSet]) -> None:
+        """Initialize new compiled rulebook.
+
+        Args:
+            rulesets: List of ruleset objects to be combined.
+        """
+        self.rulesets = rulesets
+        self.owners: List[Dict[str, Rule]] = []
+        self.matchers: List[Optional[Pattern[bytes]]] = []
+        self.rule_anchor_matchers: List[Optional[Pattern[bytes]]] = []
+        anchor_alternatives: List[bytes] = []
+        unanchored = False
+
+        for ruleset in rulesets:
+            owners: Dict[str, Rule] = {}
+            alternatives: List[bytes] = []
+            ruleset_anchor_alternatives: List[bytes] = []
+            ruleset_unanchored = False
+
+            for rule_index, rule in enumerate(ruleset.rules):
+                group_name = f"_r{rule_index}"
+                owners[group_name] = rule
+                alternatives.append(b"(?P<%s>%s)" % (group_name.encode(), rule.pattern))
+                ruleset_anchor_alternatives.extend(rule.anchor_patterns())
+                ruleset_unanchored = ruleset_unanchored or not rule.anchors
+
+            self.owners.append(owners)
+            self.matchers.append(re.compile(b"|".join(alternatives)) if alternatives else None)
+            self.rule_anchor_matchers.append(
+                re.compile(b"|".join(ruleset_anchor_alternatives))
+                if ruleset_anchor_alternatives and not ruleset_unanchored else None
+            )
+            anchor_alternatives.extend(ruleset_anchor_alternatives)
+            unanchored = unanchored or ruleset_unanchored
+
+        # A single ruleset is ruled out by its own anchor matcher already.
+        self.anchor_matcher: Optional[Pattern[bytes]] = (
+            re.compile(b"|".join(anchor_alternatives))
+            if anchor_alternatives and not unanchored and len(rulesets) > 1 else None
+        )
+        self.ruleset_anchor_matchers: List[Optional[Pattern[bytes]]] = [
+            re.compile(b"|".join(re.escape(anchor) for anchor in ruleset.anchors))
+            if ruleset.anchors and not ruleset.rules else None
+            for ruleset in rulesets
+        ]
+
+    def detect(self, target: Union[str, bytes, memoryview], apply: bool) -> List[DetectionResult]:
+        """Scan the target with every ruleset's matcher and dispatch hits to the rulesets.
+
+        Rulesets without pattern rules or detectors fall back to their own `detect_secrets`.
+
+        Args:
+            target: Data string to be used for detection.
+            apply: Flag to allow raising detection to apply.
+
+        Returns:
+            DetectionResult instances, in the order of the rulesets.
+        """
+        data = target.encode() if isinstance(target, str) else target
+        detections: List[List[Detection]] = [[] for _ in self.rulesets]
+
+        if self.anchor_matcher is None or self.anchor_matcher.search(data) is not None:
+            for index, (ruleset, matcher) in enumerate(zip(self.rulesets, self.matchers)):
+                if matcher is None:
+                    continue
+
+                if (rule_anchor_matcher := self.rule_anchor_matchers[index]) is not None \
+                        and rule_anchor_matcher.search(data) is None:
+                    continue
+
+                for match in matcher.finditer(data):
+                    detections[index].append(ruleset.build_detection(self.owners[index][match.lastgroup or ""], match))
+
+        detector_runs: Dict[int, List[Detection]] = {}
+
+        for index, ruleset in enumerate(self.rulesets):
+            for detector in ruleset.detectors:
+                if id(detector) not in detector_runs:
+                    detector_runs[id(detector)] = detector.detect(data)
+                    detections[index].extend(detector_runs[id(detector)])
+                else:
+                    # Copy shared detections so rebasing offsets of one ruleset doesn't affect another.
+                    detections[index].extend(copy(detection) for detection in detector_runs[id(detector)])
+
+        results: List[DetectionResult] = []
+
+        for index, ruleset in enumerate(self.rulesets):
+            if ruleset.rules or ruleset.detectors:
+                results.append(ruleset.dispatch_matches(target=target, detections=detections[index], apply=apply))
+            elif (anchor_matcher := self.ruleset_anchor_matchers[index]) is not None \
+                    and anchor_matcher.search(data) is None:
+                results.append(DetectionResult(ok=[], exception=None))
+            else:
+                results.append(ruleset.detect_secrets(target=target, apply=apply))
+
+        return results
+
+
+@lru_cache(maxsize=64)
+def _compile_rulebook(rulesets: Tuple[RuleSet, ...]) -> CompiledRulebook:
+    """Compile and memoize a rulebook per combination of ruleset objects.
+
+    Args:
+        rulesets: Ruleset objects to be combined.
+
+    Returns:
+        Compiled rulebook over the rulesets.
+    """
+    return CompiledRulebook(list(rulesets))
+
+
 class RuleFactory:
     """Factory class for creating ruleset."""
 
+    _discovered: bool = False
+    """Whether plugin rulesets were discovered yet."""
+
+    @classmethod
+    def discover(cls) -> None:
+        """Add rulesets advertised through entry points to the manifest, once per process.
+
+        Bundled and already registered rulesets take precedence over plugins of the same name.
+        """
+        if cls._discovered:
+            return
+
+        cls._discovered = True
+
+        for ruleset_name, (module, deps_list) in discover_manifest().items():
+            if ruleset_name in RULESET_MANIFEST or ruleset_name in RULESET_REGISTRY:
+                continue
+
+            RULESET_MANIFEST[ruleset_name] = (module, deps_list)
+
+            for dependency in deps_list:
+                RULESET_DEPS_MAP.setdefault(dependency, ruleset_name)
+
+    @classmethod
+    def ruleset_names_for(cls, dependency_names: Iterable[str]) -> List[str]:
+        """Map dependencies to the rulesets covering them, without importing the rulesets.
+
+        Args:
+            dependency_names: Names of the dependencies found in a repository.
+
+        Returns:
+            Names of the covering rulesets, each listed once. Dependencies without a ruleset are left out.
+        """
+        cls.discover()
+
+        return list(dict.fromkeys(
+            RULESET_DEPS_MAP[dependency_name] for dependency_name in dependency_names
+            if dependency_name in RULESET_DEPS_MAP
+        ))
+
+    @classmethod
+    def compile_rulebook(cls, rulesets: List[RuleSet]) -> CompiledRulebook:
+        """Gather rules of the rulesets into a single compiled matcher.
+
+        Compiled rulebooks are reused for the same ruleset objects.
+
+        Args:
+            rulesets: List of ruleset objects to be combined.
+
+        Returns:
+            Compiled rulebook over the rulesets.
+        """
+        return _compile_rulebook(tuple(rulesets))
+
     @classmethod
     def fetch_rule_set(cls, ruleset_name: str, **kwargs: Dict[str, Any]) -> RuleSet:
-        """Create a new ruleset instance using factory.
+        """Fetch a ruleset instance using factory.
 
         Fetch appropriate ruleset from registry and return its instance.
+        Rulesets listed in the manifest are imported on first use. Instances are
+        shared per ruleset name and keyword arguments, so they must not be mutated.
+        Instances with unhashable keyword arguments are created anew on every call.
 
         Args:
             ruleset_name: Name of the ruleset to instantiate.
@@ -72,20 +370,65 @@ class RuleFactory:
         Returns:
             An instance of created rule.
         """
+        instance_key: RulesetInstanceKey = (ruleset_name, tuple(sorted(kwargs.items())))
+        shareable: bool = True
+
+        try:
+            return RULESET_INSTANCES[instance_key]
+        except KeyError:
+            pass
+        except TypeError:
+            shareable = False
+
+        if ruleset_name not in RULESET_REGISTRY:
+            cls.discover()
+
+            if ruleset_name in RULESET_MANIFEST:
+                import_module(RULESET_MANIFEST[ruleset_name][0])
+
         try:
             exec_class: Type[RuleSet] = RULESET_REGISTRY[ruleset_name]
-            ruleset_instance = exec_class(**kwargs)
-            return ruleset_instance
         except KeyError as error:
-            formatted_registry_keys: str = '\n'.join([f"- {key}" for key in RULESET_REGISTRY.keys()])
+            formatted_registry_keys: str = '\n'.join([f"- {key}" for key in cls.ruleset_names()])
             raise RuleSetNotFoundError(message=f"""
 RuleSet isn't present in the registry yet. Consider registering using the `register` class-method.
 
 Existing rule sets are as follows:\n{formatted_registry_keys}
             """) from error
 
+        ruleset_instance = exec_class(**kwargs)
+
+        if shareable:
+            RULESET_INSTANCES[instance_key] = ruleset_instance
+
+        return ruleset_instance
+
+    @classmethod
+    def invalidate(cls, ruleset_name: Optional[str] = None) -> None:
+        """Drop shared ruleset instances and the rulebooks compiled from them.
+
+        Args:
+            ruleset_name: Name of the ruleset whose instances are dropped. Drops every instance if not passed.
+        """
+        for instance_key in list(RULESET_INSTANCES):
+            if ruleset_name is None or instance_key[0] == ruleset_name:
+                del RULESET_INSTANCES[instance_key]
+
+        _compile_rulebook.cache_clear()
+
+    @classmethod
+    def ruleset_names(cls) -> List[str]:
+        """List every ruleset which can be fetched, whether it was imported yet or not.
+
+        Returns:
+            Names of the manifest and registry rulesets.
+        """
+        cls.discover()
+
+        return list(dict.fromkeys([*RULESET_MANIFEST, *RULESET_REGISTRY]))
+
     @classmethod
-    def register(cls, ruleset_name: str, deps_list: List[str]) -> Callable[[Type[T]], Type[T]]:
+    def register(cls, ruleset_name: str, deps_list: List[str], version: str = "0") -> Callable[[Type[T]], Type[T]]:
         """Register ruleset class to rulebook registry using factory.
 
         Fetch appropriate ruleset from registry and return its instance.
@@ -93,6 +436,7 @@ Existing rule sets are as follows:\n{formatted_registry_keys}
         Args:
             ruleset_name: Name of the ruleset class to register.
             deps_list: List of actual dependency names corresponding to ruleset.
+            version: Version of the ruleset rules. Cached detections of older versions are discarded.
 
         Returns:
             The callable ruleset class object.
@@ -102,6 +446,9 @@ Existing rule sets are as follows:\n{formatted_registry_keys}
                 print("""
 RuleSet already registered. This will override the previous rule.
                 """)
+                cls.invalidate(ruleset_name)
+            wrapped_class.name = ruleset_name
+            wrapped_class.version = version
             RULESET_REGISTRY[ruleset_name] = wrapped_class
             for dependency in deps_list:
                 RULESET_DEPS_MAP[dependency] = ruleset_name
@@ -0,0 +1,570 @@
+"""Watch a repository and rescan files as they change.
+
+Subscribes to inotify events on Linux and falls back to polling file stats
+elsewhere. Bursts of events, such as a checkout touching thousands of files,
+are debounced and coalesced into a single rescan of the changed files only.
+"""
+
+from __future__ import annotations
+import ctypes
+import ctypes.util
+import os
+import posixpath
+import select
+import struct
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Dict, Callable, Iterator, Optional, Set, Tuple
+from .core.crawler import Crawler, detect_in_entry
+from .core.detection import Detection
+from .core.filesystem import GITIGNORE_FILE, FileEntry, IgnoreMatcher, walk_files, walk_subtree
+from .core.prefilter import PreFilter
+from .envprotect import find_repo, get_suspected_dependencies
+from .rulebook import RuleFactory, RuleSet
+
+DEFAULT_DEBOUNCE: float = 0.2
+"""Seconds without new events after which a burst is considered over."""
+
+DEFAULT_MAX_DELAY: float = 2.0
+"""Maximum seconds a burst is coalesced for before rescanning."""
+
+DEFAULT_POLL_INTERVAL: float = 1.0
+"""Seconds between two polls of the polling watcher."""
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK: int = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+"""Events subscribed to on every watched directory."""
+
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+"""Layout of `struct inotify_event` without its name."""
+
+Changes = Optional[Set[str]]
+"""Changed paths relative to the watched root. None if events were lost and everything must be rescanned."""
+
+UpdateCallback = Callable[[Dict[str, List[Detection]], Dict[str, List[Detection]]], None]
+"""Called with the detections of rescanned paths and all current detections, keyed by path."""
+
+
+class Watcher(ABC):
+    """Report changed paths below a root directory."""
+
+    def __init__(self, root: str, ignores: IgnoreMatcher) -> None:
+        """Initialize new watcher.
+
+        Args:
+            root: Directory to be watched.
+            ignores: Ignore rules of the root. Ignored paths aren't reported.
+        """
+        self.root = os.path.abspath(root)
+        self.ignores = ignores
+
+    @abstractmethod
+    def wait(self, timeout: Optional[float]) -> Changes:
+        """Wait for changes.
+
+        Args:
+            timeout: Seconds to wait. Waits until a change happens if None.
+
+        Returns:
+            Changed paths, empty if the timeout passed without changes.
+        """
+
+    def close(self) -> None:
+        """Release resources held by the watcher."""
+
+
+class PollingWatcher(Watcher):
+    """Detect changes by comparing file stats between walks of the tree."""
+
+    def __init__(self, root: str, ignores: IgnoreMatcher, interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        """Initialize new polling watcher and take the first snapshot.
+
+        Args:
+            root: Directory to be watched.
+            ignores: Ignore rules of the root. Ignored paths aren't reported.
+            interval: Seconds between two polls.
+        """
+        super().__init__(root, ignores)
+        self.interval = interval
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Stat every file which isn't ignored.
+
+        Returns:
+            Modification time and size of every file, keyed by path.
+        """
+        snapshot: Dict[str, Tuple[int, int]] = {}
+
+        for entry in walk_files(self.root):
+            try:
+                stat = os.stat(entry.abspath)
+            except OSError:
+                continue
+
+            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+    def wait(self, timeout: Optional[float]) -> Changes:
+        """Poll until files change or the timeout passes.
+
+        Args:
+            timeout: Seconds to wait. Waits until a change happens if None.
+
+        Returns:
+            Changed paths, empty if the timeout passed without changes.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            snapshot = self._snapshot()
+            changed = {
+                path for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+            pause = self.interval if deadline is None else min(self.interval, max(deadline - time.monotonic(), 0))
+            time.sleep(pause)
+
+
+class InotifyWatcher(Watcher):
+    """Receive change events from inotify for every directory which isn't ignored."""
+
+    def __init__(self, root: str, ignores: IgnoreMatcher) -> None:
+        """Initialize new inotify watcher and watch the tree.
+
+        Args:
+            root: Directory to be watched.
+            ignores: Ignore rules of the root. Ignored paths aren't reported.
+
+        Raises:
+            OSError: Raised if inotify isn't available or the watch limit is reached.
+        """
+        super().__init__(root, ignores)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify isn't available on this platform.")
+
+        self.fd: int = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "Failed to initialize inotify.")
+
+        self.directories: Dict[int, str] = {}
+
+        try:
+            self._watch_tree("")
+        except OSError:
+            self.close()
+            raise
+
+    def _watch_tree(self, directory: str) -> None:
+        """Watch a directory and every subdirectory which isn't ignored.
+
+        Args:
+            directory: Path of the directory relative to the root.
+        """
+        descriptor: int = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(os.path.join(self.root, directory)), WATCH_MASK
+        )
+
+        if descriptor < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"Failed to watch {directory or self.root}: {os.strerror(errno)}")
+
+        self.directories[descriptor] = directory
+
+        try:
+            with os.scandir(os.path.join(self.root, directory)) as iterator:
+                subdirectories = [entry.name for entry in iterator if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+
+        for name in subdirectories:
+            path = f"{directory}/{name}" if directory else name
+
+            if not self.ignores.is_ignored(path, is_dir=True):
+                self._watch_tree(path)
+
+    def _rewatch(self, directory: str) -> None:
+        """Watch a directory again, tolerating failures.
+
+        Args:
+            directory: Path of the directory relative to the root.
+        """
+        try:
+            self._watch_tree(directory)
+        except OSError:
+            # The directory is gone already or the watch limit is reached. It is still rescanned.
+            pass
+
+    def _unwatch_tree(self, directory: str) -> None:
+        """Stop watching a moved or deleted directory and every subdirectory below it.
+
+        Args:
+            directory: Path of the directory relative to the root.
+        """
+        for descriptor, path in list(self.directories.items()):
+            if path == directory or path.startswith(f"{directory}/"):
+                del self.directories[descriptor]
+                # Fails harmlessly if the kernel already dropped the watch of a deleted directory.
+                self.libc.inotify_rm_watch(self.fd, descriptor)
+
+    def wait(self, timeout: Optional[float]) -> Changes:
+        """Wait for events and drain every event already queued.
+
+        Args:
+            timeout: Seconds to wait. Waits until a change happens if None.
+
+        Returns:
+            Changed paths, empty if the timeout passed without changes.
+        """
+        changed: Set[str] = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+
+        while readable:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+
+            for mask, path in self._parse(data):
+                if mask & IN_Q_OVERFLOW:
+                    return None
+
+                if mask & IN_ISDIR and mask & (IN_MOVED_FROM | IN_DELETE):
+                    self._unwatch_tree(path)
+
+                if posixpath.basename(path) == GITIGNORE_FILE:
+                    # Directories un-ignored by the changed rules need watches of their own.
+                    self.ignores.invalidate()
+                    self._rewatch(posixpath.dirname(path))
+
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) \
+                        and not self.ignores.is_ignored(path, is_dir=True):
+                    self._rewatch(path)
+
+                if not self.ignores.is_ignored(path, is_dir=bool(mask & IN_ISDIR)):
+                    changed.add(path)
+
+        return changed
+
+    def _parse(self, data: bytes) -> Iterator[Tuple[int, str]]:
+        """Parse a buffer of inotify events.
+
+        Args:
+            data: Raw events read from the inotify descriptor.
+
+        Yields:
+            Event mask and path relative to the root of every event.
+        """
+        offset = 0
+
+        while offset < len(data):
+            descriptor, mask, _, length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                yield mask, ""
+                continue
+
+            if mask & IN_IGNORED:
+                # The watch was removed, either explicitly or because its directory is gone.
+                self.directories.pop(descriptor, None)
+                continue
+
+            if descriptor not in self.directories or not name:
+                continue
+
+            directory = self.directories[descriptor]
+            yield mask, f"{directory}/{name}" if directory else name
+
+    def close(self) -> None:
+        """Close the inotify descriptor, removing every watch."""
+        os.close(self.fd)
+
+
+def create_watcher(root: str, ignores: IgnoreMatcher, poll_interval: float = DEFAULT_POLL_INTERVAL) -> Watcher:
+    """Create an inotify watcher, falling back to polling if inotify can't be used.
+
+    Args:
+        root: Directory to be watched.
+        ignores: Ignore rules of the root.
+        poll_interval: Seconds between two polls of the fallback watcher.
+
+    Returns:
+        Watcher over the root.
+    """
+    try:
+        return InotifyWatcher(root, ignores)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(root, ignores, interval=poll_interval)
+
+
+def wait_for_burst(watcher: Watcher,
+                   debounce: float = DEFAULT_DEBOUNCE,
+                   max_delay: float = DEFAULT_MAX_DELAY) -> Changes:
+    """Wait for a burst of changes and coalesce it.
+
+    A burst ends once no change was seen for `debounce` seconds, or after
+    `max_delay` seconds, whichever comes first.
+
+    Args:
+        watcher: Watcher reporting the changes.
+        debounce: Seconds without changes ending a burst.
+        max_delay: Maximum seconds a burst is coalesced for.
+
+    Returns:
+        Every path changed during the burst. None if everything must be rescanned.
+    """
+    changed = watcher.wait(None)
+    deadline = time.monotonic() + max_delay
+
+    while changed:
+        remaining = min(debounce, deadline - time.monotonic())
+
+        if remaining <= 0:
+            break
+
+        more = watcher.wait(remaining)
+
+        if more is None:
+            return None
+
+        if not more:
+            break
+
+        changed |= more
+
+    return changed
+
+
+class WatchSession:
+    """Keep detections of a working tree up to date with its changes."""
+
+    def __init__(self,
+                 root: str,
+                 rulesets: List[RuleSet],
+                 prefilter: Optional[PreFilter] = None,
+                 on_update: Optional[UpdateCallback] = None) -> None:
+        """Initialize new watch session.
+
+        Args:
+            root: Working tree to be watched.
+            rulesets: List of ruleset objects.
+            prefilter: Pre-filter deciding which files are passed on to detection.
+            on_update: Called after every rescan with the detections of the rescanned paths.
+        """
+        self.root = os.path.abspath(root)
+        self.rulesets = rulesets
+        self.prefilter = prefilter
+        self.on_update = on_update
+        self.ignores = IgnoreMatcher(self.root)
+        self.results: Dict[str, List[Detection]] = {}
+
+    def scan_all(self) -> Dict[str, List[Detection]]:
+        """Scan the whole working tree, replacing every result.
+
+        Returns:
+            Detections of every file, keyed by path.
+        """
+        self.ignores.invalidate()
+        crawl_result = Crawler(source=self.root).crawl_and_detect(
+            rulesets=self.rulesets, dry_run=True, prefilter=self.prefilter
+        )
+        self.results = {}
+
+        for detection_result in crawl_result.ok:
+            for detection in detection_result.ok or []:
+                if isinstance(detection, Detection) and detection.path is not None:
+                    self.results.setdefault(detection.path, []).append(detection)
+
+        return dict(self.results)
+
+    def rescan(self, paths: Set[str]) -> Dict[str, List[Detection]]:
+        """Rescan changed paths only.
+
+        Removed paths drop their detections. Changed directories are rescanned
+        with everything below them, against the ignore rules of the root. A
+        changed `.gitignore` rescans its whole directory, as files below it may
+        have become ignored or un-ignored.
+
+        Args:
+            paths: Changed paths relative to the root.
+
+        Returns:
+            Detections of the rescanned files, keyed by path. Files without detections map to an empty list.
+        """
+        if any(posixpath.basename(path) == GITIGNORE_FILE for path in paths):
+            self.ignores.invalidate()
+            paths = {
+                posixpath.dirname(path) if posixpath.basename(path) == GITIGNORE_FILE else path for path in paths
+            }
+
+        updated: Dict[str, List[Detection]] = {}
+        rescanned: List[str] = []
+
+        for path in sorted(paths):
+            if any(not parent or path.startswith(f"{parent}/") for parent in rescanned):
+                continue
+
+            rescanned.append(path)
+            prefix = f"{path}/" if path else ""
+
+            for stale in [key for key in self.results if key == path or key.startswith(prefix)]:
+                del self.results[stale]
+                updated[stale] = []
+
+            for entry in walk_subtree(self.ignores, path):
+                updated[entry.path] = self._detect(entry.path, entry.abspath)
+
+        for path, detections in updated.items():
+            if detections:
+                self.results[path] = detections
+
+        return updated
+
+    def _detect(self, path: str, abspath: str) -> List[Detection]:
+        """Run the rulesets over a single file.
+
+        Args:
+            path: Path of the file relative to the root.
+            abspath: Absolute path of the file.
+
+        Returns:
+            Detections made in the file. Files rejected by the pre-filter have none.
+        """
+        try:
+            entry = FileEntry(abspath=abspath, path=path, size=os.path.getsize(abspath))
+        except OSError:
+            return []
+
+        if self.prefilter is not None and self.prefilter.check_blob(entry, sniff=False, streamed=True) is not None:
+            return []
+
+        detected = detect_in_entry(
+            entry=entry,
+            rulesets=self.rulesets,
+            dry_run=True,
+            sniff_size=self.prefilter.sniff_size if self.prefilter is not None else 0
+        )
+
+        if detected is None:
+            return []
+
+        detection_results, _ = detected
+        detections: List[Detection] = []
+
+        for detection_result in detection_results:
+            for detection in detection_result.ok or []:
+                if isinstance(detection, Detection):
+                    detection.hexsha, detection.path = entry.hexsha, entry.path
+                    detections.append(detection)
+
+        return detections
+
+    def run(self,
+            watcher: Watcher,
+            debounce: float = DEFAULT_DEBOUNCE,
+            max_delay: float = DEFAULT_MAX_DELAY) -> None:
+        """Scan the working tree once, then rescan changes until interrupted.
+
+        Args:
+            watcher: Watcher reporting changes of the working tree.
+            debounce: Seconds without changes ending a burst.
+            max_delay: Maximum seconds a burst is coalesced for.
+        """
+        updated = self.scan_all()
+
+        while True:
+            if self.on_update is not None:
+                self.on_update(updated, self.results)
+
+            changed = wait_for_burst(watcher, debounce=debounce, max_delay=max_delay)
+            updated = self.scan_all() if changed is None else self.rescan(changed)
+
+
+def print_update(updated: Dict[str, List[Detection]], results: Dict[str, List[Detection]]) -> None:
+    """Print the detections of rescanned paths.
+
+    Args:
+        updated: Detections of the rescanned paths.
+        results: All current detections.
+    """
+    for path, detections in sorted(updated.items()):
+        if not detections:
+            print(f"{path}: clean")
+            continue
+
+        for detection in detections:
+            print(f"{path}:{detection.line or '-'}:{detection.offset}: {detection.rule_id}")
+
+    print(f"{sum(len(detections) for detections in results.values())} detection(s) in {len(results)} file(s).")
+
+
+def watch(path: Path = Path(os.getcwd()),
+          debounce: float = DEFAULT_DEBOUNCE,
+          max_delay: float = DEFAULT_MAX_DELAY,
+          poll_interval: float = DEFAULT_POLL_INTERVAL,
+          on_update: UpdateCallback = print_update) -> None:
+    """Watch the working tree of a repository and rescan files as they change.
+
+    Args:
+        path: Path inside the repository to be watched.
+        debounce: Seconds without changes ending a burst.
+        max_delay: Maximum seconds a burst is coalesced for.
+        poll_interval: Seconds between two polls if inotify isn't available.
+        on_update: Called after every rescan with the detections of the rescanned paths.
+    """
+    repo = find_repo(path)
+    root = os.path.dirname(repo.git_dir)
+
+    suspected_dependencies = get_suspected_dependencies(repo)
+    rulesets: List[RuleSet] = [
+        RuleFactory.fetch_rule_set(ruleset_name) for ruleset_name in RuleFactory.ruleset_names_for(
+            dependency.name for dependencies in suspected_dependencies.values() for dependency in dependencies
+        )
+    ]
+
+    session = WatchSession(root=root, rulesets=rulesets, prefilter=PreFilter(), on_update=on_update)
+    watcher = create_watcher(root, session.ignores, poll_interval=poll_interval)
+
+    try:
+        session.run(watcher, debounce=debounce, max_delay=max_delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+__all__ = [
+    "DEFAULT_DEBOUNCE", "DEFAULT_MAX_DELAY", "DEFAULT_POLL_INTERVAL",
+    "Changes", "UpdateCallback",
+    "Watcher", "PollingWatcher", "InotifyWatcher",
+    "create_watcher", "wait_for_burst",
+    "WatchSession", "print_update", "watch",
+]
+
+
+if __name__ == '__main__':
+    watch()
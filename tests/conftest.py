@@ -0,0 +1,86 @@
+"""Shared fixtures of the test suite."""
+import os
+import subprocess
+from typing import List, Dict, Callable
+import pytest
+from git import Repo
+from envprotect.constants import RuleSets
+from envprotect.rulebook import RuleFactory, RuleSet
+
+Commit = Callable[..., str]
+"""Write files into the fixture repository and commit them, returning the commit hex SHA."""
+
+
+def git(repo_dir: str, *args: str) -> str:
+    """Run a git command inside a repository with a fixed identity.
+
+    Args:
+        repo_dir: Working tree of the repository.
+        args: Git command line arguments.
+
+    Returns:
+        Standard output of the command.
+    """
+    return subprocess.run(
+        ["git", "-C", repo_dir, "-c", "user.name=envprotect", "-c", "user.email=envprotect@example.com", *args],
+        check=True, capture_output=True, text=True
+    ).stdout
+
+
+def write_files(repo_dir: str, files: Dict[str, str]) -> None:
+    """Write files below a directory, creating parent directories.
+
+    Args:
+        repo_dir: Root directory.
+        files: File contents keyed by `/`-separated path.
+    """
+    for path, content in files.items():
+        file_path = os.path.join(repo_dir, *path.split("/"))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        with open(file_path, "w") as file:
+            file.write(content)
+
+
+@pytest.fixture
+def repo(tmp_path: os.PathLike) -> Repo:
+    """Create an empty git repository.
+
+    Args:
+        tmp_path: Temporary directory of the test.
+
+    Returns:
+        Repository object.
+    """
+    repo_dir = os.fspath(tmp_path)
+    git(repo_dir, "init", "-q")
+    return Repo(repo_dir)
+
+
+@pytest.fixture
+def commit(repo: Repo) -> Commit:
+    """Create a helper committing files into the fixture repository.
+
+    Args:
+        repo: Fixture repository.
+
+    Returns:
+        Helper taking file contents keyed by path and an optional message.
+    """
+    def commit_files(files: Dict[str, str], message: str = "update") -> str:
+        write_files(repo.working_tree_dir, files)
+        git(repo.working_tree_dir, "add", "-A")
+        git(repo.working_tree_dir, "commit", "-q", "-m", message)
+        return git(repo.working_tree_dir, "rev-parse", "HEAD").strip()
+
+    return commit_files
+
+
+@pytest.fixture
+def aws_rulesets() -> List[RuleSet]:
+    """Fetch the bundled AWS ruleset.
+
+    Returns:
+        List holding the AWS ruleset.
+    """
+    return [RuleFactory.fetch_rule_set(RuleSets.AWS_RULESET)]
@@ -0,0 +1,52 @@
+"""Tests of scanning many repositories at once."""
+import asyncio
+import os
+import pytest
+from tests.conftest import git, write_files
+from tests.utils import ACCESS_KEY, crawl_findings
+from envprotect.batch import abatch_scan, batch_scan
+from envprotect.envprotect import async_scan
+
+
+@pytest.fixture
+def scanned_repos(monkeypatch, aws_rulesets, tmp_path):
+    """Create a repository with a committed secret and a directory outside of any repository."""
+    monkeypatch.setattr("envprotect.batch.get_suspected_subproject_dependencies", lambda repo, executor=None: {})
+    monkeypatch.setattr("envprotect.batch.select_rulesets", lambda subprojects: (aws_rulesets, {}))
+    monkeypatch.setattr("envprotect.envprotect.get_suspected_subproject_dependencies", lambda repo, executor=None: {})
+    monkeypatch.setattr("envprotect.envprotect.select_rulesets", lambda subprojects: (aws_rulesets, {}))
+
+    repo_dir = os.path.join(os.fspath(tmp_path), "repo")
+    plain_dir = os.path.join(os.fspath(tmp_path), "plain")
+    write_files(repo_dir, {"config/aws.env": f"AWS_KEY={ACCESS_KEY}\n"})
+    os.makedirs(plain_dir)
+    git(repo_dir, "init", "-q")
+    git(repo_dir, "add", "-A")
+    git(repo_dir, "commit", "-q", "-m", "secret")
+
+    return repo_dir, plain_dir
+
+
+def test_batch_reports_every_repository_including_failures(scanned_repos):
+    """A repository failing to scan gets a report with its exception while the others are still scanned."""
+    repo_dir, plain_dir = scanned_repos
+    reports = {report.path: report for report in batch_scan([repo_dir, plain_dir], workers=1, use_cache=False)}
+
+    assert [path for path, _, _ in crawl_findings(reports[repo_dir].result)] == ["config/aws.env"]
+    assert reports[repo_dir].exception is None
+    assert reports[plain_dir].result is None
+    assert reports[plain_dir].exception is not None
+
+
+def test_async_batch_and_single_scans_agree(scanned_repos):
+    """Async batch scans report the same detections as a single async scan of the repository."""
+    repo_dir, plain_dir = scanned_repos
+
+    async def scan_all():
+        return [report async for report in abatch_scan([plain_dir, repo_dir], workers=1, use_cache=False)]
+
+    reports = {report.path: report for report in asyncio.run(scan_all())}
+    single = asyncio.run(async_scan(repo_dir, use_cache=False))
+
+    assert crawl_findings(reports[repo_dir].result) == crawl_findings(single)
+    assert reports[plain_dir].exception is not None
@@ -0,0 +1,93 @@
+"""Tests of the persistent detection result cache."""
+import pickle
+import sqlite3
+from copy import copy
+from tests.utils import ACCESS_KEY, crawl_findings
+from envprotect.core.cache import ResultCache
+from envprotect.core.crawler import Crawler
+from envprotect.core.detection import Detection, DetectionResult
+from envprotect.exception.detection import DetectionException
+
+
+def test_result_round_trips_through_json(tmp_path, aws_rulesets):
+    """Detections and detection exceptions are restored field by field."""
+    result = DetectionResult(ok=[
+        Detection(result=b"\x00AKIA", offset=4, line=2, rule_id="aws-access-key-id", score=3.25),
+        Detection(result="text", rule_id="other"),
+    ], exception=[DetectionException(expression="x", message="failed")])
+
+    with ResultCache(str(tmp_path / "cache.sqlite3")) as cache:
+        cache.put("ab" * 20, aws_rulesets[0], result)
+        cache.flush()
+        cached = cache.get("ab" * 20, aws_rulesets[0])
+
+    assert [(d.result, d.offset, d.line, d.rule_id, d.score) for d in cached.ok] == [
+        (b"\x00AKIA", 4, 2, "aws-access-key-id", 3.25), ("text", None, None, "other", None),
+    ]
+    assert [(e.expression, e.message) for e in cached.exception] == [("x", "failed")]
+
+
+def test_version_bump_invalidates_entries(tmp_path, aws_rulesets):
+    """Entries of a ruleset are dropped once the ruleset version changes."""
+    path = str(tmp_path / "cache.sqlite3")
+    ruleset = aws_rulesets[0]
+
+    with ResultCache(path) as cache:
+        cache.sync_versions([ruleset])
+        cache.put("cd" * 20, ruleset, DetectionResult(ok=[], exception=None))
+
+    bumped = copy(ruleset)
+    bumped.version = ruleset.version + ".1"
+
+    with ResultCache(path) as cache:
+        assert cache.get("cd" * 20, ruleset) is not None
+        cache.sync_versions([bumped])
+        assert cache.get("cd" * 20, ruleset) is None
+        assert cache.get("cd" * 20, bumped) is None
+
+
+def test_pickled_rows_are_never_loaded(tmp_path, aws_rulesets):
+    """Caches of the pickle format are emptied on open instead of being unpickled."""
+    path = str(tmp_path / "cache.sqlite3")
+    ruleset = aws_rulesets[0]
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE detections (hexsha TEXT, ruleset TEXT, version TEXT, result BLOB,
+                                 PRIMARY KEY (hexsha, ruleset, version));
+        CREATE TABLE rulesets (name TEXT PRIMARY KEY, version TEXT NOT NULL);
+    """)
+    payload = pickle.dumps(DetectionResult(ok=[], exception=None))
+    row = ("ef" * 20, ruleset.name, ruleset.version, payload)
+    connection.execute("INSERT INTO detections VALUES (?, ?, ?, ?)", row)
+    connection.commit()
+    connection.close()
+
+    with ResultCache(path) as cache:
+        assert cache.get("ef" * 20, ruleset) is None
+
+
+def test_malformed_rows_miss(tmp_path, aws_rulesets):
+    """Rows which aren't stored detection results are treated as misses."""
+    ruleset = aws_rulesets[0]
+
+    with ResultCache(str(tmp_path / "cache.sqlite3")) as cache:
+        cache.connection.execute("INSERT INTO detections VALUES (?, ?, ?, ?)",
+                                 ("01" * 20, ruleset.name, ruleset.version, '{"ok": [{"offset": 1}]}'))
+        assert cache.get("01" * 20, ruleset) is None
+
+
+def test_cached_crawl_matches_fresh_crawl(repo, commit, aws_rulesets, monkeypatch):
+    """A second crawl is served from the cache and reports the same detections."""
+    commit({"a.py": f"key = '{ACCESS_KEY}'\n", "b.py": "nothing\n"})
+    cache = ResultCache.for_repo(repo)
+
+    first = Crawler(source=repo).crawl_and_detect(rulesets=aws_rulesets, dry_run=True, cache=cache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached blob detected again")
+
+    monkeypatch.setattr("envprotect.core.crawler.detect_in_entry", fail)
+    second = Crawler(source=repo).crawl_and_detect(rulesets=aws_rulesets, dry_run=True, cache=cache)
+    cache.close()
+
+    assert crawl_findings(first) == crawl_findings(second) == [("a.py", "aws-access-key-id", 7)]
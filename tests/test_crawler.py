@@ -0,0 +1,58 @@
+"""Tests of the crawler backends."""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from tests.utils import ACCESS_KEY, crawl_findings
+from envprotect.core.crawler import Crawler, init_shared_worker
+
+
+def test_process_pool_matches_serial_crawl(repo, commit, aws_rulesets):
+    """Detections of a pooled crawl equal those of a serial crawl, in the same order."""
+    commit({f"pkg{index}/settings.py": f"key = '{ACCESS_KEY}'\n" * (index % 3) for index in range(40)})
+
+    serial = Crawler(source=repo).crawl_and_detect(rulesets=aws_rulesets, dry_run=True)
+    pooled = Crawler(source=repo).crawl_and_detect(rulesets=aws_rulesets, dry_run=True, workers=2, batch_size=3)
+
+    assert crawl_findings(serial) == crawl_findings(pooled)
+    assert len(crawl_findings(serial)) == sum(index % 3 for index in range(40))
+
+
+def test_detections_are_stamped_with_blob_and_path(repo, commit, aws_rulesets):
+    """Every detection carries the path and blob SHA it was found in."""
+    commit({"config/aws.env": f"AWS_ACCESS_KEY_ID={ACCESS_KEY}\n"})
+
+    result = Crawler(source=repo).crawl_and_detect(rulesets=aws_rulesets, dry_run=True, workers=2)
+    detections = [detection for detection_result in result.ok for detection in detection_result.ok]
+
+    assert [(detection.path, detection.offset) for detection in detections] == [("config/aws.env", 18)]
+    assert detections[0].hexsha == repo.head.commit.tree["config/aws.env"].hexsha
+
+
+@pytest.mark.parametrize("pooled", [False, True])
+def test_async_crawl_matches_serial_crawl(repo, commit, aws_rulesets, pooled):
+    """The asyncio pipeline reports the detections of a serial crawl in the same order."""
+    commit({f"pkg{index}/settings.py": f"key = '{ACCESS_KEY}'\n" * (index % 3) for index in range(20)})
+    serial = Crawler(source=repo).crawl_and_detect(rulesets=aws_rulesets, dry_run=True)
+
+    if pooled:
+        with ProcessPoolExecutor(max_workers=2, initializer=init_shared_worker, initargs=(aws_rulesets,)) as executor:
+            crawled = asyncio.run(Crawler(source=repo).acrawl(
+                rulesets=aws_rulesets, dry_run=True, executor=executor, concurrency=3, shared_rulesets=aws_rulesets
+            ))
+    else:
+        crawled = asyncio.run(Crawler(source=repo).acrawl(rulesets=aws_rulesets, dry_run=True, concurrency=3))
+
+    assert crawl_findings(crawled) == crawl_findings(serial)
+
+
+def test_async_crawl_sends_rulesets_the_workers_lack(repo, commit, aws_rulesets):
+    """A ruleset which isn't one of the shared instances is sent to the workers instead of failing the crawl."""
+    commit({"config/aws.env": f"AWS_KEY={ACCESS_KEY}\n"})
+    unshared = [type(aws_rulesets[0])()]
+
+    with ProcessPoolExecutor(max_workers=1, initializer=init_shared_worker, initargs=(aws_rulesets,)) as executor:
+        crawled = asyncio.run(Crawler(source=repo).acrawl(
+            rulesets=unshared, dry_run=True, executor=executor, shared_rulesets=aws_rulesets
+        ))
+
+    assert [path for path, _, _ in crawl_findings(crawled)] == ["config/aws.env"]
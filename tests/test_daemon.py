@@ -0,0 +1,65 @@
+"""Tests of the scan daemon."""
+import os
+import pytest
+from tests.conftest import write_files
+from tests.utils import ACCESS_KEY
+from envprotect.core.dependency import discover_manifests as discover
+from envprotect.daemon import Daemon
+
+
+@pytest.fixture
+def daemon_factory(monkeypatch, aws_rulesets, tmp_path):
+    """Create daemons scanning with the AWS ruleset, without looking up vulnerable dependencies."""
+    monkeypatch.setattr("envprotect.daemon.get_suspected_subproject_dependencies", lambda repo, executor=None: {})
+    monkeypatch.setattr("envprotect.daemon.select_rulesets", lambda subprojects: (aws_rulesets, {}))
+    daemons = []
+
+    def create(workers: int = 1) -> Daemon:
+        daemons.append(Daemon(socket_path=os.path.join(os.fspath(tmp_path), "daemon.sock"), workers=workers))
+        return daemons[-1]
+
+    yield create
+
+    for daemon in daemons:
+        daemon.close()
+
+
+def detected_paths(response):
+    """List the paths of the detections of a scan response."""
+    return [detection["path"] for detection in response["detections"]]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_scan_reads_the_working_tree_below_the_paths(repo, commit, daemon_factory, workers):
+    """Uncommitted files are scanned, restricted to the requested paths, on one pool across requests."""
+    commit({".gitignore": ".env\n"})
+    write_files(repo.working_tree_dir, {".env": f"KEY={ACCESS_KEY}\n", "sub/app.py": f"KEY = '{ACCESS_KEY}'\n"})
+    daemon = daemon_factory(workers)
+
+    whole = daemon.scan({"path": repo.working_tree_dir})
+    executor = daemon.executor
+    restricted = daemon.scan({"path": repo.working_tree_dir, "paths": [os.path.join(repo.working_tree_dir, "sub")]})
+
+    assert detected_paths(whole) == [".env", "sub/app.py"]
+    assert detected_paths(restricted) == ["sub/app.py"]
+    assert daemon.executor is executor
+
+
+def test_manifests_are_listed_again_only_after_the_index_changes(repo, commit, daemon_factory, monkeypatch):
+    """Requests against an unchanged index reuse the manifest list instead of reading the index."""
+    commit({"requirements.txt": "boto3==1.20\n"})
+    calls = []
+    monkeypatch.setattr("envprotect.daemon.discover_manifests", lambda repo: calls.append(repo) or discover(repo))
+    daemon = daemon_factory()
+
+    daemon.scan({"path": repo.working_tree_dir})
+    daemon.scan({"path": repo.working_tree_dir})
+    listed = len(calls)
+    commit({"web/package.json": '{"dependencies": {}}'})
+    daemon.scan({"path": repo.working_tree_dir})
+
+    assert listed == 1
+    assert len(calls) == 2
+    assert [os.path.basename(path) for path in daemon.repo_state(repo.working_tree_dir).manifest_paths] == [
+        "requirements.txt", "package.json"
+    ]
@@ -0,0 +1,69 @@
+"""Tests of dependency manifest parsing."""
+from concurrent.futures import ThreadPoolExecutor
+from envprotect.core.dependency import (
+    DEPENDENCY_GRAMMARS, DependencyFileType, DependencyGrammar, PARALLEL_MANIFEST_THRESHOLD,
+    parse_subproject_dependencies
+)
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Thread pool recording the number of `map` calls made on it."""
+
+    maps = 0
+
+    def map(self, *args, **kwargs):
+        self.maps += 1
+        return super().map(*args, **kwargs)
+
+
+def test_unparsable_lines_are_reported(repo, commit):
+    """Lines which can't be parsed are returned as exceptions next to the dependencies of the rest of the file."""
+    commit({"requirements.txt": "boto3==1.20\n=== ???\n", "web/package.json": '{"dependencies": {"aws-sdk": "^2"}}'})
+    parsed = parse_subproject_dependencies(repo)
+
+    assert {
+        directory: {file_type: [dependency.name for dependency in deps] for file_type, deps in dependencies.items()}
+        for directory, dependencies in parsed.ok.items()
+    } == {"": {DependencyFileType.PY_REQUIREMENTS: ["boto3"]}, "web": {DependencyFileType.JS_PACKAGE: ["aws-sdk"]}}
+    assert [exception.expression.rsplit("/", 1)[-1] for exception in parsed.exception] == ["requirements.txt:2"]
+
+
+def test_manifests_are_parsed_on_the_passed_executor(repo, commit):
+    """Many manifests are sent to the caller's executor, while few are parsed inline."""
+    commit({f"pkg{index}/requirements.txt": f"boto3==1.{index}\n" for index in range(PARALLEL_MANIFEST_THRESHOLD)})
+
+    with RecordingExecutor(max_workers=2) as executor:
+        pooled = parse_subproject_dependencies(repo, executor)
+
+    assert executor.maps == 1
+    assert pooled.ok == parse_subproject_dependencies(repo).ok
+    assert len(pooled.ok) == PARALLEL_MANIFEST_THRESHOLD
+
+
+def test_grammar_stops_at_the_first_matching_format():
+    """Formats are tried in registration order and the first full match wins."""
+    grammar = DependencyGrammar(DependencyFileType.PY_REQUIREMENTS, [r"(\w+)==(.*)", r"(\w+)(.*)"])
+
+    assert grammar.match("boto3==1.20") == ("boto3", "1.20")
+    assert grammar.match("boto3>=1.20") == ("boto3", ">=1.20")
+    assert grammar.match("# boto3") is None
+
+
+def test_lines_are_parsed_with_the_formats_of_their_file_type():
+    """The same line parses differently, or not at all, depending on the grammar of the file type."""
+    gem_line = 'gem "rails", "~> 6.1"'
+
+    assert DEPENDENCY_GRAMMARS[DependencyFileType.RB_GEMFILE].match(gem_line) == ("rails", "~> 6.1")
+    assert DEPENDENCY_GRAMMARS[DependencyFileType.PY_REQUIREMENTS].match(gem_line) == ("gem", ' "rails", "~> 6.1"')
+    assert DEPENDENCY_GRAMMARS[DependencyFileType.JS_PACKAGE].match('"aws-sdk": "^2.0",') == ("aws-sdk", "^2.0")
+    assert DEPENDENCY_GRAMMARS[DependencyFileType.RB_GEMFILE].match("boto3==1.20") is None
+
+
+def test_grammar_skips_comments_and_reports_unparsable_lines():
+    """Blank and comment lines are skipped, and unmatched lines are reported with their line number."""
+    parsed = DEPENDENCY_GRAMMARS[DependencyFileType.RB_GEMFILE].parse_lines(
+        ["# gems\n", "\n", 'gem "rails", "~> 6.1"\n', "source 'https://rubygems.org'\n"], source="Gemfile"
+    )
+
+    assert [(dependency.name, dependency.version_string) for dependency in parsed.ok] == [("rails", "~> 6.1")]
+    assert [exception.expression for exception in parsed.exception] == ["Gemfile:4"]
@@ -0,0 +1,78 @@
+"""Tests of the diff-only crawl modes."""
+from tests.conftest import git, write_files
+from tests.utils import ACCESS_KEY, crawl_findings
+from envprotect.core.crawler import Crawler
+from envprotect.core.diff import merge_line_ranges
+
+
+def test_staged_mode_only_crawls_staged_blobs(repo, commit, aws_rulesets):
+    """Only blobs changed in the index are crawled."""
+    commit({"committed.py": f"key = '{ACCESS_KEY}'\n"})
+    write_files(repo.working_tree_dir, {"staged.py": f"key = '{ACCESS_KEY}'\n", "unstaged.py": ACCESS_KEY})
+    git(repo.working_tree_dir, "add", "staged.py")
+
+    result = Crawler.from_diff(repo=repo, staged=True).crawl_and_detect(rulesets=aws_rulesets, dry_run=True)
+
+    assert crawl_findings(result) == [("staged.py", "aws-access-key-id", 7)]
+
+
+def test_range_mode_only_crawls_changed_blobs(repo, commit, aws_rulesets):
+    """Blobs unchanged between the two revisions are left out."""
+    base = commit({"old.py": f"key = '{ACCESS_KEY}'\n"})
+    commit({"new.py": f"other = '{ACCESS_KEY}'\n"})
+
+    result = Crawler.from_diff(repo=repo, rev_range=f"{base}..HEAD").crawl_and_detect(
+        rulesets=aws_rulesets, dry_run=True
+    )
+
+    assert crawl_findings(result) == [("new.py", "aws-access-key-id", 9)]
+
+
+def test_added_lines_only_reports_added_hunks(repo, commit, aws_rulesets):
+    """Secrets on context lines are skipped and added ones get their line number."""
+    base = commit({"settings.py": f"old = '{ACCESS_KEY}'\n"})
+    commit({"settings.py": f"old = '{ACCESS_KEY}'\nnew = '{ACCESS_KEY}'\n"})
+
+    result = Crawler.from_diff(repo=repo, rev_range=f"{base}..HEAD", added_lines_only=True).crawl_and_detect(
+        rulesets=aws_rulesets, dry_run=True
+    )
+    detections = [detection for detection_result in result.ok for detection in detection_result.ok]
+
+    assert [(detection.path, detection.line, detection.offset) for detection in detections] == [
+        ("settings.py", 2, len(f"old = '{ACCESS_KEY}'\n") + 7)
+    ]
+
+
+def test_added_lines_are_kept_per_path(repo, commit, aws_rulesets):
+    """The same blob added at two paths is restricted to the lines added at each path."""
+    base = commit({"a.py": f"{ACCESS_KEY}\n", "b.py": "plain\n"})
+    commit({"a.py": f"{ACCESS_KEY}\nplain\n", "b.py": f"{ACCESS_KEY}\nplain\n"})
+
+    crawler = Crawler.from_diff(repo=repo, rev_range=f"{base}..HEAD", added_lines_only=True)
+    result = crawler.crawl_and_detect(rulesets=aws_rulesets, dry_run=True)
+
+    assert crawl_findings(result) == [("b.py", "aws-access-key-id", 0)]
+
+
+def test_merge_line_ranges():
+    """Overlapping and adjacent ranges are merged and sorted."""
+    assert merge_line_ranges([(5, 6), (1, 2), (2, 3), (7, 7), (10, 12)]) == [(1, 3), (5, 7), (10, 12)]
+
+
+def test_symmetric_range_diffs_from_the_merge_base(repo, commit, aws_rulesets):
+    """Changes made on the base side after the fork are left out of a `...` range."""
+    fork = commit({"shared.py": "plain\n"})
+    git(repo.working_tree_dir, "checkout", "-q", "-b", "feature")
+    commit({"feature.py": f"key = '{ACCESS_KEY}'\n"})
+    git(repo.working_tree_dir, "checkout", "-q", fork)
+    main = commit({"main.py": f"key = '{ACCESS_KEY}'\n"})
+
+    symmetric = Crawler.from_diff(repo=repo, rev_range=f"{main}...feature").crawl_and_detect(
+        rulesets=aws_rulesets, dry_run=True
+    )
+    head_side = Crawler.from_diff(repo=repo, rev_range="feature..").crawl_and_detect(
+        rulesets=aws_rulesets, dry_run=True
+    )
+
+    assert crawl_findings(symmetric) == [("feature.py", "aws-access-key-id", 7)]
+    assert crawl_findings(head_side) == [("main.py", "aws-access-key-id", 7)]
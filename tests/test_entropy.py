@@ -0,0 +1,33 @@
+"""Tests of the entropy detector."""
+import numpy as np
+from envprotect.core.detection import Detection
+from envprotect.detector.entropy import EntropyDetector, length_thresholds
+
+
+def test_short_tokens_get_a_reachable_threshold():
+    """Thresholds above `log2(n)` are scaled down for `n` byte tokens and kept for longer ones."""
+    thresholds = length_thresholds(np.array([20, 64]), threshold=4.5, length_ratio=0.9)
+
+    assert thresholds[0] < np.log2(20)
+    assert thresholds[1] == 4.5
+
+
+def test_minimum_length_random_token_is_detected():
+    """A random token of the minimum length is detected with the default settings."""
+    detections = EntropyDetector().detect(b"key = q8Zr2LwX7vKp3JmT9bYc\n")
+
+    assert [(detection.result, detection.offset) for detection in detections] == [(b"q8Zr2LwX7vKp3JmT9bYc", 6)]
+
+
+def test_identifiers_are_not_detected():
+    """Long identifiers made of words stay below the scaled threshold."""
+    assert EntropyDetector().detect(b"name = thisIsAVeryLongVariableName\n") == []
+
+
+def test_score_detections_reads_text_and_bytes():
+    """Matched data is scored whether it was kept as text or bytes, and missing data scores zero."""
+    detections = EntropyDetector().score_detections([
+        Detection(result=b"abcd"), Detection(result="abcd"), Detection(result=None)
+    ])
+
+    assert [detection.score for detection in detections] == [2.0, 2.0, 0.0]
@@ -0,0 +1,59 @@
+"""Tests of the filesystem crawl backend."""
+import os
+from tests.conftest import write_files
+from tests.utils import ACCESS_KEY, crawl_findings
+from envprotect.core.crawler import Crawler
+from envprotect.core.filesystem import FileEntry, IgnoreMatcher, walk_files
+
+
+def test_ignored_files_are_walked_and_ignored_directories_pruned(tmp_path):
+    """Gitignored files are still walked, while gitignored directories are never entered."""
+    root = os.fspath(tmp_path)
+    write_files(root, {
+        ".gitignore": ".env\nnode_modules/\n",
+        ".env": f"AWS_KEY={ACCESS_KEY}\n",
+        "node_modules/pkg/index.js": "module.exports = {};\n",
+        "src/app.py": "print('hello')\n",
+    })
+    matcher = IgnoreMatcher(root)
+
+    assert [entry.path for entry in walk_files(root)] == [".env", ".gitignore", "src/app.py"]
+    assert not matcher.is_ignored(".env")
+    assert matcher.is_ignored("node_modules", is_dir=True)
+    assert matcher.is_ignored("node_modules/pkg/index.js")
+
+
+def test_files_are_hashed_only_when_needed(tmp_path, aws_rulesets, monkeypatch):
+    """Files are mapped once for detection, and only files with detections get a hex SHA."""
+    root = os.fspath(tmp_path)
+    write_files(root, {"clean.txt": "nothing here\n", "secret.env": f"AWS_KEY={ACCESS_KEY}\n"})
+    opened = []
+    open_buffer = FileEntry.open_buffer
+
+    def counting_open_buffer(entry):
+        opened.append(entry.path)
+        return open_buffer(entry)
+
+    monkeypatch.setattr(FileEntry, "open_buffer", counting_open_buffer)
+    result = Crawler(source=root).crawl_and_detect(rulesets=aws_rulesets, dry_run=True)
+    detection = next(detection for detection_result in result.ok for detection in detection_result.ok or [])
+
+    assert opened == ["clean.txt", "secret.env"]
+    assert [path for path, _, _ in crawl_findings(result)] == ["secret.env"]
+    assert detection.hexsha == FileEntry(os.path.join(root, "secret.env"), "secret.env", 0).hexsha
+
+
+def test_unreadable_gitignore_does_not_abort_the_walk(tmp_path, monkeypatch):
+    """A `.gitignore` which can't be opened adds no rules and the rest of the tree is still walked."""
+    root = os.fspath(tmp_path)
+    write_files(root, {"sub/.gitignore": "*.env\n", "sub/app.env": "KEY=1\n", "top.py": "print('hello')\n"})
+
+    def denied_open(path, *args, **kwargs):
+        if os.path.basename(path) == ".gitignore":
+            raise PermissionError(path)
+
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr("envprotect.core.filesystem.open", denied_open, raising=False)
+
+    assert [entry.path for entry in walk_files(root)] == ["sub/.gitignore", "sub/app.env", "top.py"]
@@ -0,0 +1,39 @@
+"""Tests of the full-history crawl mode."""
+from tests.conftest import git
+from tests.utils import ACCESS_KEY
+from envprotect.core.crawler import Crawler
+from envprotect.core.store import DetectionStore
+
+
+def history_findings(repo, aws_rulesets):
+    """Crawl the history into a detection store and list every finding with its occurrences."""
+    crawler = Crawler.from_history(repo=repo)
+
+    try:
+        result = crawler.crawl_and_detect(rulesets=aws_rulesets, dry_run=True, store=DetectionStore())
+        return [
+            (record.rule_id, sorted(crawler.history.occurrences(record.hexsha or ""))) for record in result.store
+        ]
+    finally:
+        crawler.history.close()
+
+
+def test_removed_secret_is_reported_once_with_its_introducing_commit(repo, commit, aws_rulesets):
+    """A secret deleted from HEAD is still found, once, at the commit and path that introduced it."""
+    commit({"app.py": "print('hello')\n"})
+    introduced = commit({"config/aws.env": f"AWS_KEY={ACCESS_KEY}\n"})
+    commit({"app.py": "print('hello again')\n"})
+    git(repo.working_tree_dir, "rm", "-q", "config/aws.env")
+    git(repo.working_tree_dir, "commit", "-q", "-m", "remove secret")
+
+    assert history_findings(repo, aws_rulesets) == [("aws-access-key-id", [(introduced, "config/aws.env")])]
+
+
+def test_blob_seen_at_several_commits_is_detected_once(repo, commit, aws_rulesets):
+    """The same content committed at two paths is detected once and lists both occurrences, with exact paths."""
+    first = commit({"café.env": f"AWS_KEY={ACCESS_KEY}\n"})
+    second = commit({"copy\tof.env": f"AWS_KEY={ACCESS_KEY}\n"})
+
+    assert history_findings(repo, aws_rulesets) == [
+        ("aws-access-key-id", sorted([(first, "café.env"), (second, "copy\tof.env")]))
+    ]
@@ -0,0 +1,39 @@
+"""Tests of the streaming dependency file parsers."""
+import io
+import pytest
+from envprotect.core import lockfile
+from envprotect.core.lockfile import iter_json_tokens
+
+
+class CountingStream(io.StringIO):
+    """Text stream counting the chunks read from it."""
+
+    reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 8, 1 << 16])
+def test_tokens_split_across_chunks_are_joined(monkeypatch, chunk_size):
+    """Tokenizing yields the same tokens whatever the chunk boundaries."""
+    monkeypatch.setattr(lockfile, "CHUNK_SIZE", chunk_size)
+    tokens = list(iter_json_tokens(io.StringIO('{"na\\"me": [-1.5e3, true, null, "value"]}')))
+
+    assert tokens == [
+        ("{", None), ("string", 'na"me'), (":", None), ("[", None), ("scalar", -1500.0), (",", None),
+        ("scalar", True), (",", None), ("scalar", None), (",", None), ("string", "value"), ("]", None), ("}", None),
+    ]
+
+
+@pytest.mark.parametrize("document", ['{"a": @', '{"a": trux', "[12x"])
+def test_malformed_document_fails_without_reading_ahead(monkeypatch, document):
+    """Invalid input is reported from the chunk holding it rather than after reading the whole stream."""
+    monkeypatch.setattr(lockfile, "CHUNK_SIZE", 16)
+    stream = CountingStream(document + " " * 1000)
+
+    with pytest.raises(ValueError):
+        list(iter_json_tokens(stream))
+
+    assert stream.reads == 1
@@ -0,0 +1,35 @@
+"""Tests of the ruleset manifest discovery."""
+import importlib.metadata
+import pytest
+from envprotect.rulebook.manifest import discover_manifest
+
+
+class FakeEntryPoint:
+    """Entry point loading a fixed value."""
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def load(self):
+        """Return the fixed value."""
+        return self.value
+
+
+def test_entry_points_grouped_in_a_dict_are_discovered(monkeypatch):
+    """Entry points returned as a dict keyed by group, as on Python 3.9, are looked up by group."""
+    entry_point = FakeEntryPoint("plugin", ("plugin.rulesets:PluginRuleSet", ["plugin-sdk"]))
+    monkeypatch.setattr(importlib.metadata, "entry_points", lambda: {"envprotect.rulesets": [entry_point]})
+
+    assert discover_manifest("envprotect.rulesets") == {"plugin": ("plugin.rulesets:PluginRuleSet", ["plugin-sdk"])}
+
+
+def test_failed_discovery_warns_and_finds_nothing(monkeypatch):
+    """A failure to scan installed distributions is reported as a warning rather than raised."""
+    def failing_entry_points():
+        raise OSError("unreadable site-packages")
+
+    monkeypatch.setattr(importlib.metadata, "entry_points", failing_entry_points)
+
+    with pytest.warns(UserWarning, match="unreadable site-packages"):
+        assert discover_manifest("envprotect.rulesets") == {}
@@ -0,0 +1,39 @@
+"""Tests of bulk object reads."""
+from envprotect.core.objects import BatchObjectReader
+
+
+def test_reader_keeps_one_process_across_batches(repo, commit):
+    """Consecutive batches are streamed through the same `cat-file` process and match the object data."""
+    commit({f"file{index}.txt": f"line {index}\n" * (index * 100 + 1) for index in range(20)})
+    hexshas = [item.hexsha for item in repo.tree().traverse() if item.type == "blob"]
+    reader = BatchObjectReader(repo)
+
+    try:
+        first = {hexsha: stream.read() for hexsha, stream in reader.iter_streams(hexshas[:10]) if stream is not None}
+        process = reader.process
+        second = {hexsha: stream.read() for hexsha, stream in reader.iter_streams(hexshas[10:]) if stream is not None}
+
+        assert reader.process is process
+        assert {**first, **second} == {hexsha: repo.odb.stream(bytes.fromhex(hexsha)).read() for hexsha in hexshas}
+    finally:
+        reader.close()
+
+
+def test_reader_recovers_from_an_abandoned_batch(repo, commit):
+    """Closing a batch early doesn't leak its responses into the following batch, and missing objects yield None."""
+    commit({f"file{index}.txt": f"{index}\n" * 1000 for index in range(5)})
+    hexshas = [item.hexsha for item in repo.tree().traverse() if item.type == "blob"]
+    reader = BatchObjectReader(repo)
+
+    try:
+        abandoned = reader.iter_streams(hexshas)
+        next(abandoned)
+        abandoned.close()
+
+        streamed = [(hexsha, stream.read(2) if stream else None) for hexsha, stream in reader.iter_streams(
+            [hexshas[-1], "0" * 40]
+        )]
+
+        assert streamed == [(hexshas[-1], b"4\n"), ("0" * 40, None)]
+    finally:
+        reader.close()
@@ -0,0 +1,56 @@
+"""Tests of the pre-filter stage of crawls."""
+import os
+from io import BytesIO
+import pytest
+from tests.utils import ACCESS_KEY, crawl_findings
+from envprotect.core.crawler import Crawler, sniff_stream
+from envprotect.core.prefilter import DEFAULT_MAX_SIZE, PreFilter, SkipReason
+
+
+def test_sniffed_stream_keeps_leading_bytes():
+    """Text streams are read whole after the binary check, binary ones are rejected."""
+    data = b"line\n" * 5000
+    stream = sniff_stream(BytesIO(data), 8000)
+
+    assert stream is not None
+    assert stream.read(3) + stream.read() == data
+    assert sniff_stream(BytesIO(b"text\0binary"), 8000) is None
+
+
+@pytest.mark.parametrize("options", [{}, {"workers": 2, "batch_size": 1}, {"bulk_read": True}])
+def test_binary_blobs_are_skipped(repo, commit, aws_rulesets, options):
+    """Binary blobs are reported as skipped on every crawl path and text blobs are still detected."""
+    with open(os.path.join(repo.working_tree_dir, "blob.dat"), "wb") as file:
+        file.write(f"\0{ACCESS_KEY}\n".encode())
+
+    commit({"config/aws.env": f"AWS_KEY={ACCESS_KEY}\n"})
+    result = Crawler(source=repo).crawl_and_detect(
+        rulesets=aws_rulesets, dry_run=True, prefilter=PreFilter(), **options
+    )
+
+    assert result.skipped == [("blob.dat", SkipReason.BINARY)]
+    assert [path for path, _, _ in crawl_findings(result)] == ["config/aws.env"]
+
+
+def test_large_blobs_are_skipped_by_default(repo, commit, aws_rulesets):
+    """Blobs over the default size cap are skipped although they would be detected in windows."""
+    commit({"large.env": f"AWS_KEY={ACCESS_KEY}\n" + "#" * DEFAULT_MAX_SIZE, "small.env": f"AWS_KEY={ACCESS_KEY}\n"})
+
+    result = Crawler(source=repo).crawl_and_detect(rulesets=aws_rulesets, dry_run=True, prefilter=PreFilter())
+
+    assert result.skipped == [("large.env", SkipReason.TOO_LARGE)]
+    assert [path for path, _, _ in crawl_findings(result)] == ["small.env"]
+
+
+def test_streamed_size_cap_can_be_raised(repo, commit, aws_rulesets):
+    """Blobs over the cap of whole reads are detected in windows once the streamed cap is lifted."""
+    commit({"large.env": "# padding\n" * 500 + f"AWS_KEY={ACCESS_KEY}\n"})
+    prefilter = PreFilter(max_size=1024, streamed_max_size=None)
+
+    windowed = Crawler(source=repo).crawl_and_detect(rulesets=aws_rulesets, dry_run=True, prefilter=prefilter)
+    whole = Crawler(source=repo).crawl_and_detect(
+        rulesets=aws_rulesets, dry_run=True, prefilter=prefilter, window_size=None
+    )
+
+    assert [path for path, _, _ in crawl_findings(windowed)] == ["large.env"]
+    assert whole.skipped == [("large.env", SkipReason.TOO_LARGE)]
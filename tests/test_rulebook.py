@@ -0,0 +1,104 @@
+"""Tests of the compiled rulebook."""
+from typing import Union
+import pytest
+from envprotect.core.detection import DetectionResult
+from envprotect.rulebook import RULESET_DEPS_MAP, RULESET_REGISTRY, CompiledRulebook, Rule, RuleFactory, RuleSet
+
+
+class TokenRuleSet(RuleSet):
+    """Ruleset matching a whole token assignment."""
+
+    name = "token"
+    rules = [Rule(rule_id="token", pattern=rb"TOKEN=\w+", anchors=["TOKEN"])]
+
+    def detect_secrets(self, target: Union[str, bytes, memoryview], apply: bool, *args, **kwargs) -> DetectionResult:
+        """Detect with the ruleset's rules only."""
+        return self.detect_rules(target=target, apply=apply)
+
+
+class SecretRuleSet(RuleSet):
+    """Ruleset matching a value inside the token assignment."""
+
+    name = "secret"
+    rules = [Rule(rule_id="secret", pattern=rb"s3cr3t\w*", anchors=["s3cr3t"])]
+
+    def detect_secrets(self, target: Union[str, bytes, memoryview], apply: bool, *args, **kwargs) -> DetectionResult:
+        """Detect with the ruleset's rules only."""
+        return self.detect_rules(target=target, apply=apply)
+
+
+def rule_hits(result: DetectionResult):
+    """List the rule identifier and offset of every detection of a result."""
+    return [(detection.rule_id, detection.offset) for detection in result.ok or []]
+
+
+def test_overlapping_matches_of_rulesets_are_all_reported():
+    """A match of one ruleset doesn't hide an overlapping match of another."""
+    target = b"x TOKEN=s3cr3tvalue\n"
+    token, secret = CompiledRulebook([TokenRuleSet(), SecretRuleSet()]).detect(target=target, apply=False)
+
+    assert rule_hits(token) == [("token", 2)]
+    assert rule_hits(secret) == [("secret", 8)]
+
+
+def test_ruleset_results_do_not_depend_on_the_combination():
+    """Every ruleset detects the same alone as combined with others, in either order."""
+    target = b"TOKEN=s3cr3t1 s3cr3t2\n"
+    token, secret = TokenRuleSet(), SecretRuleSet()
+    alone = [
+        rule_hits(CompiledRulebook([ruleset]).detect(target=target, apply=False)[0]) for ruleset in (token, secret)
+    ]
+    forward = [rule_hits(result) for result in CompiledRulebook([token, secret]).detect(target=target, apply=False)]
+    backward = [rule_hits(result) for result in CompiledRulebook([secret, token]).detect(target=target, apply=False)]
+
+    assert forward == alone
+    assert backward == alone[::-1]
+
+
+def test_anchors_rule_out_rulesets_separately():
+    """A ruleset whose anchors are missing detects nothing while another still matches."""
+    token, secret = CompiledRulebook([TokenRuleSet(), SecretRuleSet()]).detect(target=b"s3cr3t only", apply=False)
+
+    assert rule_hits(token) == []
+    assert rule_hits(secret) == [("secret", 0)]
+
+
+@pytest.fixture
+def registered():
+    """Register a token ruleset under a test name, dropping it and its instances afterwards."""
+    RuleFactory.register("test-token", ["test-token-dependency"])(type("RegisteredRuleSet", (TokenRuleSet,), {}))
+    yield "test-token"
+    RuleFactory.invalidate("test-token")
+    RULESET_REGISTRY.pop("test-token", None)
+    RULESET_DEPS_MAP.pop("test-token-dependency", None)
+
+
+def test_fetched_rulesets_are_shared(registered):
+    """Fetching a ruleset twice returns the same instance, and the same compiled rulebook."""
+    ruleset = RuleFactory.fetch_rule_set(registered)
+    fetched = RuleFactory.fetch_rule_set(registered)
+
+    assert fetched is ruleset
+    assert RuleFactory.compile_rulebook([fetched]) is RuleFactory.compile_rulebook([ruleset])
+
+
+def test_invalidated_rulesets_are_created_anew(registered):
+    """Invalidating a ruleset drops its shared instance and the rulebooks compiled from it."""
+    ruleset = RuleFactory.fetch_rule_set(registered)
+    rulebook = RuleFactory.compile_rulebook([ruleset])
+    RuleFactory.invalidate(registered)
+    fetched = RuleFactory.fetch_rule_set(registered)
+
+    assert fetched is not ruleset
+    assert RuleFactory.compile_rulebook([ruleset]) is not rulebook
+
+
+def test_registering_again_replaces_shared_instances(registered):
+    """A ruleset registered again under the same name is instantiated from the new class."""
+    ruleset = RuleFactory.fetch_rule_set(registered)
+    replacement = type("ReplacedRuleSet", (SecretRuleSet,), {})
+    RuleFactory.register(registered, ["test-token-dependency"])(replacement)
+    fetched = RuleFactory.fetch_rule_set(registered)
+
+    assert fetched is not ruleset
+    assert isinstance(fetched, replacement)
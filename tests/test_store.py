@@ -0,0 +1,65 @@
+"""Tests of the columnar detection store."""
+from envprotect.core.detection import Detection, DetectionResult
+from envprotect.core.store import DetectionStore
+
+BLOB_A = "a" * 40
+BLOB_B = "b" * 40
+
+
+def build_store() -> DetectionStore:
+    """Fill a store with detections spread over two blobs, paths and rules."""
+    store = DetectionStore()
+    store.extend([
+        DetectionResult(ok=[
+            Detection(
+                result=b"AKIA0001", offset=0, line=1, rule_id="aws-key", score=4.5, hexsha=BLOB_A, path="src/a.py"
+            ),
+            Detection(result=b"token", offset=9, line=2, rule_id="generic", score=2.0, hexsha=BLOB_A, path="src/a.py"),
+        ], exception=[]),
+        DetectionResult(ok=[
+            Detection(result=b"AKIA0002", offset=4, line=1, rule_id="aws-key", hexsha=BLOB_B, path="tests/b.py"),
+        ], exception=[]),
+    ])
+    return store
+
+
+def offsets(store: DetectionStore):
+    """List the offsets of the rows of a store."""
+    return [record.offset for record in store]
+
+
+def test_rows_decode_to_their_detection_fields():
+    """Rows keep the fields of their detection, with the length of the matched data instead of the data."""
+    record = build_store().record(0)
+
+    assert (record.hexsha, record.path, record.offset, record.length, record.line, record.rule_id, record.score) == (
+        BLOB_A, "src/a.py", 0, 8, 1, "aws-key", 4.5
+    )
+    assert build_store().record(2).score is None
+
+
+def test_filter_criteria_are_combined():
+    """Rows are kept only when they match every passed criterion."""
+    store = build_store()
+
+    assert offsets(store.filter(rule_ids=["aws-key"])) == [0, 4]
+    assert offsets(store.filter(path_prefix="src/")) == [0, 9]
+    assert offsets(store.filter(hexshas=[BLOB_B])) == [4]
+    assert offsets(store.filter(rule_ids=["aws-key"], path_prefix="src/")) == [0]
+    assert offsets(store.filter(rule_ids=["unknown"])) == []
+
+
+def test_min_score_drops_rows_without_a_score():
+    """A score threshold keeps scored rows above it and drops unscored rows."""
+    assert offsets(build_store().filter(min_score=2.0)) == [0, 9]
+    assert offsets(build_store().filter(min_score=3.0)) == [0]
+
+
+def test_filtered_store_shares_intern_tables():
+    """Filtered copies reuse the intern tables and count their own rows per rule."""
+    store = build_store()
+    selected = store.filter(path_prefix="tests/")
+
+    assert selected.paths is store.paths
+    assert selected.count_by_rule() == {"aws-key": 1}
+    assert store.count_by_rule() == {"aws-key": 2, "generic": 1}
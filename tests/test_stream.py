@@ -0,0 +1,91 @@
+"""Tests of windowed detection over streams."""
+from io import BytesIO
+import pytest
+from tests.utils import ACCESS_KEY, findings
+from envprotect.core.crawler import detect_in_data, detect_in_stream
+from envprotect.core.stream import iter_windows
+from envprotect.rulebook import Rule, RuleSet
+
+WINDOW_SIZE: int = 8192
+
+
+class TrickleStream(BytesIO):
+    """Stream returning at most a few bytes per read, as pipes may."""
+
+    def read(self, size=-1):
+        return super().read(7 if size < 0 else min(size, 7))
+
+
+class TokenRuleSet(RuleSet):
+    """Ruleset matching alphanumeric tokens of any length from 16 characters."""
+
+    name = "long-token"
+    rules = [Rule(rule_id="long-token", pattern=rb"[A-Za-z0-9]{16,}")]
+    max_match_length = 64
+
+    def detect_secrets(self, target, apply, *args, **kwargs):
+        """Detect with the ruleset's rules only."""
+        return self.detect_rules(target=target, apply=apply)
+
+
+def test_windows_overlap_and_cover_the_stream():
+    """Consecutive windows share the overlap and together cover every byte once past it."""
+    data = bytes(range(256)) * 40
+    windows = list(iter_windows(BytesIO(data), window_size=1000, overlap=100))
+
+    assert [offset for offset, _, _ in windows] == list(range(0, len(data) - 100, 900))
+    assert all(bytes(window) == data[offset:offset + 1000] for offset, window, _ in windows)
+    assert [is_last for _, _, is_last in windows] == [False] * (len(windows) - 1) + [True]
+
+
+def test_short_reads_do_not_shift_windows():
+    """Windows of a stream returning short reads match those of a stream returning whole reads."""
+    data = bytes(range(256)) * 40
+    windows = [(offset, bytes(window), is_last) for offset, window, is_last in iter_windows(BytesIO(data), 1000, 100)]
+
+    assert [
+        (offset, bytes(window), is_last) for offset, window, is_last in iter_windows(TrickleStream(data), 1000, 100)
+    ] == windows
+
+
+def test_empty_stream_yields_one_window():
+    """An empty stream still yields a single, last window."""
+    assert [(offset, bytes(window), is_last) for offset, window, is_last in iter_windows(BytesIO(b""), 10, 2)] == [
+        (0, b"", True)
+    ]
+
+
+def test_overlap_must_leave_room():
+    """Windows no larger than the overlap are rejected."""
+    with pytest.raises(ValueError):
+        list(iter_windows(BytesIO(b"data"), window_size=4, overlap=4))
+
+
+@pytest.mark.parametrize("shift", [-len(ACCESS_KEY), -len(ACCESS_KEY) // 2, -1, 0, 1])
+def test_matches_across_window_boundaries_are_reported_once(aws_rulesets, shift):
+    """Keys straddling or touching window boundaries are found once, at their stream offset."""
+    overlap = max(ruleset.max_match_length for ruleset in aws_rulesets)
+    step = WINDOW_SIZE - overlap
+    data = bytearray(b"." * (step * 6))
+
+    for boundary in range(step, len(data) - step, step):
+        position = boundary + shift
+        data[position:position + len(ACCESS_KEY)] = ACCESS_KEY.encode()
+
+    whole, _ = detect_in_data(bytes(data), aws_rulesets, dry_run=True)
+    windowed, _ = detect_in_stream(BytesIO(bytes(data)), aws_rulesets, dry_run=True, window_size=WINDOW_SIZE)
+
+    assert findings(windowed) == findings(whole)
+    assert len(findings(whole)) == 4
+
+
+def test_token_straddling_a_window_start_is_reported_once():
+    """The tail of a token starting before a window isn't matched again at the start of the window."""
+    rulesets = [TokenRuleSet()]
+    data = b"." * 150 + b"A" * 100 + b"." * 500
+
+    whole, _ = detect_in_data(data, rulesets, dry_run=True)
+    windowed, _ = detect_in_stream(BytesIO(data), rulesets, dry_run=True, window_size=256)
+
+    assert [(detection.offset, len(detection.result)) for detection in windowed[0].ok] == [(150, 100)]
+    assert findings(windowed) == findings(whole)
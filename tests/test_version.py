@@ -0,0 +1,38 @@
+"""Tests of version requirement ranges."""
+import pytest
+from envprotect.core.version import parse_range, parse_version
+
+
+@pytest.mark.parametrize("requirement, inside, outside", [
+    ("^1.2.3", ["1.2.3", "1.9.0"], ["1.2.2", "2.0.0"]),
+    ("^0.2.3", ["0.2.9"], ["0.3.0"]),
+    ("~1.2.3", ["1.2.9"], ["1.3.0"]),
+    ("~=1.4.2", ["1.4.9"], ["1.5.0"]),
+    ("~> 2.1", ["2.9"], ["3.0"]),
+    (">=1.0, <2.0", ["1.0", "1.5"], ["0.9", "2.0"]),
+    ("1.x", ["1.0", "1.7.2"], ["0.9", "2.0"]),
+    ("1.0 - 1.5", ["1.0", "1.5.0"], ["1.5.1"]),
+    ("<1.0 || >=2.0", ["0.9", "2.1"], ["1.5"]),
+    ("!=1.5", ["1.4", "1.6"], ["1.5"]),
+    ("==2.0", ["2.0.0"], ["2.0.1"]),
+    ("<1.0.0", ["1.0.0-beta"], ["1.0.0"]),
+])
+def test_range_contains_versions(requirement, inside, outside):
+    """Versions satisfying a requirement are contained in its range, others aren't."""
+    version_range = parse_range(requirement)
+
+    assert [parse_version(version) in version_range for version in inside] == [True] * len(inside)
+    assert [parse_version(version) in version_range for version in outside] == [False] * len(outside)
+
+
+@pytest.mark.parametrize("requirement", ["git+https://example.com/repo.git", "file:../local"])
+def test_non_version_requirements_are_not_parsed(requirement):
+    """Sources which aren't version requirements have no range."""
+    assert parse_range(requirement) is None
+
+
+def test_ranges_intersect_only_when_sharing_a_version():
+    """Ranges touching at an exclusive bound don't intersect, while those sharing an inclusive bound do."""
+    assert parse_range(">=1.0,<2.0").intersects(parse_range("^1.5"))
+    assert not parse_range("<1.0").intersects(parse_range(">=1.0"))
+    assert parse_range("<=1.0").intersects(parse_range(">=1.0"))
@@ -0,0 +1,89 @@
+"""Tests of the memory-mapped vulnerability database."""
+import json
+import os
+import pytest
+from envprotect.core.dependency import DependencyBase, DependencyFileType
+from envprotect.core.vulndb import VulnerabilityDatabase
+from envprotect.exception import VulnerabilityDatabaseError
+
+PY = DependencyFileType.PY_REQUIREMENTS
+JS = DependencyFileType.JS_PACKAGE
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Create a database at revision 1 with a vulnerable Python and JavaScript dependency."""
+    database = VulnerabilityDatabase.create(os.path.join(os.fspath(tmp_path), "vulndb.bin"), payload={
+        PY: [DependencyBase("boto3", "<1.10")],
+        JS: [DependencyBase("aws-sdk", "<2.0")],
+    }, revision=1)
+    yield database
+    database.close()
+
+
+def ranges(database, file_type, name):
+    """List the affected ranges recorded for a dependency."""
+    return [dependency.version_string for dependency in database.lookup(file_type, name)]
+
+
+def test_delta_merges_into_the_records_of_its_base(database):
+    """A delta replaces and withdraws the records it lists and keeps every other one."""
+    assert database.is_vulnerable(DependencyBase("boto3", "==1.12"), PY) is False
+
+    applied = database.apply_bundle({
+        "revision": 2, "base_revision": 1,
+        "vulnerables": {PY.value: {"boto3": ["<1.20"]}, JS.value: {"aws-amplify": [">=1.0,<1.5"]}},
+        "withdrawn": {JS.value: ["aws-sdk"]},
+    })
+
+    assert applied
+    assert database.revision == 2
+    assert ranges(database, PY, "boto3") == ["<1.20"]
+    assert ranges(database, JS, "aws-amplify") == [">=1.0,<1.5"]
+    assert ranges(database, JS, "aws-sdk") == []
+    assert database.is_vulnerable(DependencyBase("boto3", "==1.12"), PY) is True
+
+
+def test_delta_against_another_revision_is_refused(database):
+    """A delta exported against another revision leaves the database untouched."""
+    with pytest.raises(VulnerabilityDatabaseError):
+        database.apply_bundle({"revision": 3, "base_revision": 2, "vulnerables": {PY.value: {"boto3": ["<2"]}}})
+
+    assert database.revision == 1
+    assert ranges(database, PY, "boto3") == ["<1.10"]
+
+
+def test_stale_bundle_is_skipped(database):
+    """Bundles at or below the database revision aren't applied."""
+    assert database.apply_bundle({"revision": 1, "vulnerables": {}}) is False
+    assert ranges(database, JS, "aws-sdk") == ["<2.0"]
+
+
+def test_snapshot_file_replaces_every_record(database, tmp_path):
+    """A snapshot read from a file drops the records it doesn't list."""
+    bundle_path = os.path.join(os.fspath(tmp_path), "bundle.json")
+
+    with open(bundle_path, "w", encoding="utf-8") as bundle_file:
+        json.dump({"revision": 5, "vulnerables": {PY.value: {"botocore": ["<1.0"]}}}, bundle_file)
+
+    assert database.apply_bundle(bundle_path)
+    assert len(database) == 1
+    assert ranges(database, PY, "botocore") == ["<1.0"]
+    assert ranges(database, PY, "boto3") == []
+    assert ranges(database, JS, "aws-sdk") == []
+
+
+def test_shared_database_is_remapped_after_replacement(database):
+    """The shared mapping is reused until the file is replaced, then the replaced mapping is closed."""
+    shared = VulnerabilityDatabase.shared(database.path)
+    assert VulnerabilityDatabase.shared(database.path) is shared
+
+    VulnerabilityDatabase.create(database.path, payload={PY: [DependencyBase("boto3", "<1.20")]}, revision=2).close()
+    remapped = VulnerabilityDatabase.shared(database.path)
+
+    assert remapped is not shared and remapped.revision == 2
+    assert shared.map.closed
+
+    os.remove(database.path)
+    assert VulnerabilityDatabase.shared(database.path) is None
+    assert remapped.map.closed
@@ -0,0 +1,67 @@
+"""Tests of the vulnerable dependency index."""
+import pytest
+from envprotect.core.dependency import DependencyBase, DependencyFileType
+from envprotect.core.version import parse_range
+from envprotect.core.vulnerability import IntervalIndex, VulnerabilityIndex, normalize_name
+
+PY = DependencyFileType.PY_REQUIREMENTS
+JS = DependencyFileType.JS_PACKAGE
+
+
+def intervals(*requirements):
+    """Collect the intervals of every requirement."""
+    return [interval for requirement in requirements for interval in parse_range(requirement).intervals]
+
+
+def test_wide_interval_is_found_past_later_narrow_ones():
+    """An early interval reaching furthest decides the overlap, even behind intervals ending sooner."""
+    index = IntervalIndex(intervals(">=1.2, <1.3", "<5.0", ">=2.0, <2.1"))
+
+    assert [str(interval) for interval in index.intervals] == [str(interval) for interval in intervals(
+        "<5.0", ">=1.2, <1.3", ">=2.0, <2.1"
+    )]
+    assert index.reach == [0, 0, 0]
+    assert index.overlaps(intervals("==4.0")[0])
+    assert not index.overlaps(intervals("==5.0")[0])
+
+
+@pytest.mark.parametrize("query", [
+    "==0.9", "==1.0", "==2.2", "==2.7", "==3.0", "==3.5", "<1.0", ">=3.0", ">2.9, <3.1", "!=2.2", ">=2.5, <2.8",
+])
+def test_overlaps_agree_with_a_scan_of_every_interval(query):
+    """Overlapping affected intervals answer like checking each of them in turn."""
+    affected = intervals(">=1.0, <3.0", ">=2.0, <2.5", "==2.8", ">=3.5, <4.0")
+    index = IntervalIndex(affected)
+
+    assert [index.overlaps(interval) for interval in intervals(query)] == [
+        any(not interval.intersect(candidate).is_empty() for candidate in affected) for interval in intervals(query)
+    ]
+
+
+def test_unparsed_ranges_affect_any_version():
+    """An affected range which isn't understood affects every version."""
+    index = IntervalIndex.from_ranges([parse_range("<1.0"), None])
+
+    assert index.any_version
+    assert index.affects(parse_range("==9.0"))
+
+
+def test_names_are_normalized_per_ecosystem():
+    """PyPI treats separators as equal while npm only folds case."""
+    assert normalize_name("pypi", "Foo_Bar.baz") == normalize_name("pypi", "foo--bar-baz") == "foo-bar-baz"
+    assert normalize_name("npm", "Foo_Bar") == "foo_bar"
+
+
+def test_lookups_match_normalized_names_within_their_ecosystem():
+    """Spellings of the same package match, while the same name in another ecosystem doesn't."""
+    index = VulnerabilityIndex({
+        PY: [DependencyBase("Python_Dateutil", "<2.8")],
+        JS: [DependencyBase("Lodash", "<4.17")],
+    })
+
+    assert index.is_vulnerable(DependencyBase("python-dateutil", "==2.7"), PY)
+    assert index.is_vulnerable(DependencyBase("python.dateutil", "==2.7"), DependencyFileType.PY_POETRY_LOCK)
+    assert not index.is_vulnerable(DependencyBase("python-dateutil", "==2.8"), PY)
+    assert index.is_vulnerable(DependencyBase("lodash", "^4.16.0"), JS)
+    assert not index.is_vulnerable(DependencyBase("python-dateutil", "==2.7"), JS)
+    assert not index.is_vulnerable(DependencyBase("lodash", "==4.0"), PY)
@@ -0,0 +1,73 @@
+"""Tests of watch sessions."""
+import os
+import shutil
+import pytest
+from tests.conftest import write_files
+from tests.utils import ACCESS_KEY
+from envprotect.core.filesystem import IgnoreMatcher
+from envprotect.watch import InotifyWatcher, WatchSession
+
+
+def test_rescan_of_a_new_directory_applies_root_ignore_rules(tmp_path, aws_rulesets):
+    """Directories ignored by a rule of the root stay ignored below a newly created directory."""
+    root = os.fspath(tmp_path)
+    write_files(root, {".gitignore": "cache/\n/pkg/build/\n"})
+    session = WatchSession(root=root, rulesets=aws_rulesets)
+    session.scan_all()
+
+    write_files(root, {
+        "pkg/app.py": f"KEY = '{ACCESS_KEY}'\n",
+        "pkg/build/out.py": f"KEY = '{ACCESS_KEY}'\n",
+        "pkg/cache/key.py": f"KEY = '{ACCESS_KEY}'\n",
+    })
+    updated = session.rescan({"pkg"})
+
+    assert list(updated) == ["pkg/app.py"]
+    assert list(session.results) == ["pkg/app.py"]
+
+
+def test_changed_gitignore_rescans_its_directory(tmp_path, aws_rulesets):
+    """Directories newly ignored drop their detections and directories newly un-ignored are scanned."""
+    root = os.fspath(tmp_path)
+    write_files(root, {
+        "pkg/.gitignore": "old/\n",
+        "pkg/old/key.py": f"KEY = '{ACCESS_KEY}'\n",
+        "pkg/new/key.py": f"KEY = '{ACCESS_KEY}'\n",
+    })
+    session = WatchSession(root=root, rulesets=aws_rulesets)
+    session.scan_all()
+    assert list(session.results) == ["pkg/new/key.py"]
+
+    write_files(root, {"pkg/.gitignore": "new/\n"})
+    updated = session.rescan({"pkg/.gitignore"})
+
+    assert updated["pkg/new/key.py"] == []
+    assert updated["pkg/old/key.py"]
+    assert list(session.results) == ["pkg/old/key.py"]
+
+
+def test_inotify_watcher_forgets_moved_and_deleted_directories(tmp_path):
+    """Watches of renamed directories are keyed by their new path and deleted directories are dropped."""
+    root = os.fspath(tmp_path)
+    write_files(root, {"a/b/file.py": "x = 1\n"})
+
+    try:
+        watcher = InotifyWatcher(root, IgnoreMatcher(root))
+    except OSError:
+        pytest.skip("inotify isn't available")
+
+    try:
+        assert sorted(watcher.directories.values()) == ["", "a", "a/b"]
+
+        os.rename(os.path.join(root, "a"), os.path.join(root, "c"))
+        assert watcher.wait(1.0) == {"a", "c"}
+        assert sorted(watcher.directories.values()) == ["", "c", "c/b"]
+
+        write_files(root, {"c/b/file.py": "x = 2\n"})
+        assert watcher.wait(1.0) == {"c/b/file.py"}
+
+        shutil.rmtree(os.path.join(root, "c"))
+        watcher.wait(1.0)
+        assert list(watcher.directories.values()) == [""]
+    finally:
+        watcher.close()